@@ -0,0 +1,154 @@
+import math
+from typing import List, Optional, Union
+
+import numpy as np
+
+AGGREGATE_SUM = "SUM"
+AGGREGATE_AVG = "AVG"
+AGGREGATE_MIN = "MIN"
+AGGREGATE_MAX = "MAX"
+
+# the rows of the array of the nodes
+NODE_SUM = 0
+NODE_MIN = 1
+NODE_MAX = 2
+NODE_COUNT = 3
+# the node of a cell that does not hold a number
+EMPTY_NODE = (0.0, math.inf, -math.inf, 0.0)
+# up to this many changed rows recalculate their paths one by one, more recalculate the tree level by level
+PATH_UPDATE_MAX_ROWS = 8
+
+
+class ColumnAggregateIndex:
+    """
+    The ColumnAggregateIndex class is a segment tree over the values of one column.
+    each node keeps the sum, min, max and the number of numeric cells of its rows,
+    so SUM, AVG, MIN and MAX of any range are answered in O(log n),
+    and changing one cell updates only the O(log n) nodes above it.
+    the nodes are always recalculated from their children, so the sums
+    do not drift the way adding and subtracting deltas would.
+    the nodes are kept in one numpy array, a change only sets its leaf and the nodes above
+    the changed leaves are recalculated together, with vectorized operations, by the next query.
+    The index has the following attributes:
+    - size: the number of leaves, a power of two that is at least the number of rows
+    - nodes: the sum, min, max and count of the nodes of the tree, a row of the array for each of them,
+      node i has the children 2i and 2i+1
+    - path_shifts: the shifts that give the nodes from a leaf up to the root
+    - changed_leaves: the leaves that changed since the last query, the nodes above them are not recalculated yet
+    """
+
+    def __init__(self, values: np.ndarray, valid: np.ndarray) -> None:
+        """
+        Builds the tree from the values of the column and their validity mask,
+        level by level with vectorized operations.
+        """
+        self.__size = 1 << max(0, math.ceil(math.log2(max(1, len(values)))))
+        self.__nodes = np.empty((4, 2 * self.__size), dtype=np.float64)
+        self.__nodes[:] = np.array(EMPTY_NODE)[:, np.newaxis]
+        leaves = slice(self.__size, self.__size + len(values))
+        self.__nodes[NODE_SUM, leaves] = np.where(valid, values, 0.0)
+        self.__nodes[NODE_MIN, leaves] = np.where(valid, values, np.inf)
+        self.__nodes[NODE_MAX, leaves] = np.where(valid, values, -np.inf)
+        self.__nodes[NODE_COUNT, leaves] = valid
+        self.__path_shifts = np.arange(self.__size.bit_length())
+        self.__changed_leaves: List[int] = []
+        level_start = self.__size
+        while level_start > 1:
+            parent_start = level_start // 2
+            self.__update_parents(slice(parent_start, level_start), slice(level_start, 2 * level_start, 2),
+                                  slice(level_start + 1, 2 * level_start, 2))
+            level_start = parent_start
+
+    def get_size(self) -> int:
+        return self.__size
+
+    def update(self, row: int, value: Optional[float]) -> None:
+        """
+        Changes the value of a row, None means the cell does not hold a number.
+        the nodes above it are recalculated by the next query, or when more rows changed than the tree has leaves.
+        """
+        leaf = self.__size + row
+        self.__nodes[:, leaf] = EMPTY_NODE if value is None else (value, value, value, 1.0)
+        self.__changed_leaves.append(leaf)
+        if len(self.__changed_leaves) > self.__size:
+            self.__update_changed_paths()
+
+    def query(self, function: str, first_row: int, last_row: int) -> Optional[float]:
+        """
+        Calculates SUM, AVG, MIN or MAX over the rows first_row..last_row (inclusive).
+        returns None if the range is empty or one of its cells does not hold a number.
+        """
+        if first_row > last_row or last_row >= self.__size:
+            return None
+        if self.__changed_leaves:
+            self.__update_changed_paths()
+        nodes = self.__nodes[:, self.__get_covering_nodes(first_row, last_row + 1)]
+        if nodes[NODE_COUNT].sum() != last_row - first_row + 1:
+            return None
+        if function == AGGREGATE_SUM:
+            return float(nodes[NODE_SUM].sum())
+        if function == AGGREGATE_AVG:
+            return float(nodes[NODE_SUM].sum()) / (last_row - first_row + 1)
+        if function == AGGREGATE_MIN:
+            return float(nodes[NODE_MIN].min())
+        if function == AGGREGATE_MAX:
+            return float(nodes[NODE_MAX].max())
+        return None
+
+    def __update_changed_paths(self) -> None:
+        """
+        Recalculates the nodes above the leaves that changed. a few leaves recalculate their paths
+        one at a time: the siblings of a path do not change, so every node of the path is the leaf
+        combined with the siblings below it, one accumulation over them. more leaves recalculate
+        the parents of all of them level by level, one vectorized operation for every level.
+        """
+        changed_leaves = self.__changed_leaves
+        self.__changed_leaves = []
+        if len(changed_leaves) <= PATH_UPDATE_MAX_ROWS:
+            for leaf in changed_leaves:
+                path = leaf >> self.__path_shifts
+                path_nodes = self.__nodes[:, path]
+                path_nodes[:, 1:] = self.__nodes[:, path[:-1] ^ 1]
+                np.cumsum(path_nodes[NODE_SUM], out=path_nodes[NODE_SUM])
+                np.minimum.accumulate(path_nodes[NODE_MIN], out=path_nodes[NODE_MIN])
+                np.maximum.accumulate(path_nodes[NODE_MAX], out=path_nodes[NODE_MAX])
+                np.cumsum(path_nodes[NODE_COUNT], out=path_nodes[NODE_COUNT])
+                self.__nodes[:, path] = path_nodes
+            return
+        parents = np.unique(np.array(changed_leaves) >> 1)
+        while len(parents):
+            self.__update_parents(parents, 2 * parents, 2 * parents + 1)
+            parents = np.unique(parents[parents > 1] >> 1)
+
+    def __update_parents(self, parents: Union[slice, np.ndarray], left_children: Union[slice, np.ndarray],
+                         right_children: Union[slice, np.ndarray]) -> None:
+        """
+        Recalculates nodes of one level from their children, a whole level is given as slices.
+        """
+        left = self.__nodes[:, left_children]
+        right = self.__nodes[:, right_children]
+        self.__nodes[NODE_SUM, parents] = left[NODE_SUM] + right[NODE_SUM]
+        self.__nodes[NODE_MIN, parents] = np.minimum(left[NODE_MIN], right[NODE_MIN])
+        self.__nodes[NODE_MAX, parents] = np.maximum(left[NODE_MAX], right[NODE_MAX])
+        self.__nodes[NODE_COUNT, parents] = left[NODE_COUNT] + right[NODE_COUNT]
+
+    def __get_covering_nodes(self, start: int, end: int) -> List[int]:
+        """
+        Returns the O(log n) nodes that exactly cover the rows start..end (exclusive),
+        ordered from the first rows to the last ones.
+        """
+        left_nodes = []
+        right_nodes = []
+        start += self.__size
+        end += self.__size
+        while start < end:
+            if start & 1:
+                left_nodes.append(start)
+                start += 1
+            if end & 1:
+                end -= 1
+                right_nodes.append(end)
+            start //= 2
+            end //= 2
+        right_nodes.reverse()
+        return left_nodes + right_nodes
@@ -0,0 +1,167 @@
+import queue
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from compiled_formula import CompiledFormula
+from sheet_parser import SheetParser, PARSER_FORMULA, PARSER_FORMULA_ERROR_CALCULATING
+from sheet_storage import SheetStorage
+from cell_value import ERROR_VALUE
+from sheet_reference import SheetReference
+
+# the results are sent back to the sheet in batches of this many cells
+RESULT_BATCH_CELLS = 256
+
+# the result of a formula: its cell, and the parser's result, dependencies and answer
+FormulaResult = Tuple[Tuple[int, int], str, Any, Any]
+
+
+class RecalculationJob:
+    """
+    The RecalculationJob class is the work of one background recalculation:
+    the levels of the formulas to evaluate, each level after the levels it reads,
+    and a snapshot of the sheet when the job was started.
+    The job has the following attributes:
+    - job_id: a number that grows with every job, results of older jobs are dropped
+    - snapshot: a snapshot of the storage of the sheet, the worker writes the values of the results to it
+    - levels: the formulas of every level, with their compiled formulas
+    - sheet_snapshots: snapshots of the other sheets of the workbook that the formulas read, by their names
+    """
+
+    def __init__(self, job_id: int, snapshot: SheetStorage,
+                 levels: List[List[Tuple[Tuple[int, int], CompiledFormula]]],
+                 sheet_snapshots: Dict[str, SheetStorage]) -> None:
+        self.__job_id = job_id
+        self.__snapshot = snapshot
+        self.__levels = levels
+        self.__sheet_snapshots = sheet_snapshots
+
+    def get_job_id(self) -> int:
+        return self.__job_id
+
+    def get_snapshot(self) -> SheetStorage:
+        return self.__snapshot
+
+    def get_levels(self) -> List[List[Tuple[Tuple[int, int], CompiledFormula]]]:
+        return self.__levels
+
+    def get_sheet_snapshot(self, reference: SheetReference) -> Optional[SheetStorage]:
+        return self.__sheet_snapshots.get(reference.get_sheet_name())
+
+
+class BackgroundRecalculator:
+    """
+    The BackgroundRecalculator class evaluates recalculation jobs in a worker thread,
+    so a long cascade does not block the thread of the window.
+    the worker only reads the job's snapshot and compiled formulas, and puts its results in a queue,
+    the sheet takes them from the queue in its own thread and applies them.
+    starting a job cancels the job that is running, the worker stops it between two formulas.
+    The recalculator has the following attributes:
+    - jobs: the queue of the jobs for the worker
+    - results: the queue of the batches of results, (job id, results), a batch of None ends a job
+    - current_job_id: the id of the last job that was started, or of a cancelled one
+    - worker: the worker thread, it is started with the first job
+    """
+
+    def __init__(self) -> None:
+        self.__jobs: "queue.Queue[Optional[RecalculationJob]]" = queue.Queue()
+        self.__results: "queue.Queue[Tuple[int, Optional[List[FormulaResult]]]]" = queue.Queue()
+        self.__current_job_id = 0
+        self.__is_running = False
+        self.__worker: Optional[threading.Thread] = None
+
+    def start_job(self, snapshot: SheetStorage,
+                  levels: List[List[Tuple[Tuple[int, int], CompiledFormula]]],
+                  sheet_snapshots: Optional[Dict[str, SheetStorage]] = None) -> None:
+        self.__current_job_id += 1
+        self.__is_running = True
+        if self.__worker is None:
+            self.__worker = threading.Thread(target=self.__run, name="recalculation", daemon=True)
+            self.__worker.start()
+        self.__jobs.put(RecalculationJob(self.__current_job_id, snapshot, levels, sheet_snapshots or {}))
+
+    def cancel(self) -> None:
+        """
+        Cancels the running job, its results that were not taken yet are dropped.
+        """
+        if self.__is_running:
+            self.__current_job_id += 1
+            self.__is_running = False
+
+    def is_running(self) -> bool:
+        return self.__is_running
+
+    def take_results(self) -> List[FormulaResult]:
+        """
+        Takes the results that the worker finished so far, without waiting for more.
+        """
+        taken: List[FormulaResult] = []
+        while True:
+            try:
+                job_id, results = self.__results.get_nowait()
+            except queue.Empty:
+                return taken
+            if job_id != self.__current_job_id:
+                continue
+            if results is None:
+                self.__is_running = False
+            else:
+                taken.extend(results)
+
+    def wait(self, timeout: Optional[float] = None) -> List[FormulaResult]:
+        """
+        Waits until the running job is done and takes all its results, used by batch runs and tests.
+        """
+        taken = self.take_results()
+        while self.__is_running:
+            try:
+                job_id, results = self.__results.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if job_id != self.__current_job_id:
+                continue
+            if results is None:
+                self.__is_running = False
+            else:
+                taken.extend(results)
+        return taken
+
+    def close(self) -> None:
+        self.cancel()
+        if self.__worker is not None:
+            self.__jobs.put(None)
+            self.__worker.join()
+            self.__worker = None
+
+    def __run(self) -> None:
+        while True:
+            job = self.__jobs.get()
+            if job is None:
+                return
+            self.__run_job(job)
+            # the snapshot is not kept while waiting, the sheet copies its cells only while a snapshot is alive
+            del job
+
+    def __run_job(self, job: RecalculationJob) -> None:
+        """
+        Evaluates the levels of a job one formula at a time, the result of every formula
+        is written to the snapshot so the formulas of the next levels read it.
+        """
+        job_id = job.get_job_id()
+        snapshot = job.get_snapshot()
+        parser = SheetParser(snapshot, sheet_resolver=job.get_sheet_snapshot)
+        batch: List[FormulaResult] = []
+        for level in job.get_levels():
+            for cell_loc, compiled in level:
+                if job_id != self.__current_job_id:
+                    return
+                result, dependent_cell_list, answer = parser.evaluate(compiled)
+                if result == PARSER_FORMULA:
+                    snapshot.set_snapshot_value(cell_loc[0], cell_loc[1], answer)
+                elif result == PARSER_FORMULA_ERROR_CALCULATING:
+                    snapshot.set_snapshot_value(cell_loc[0], cell_loc[1], ERROR_VALUE)
+                batch.append((cell_loc, result, dependent_cell_list, answer))
+                if len(batch) >= RESULT_BATCH_CELLS:
+                    self.__results.put((job_id, batch))
+                    batch = []
+        self.__results.put((job_id, batch))
+        self.__results.put((job_id, None))
@@ -0,0 +1,135 @@
+import argparse
+import csv
+import os
+import sys
+import time
+from typing import List, Optional, TextIO, Tuple
+
+from sheet import ERROR_LOADING_FILE_MSG
+from recalculation_scheduler import RecalculationScheduler
+from cell_address import get_cell_loc
+from delimited_file import write_delimited_rows
+from sheet_reference import split_sheet_name, SHEET_NAME_SEPARATOR
+from workbook import Workbook
+
+EVAL_COMMAND = "eval"
+CSV_EXTENSION = ".csv"
+NO_SUCH_SHEET_TEXT = "no such sheet"
+
+# a cell to write: its name as it is written, the name of its sheet (None for the active sheet) and its (row, col)
+SelectedCell = Tuple[str, Optional[str], Tuple[int, int]]
+
+
+def run_eval_command(arguments: List[str]) -> int:
+    """
+    The headless batch evaluation: python main.py eval FILE... [--out OUT] [--cells A1,B2] [--workers N]
+    loads every sheet or workbook file, recalculates all of its formulas and writes the results
+    of its active sheet as csv, to stdout, to OUT for one file, or to OUT/<file name>.csv when there are many,
+    the file name keeps its extension so in.txt and in.mxlb are written to in.txt.csv and in.mxlb.csv.
+    a cell of another sheet of a workbook is selected as Sheet2!A1.
+    the time every file took is reported to stderr.
+    nothing here imports tkinter, so it runs on machines without a display.
+    returns the exit code of the program, 1 if one of the files could not be evaluated.
+    """
+    parser = argparse.ArgumentParser(prog="main.py " + EVAL_COMMAND,
+                                     description="Recalculate saved sheets without opening the window.")
+    parser.add_argument("files", nargs="+", help="sheet files to evaluate (text, binary or .mxlw workbooks)")
+    parser.add_argument("--out", help="the csv file to write, or a directory when there are many files")
+    parser.add_argument("--cells", help="comma separated cells to write instead of the whole sheet, "
+                                        "e.g. A1,B2,Sheet2!C3")
+    parser.add_argument("--workers", type=int, help="worker processes for the recalculation, one for every core "
+                                                    "by default, 1 to recalculate serially")
+    options = parser.parse_args(arguments)
+
+    selected_cells: Optional[List[SelectedCell]] = None
+    if options.cells:
+        selected_cells = []
+        for cell_name in options.cells.split(","):
+            sheet_name, cell_text = split_sheet_name(cell_name.strip())
+            cell_loc = get_cell_loc(cell_text)
+            if cell_loc is None:
+                parser.error("not a cell: " + cell_name)
+            cell_text = cell_text.strip().upper()
+            if sheet_name is not None:
+                cell_text = sheet_name + SHEET_NAME_SEPARATOR + cell_text
+            selected_cells.append((cell_text, sheet_name, cell_loc))
+
+    output_file_names = [_get_output_file_name(options.out, file_name, len(options.files))
+                         for file_name in options.files]
+    for output_file_name in output_file_names:
+        if output_file_name is not None and output_file_names.count(output_file_name) > 1:
+            # files of the same name in different directories, one would overwrite the results of the other
+            parser.error("more than one file would be written to " + output_file_name)
+    if options.out is not None and len(options.files) > 1:
+        os.makedirs(options.out, exist_ok=True)
+
+    exit_code = 0
+    recalculation_scheduler = RecalculationScheduler(options.workers)
+    try:
+        for file_name, output_file_name in zip(options.files, output_file_names):
+            if not _evaluate_file(file_name, output_file_name, selected_cells, recalculation_scheduler):
+                exit_code = 1
+    finally:
+        recalculation_scheduler.close()
+    return exit_code
+
+
+def _get_output_file_name(out: Optional[str], file_name: str, file_count: int) -> Optional[str]:
+    if out is None or file_count == 1:
+        return out
+    return os.path.join(out, os.path.basename(file_name) + CSV_EXTENSION)
+
+
+def _evaluate_file(file_name: str,
+                   output_file_name: Optional[str],
+                   selected_cells: Optional[List[SelectedCell]],
+                   recalculation_scheduler: RecalculationScheduler) -> bool:
+    """
+    Loads, recalculates and writes one file, returns False if it could not be loaded or written.
+    """
+    errors: List[str] = []
+    workbook = Workbook(on_error=errors.append, recalculation_scheduler=recalculation_scheduler)
+    start_time = time.perf_counter()
+    workbook.load_from_file(file_name)
+    if ERROR_LOADING_FILE_MSG in errors:
+        print(file_name + ": " + ERROR_LOADING_FILE_MSG, file=sys.stderr)
+        return False
+    load_time = time.perf_counter()
+    workbook.recalculate_all()
+    recalculation_time = time.perf_counter()
+    try:
+        if output_file_name is None:
+            _write_results(workbook, sys.stdout, selected_cells)
+        else:
+            with open(output_file_name, 'w', newline='') as file:
+                _write_results(workbook, file, selected_cells)
+    except OSError as error:
+        print(file_name + ": error writing the results: " + str(error), file=sys.stderr)
+        return False
+    end_time = time.perf_counter()
+    for error_msg in errors:
+        print(file_name + ": " + error_msg, file=sys.stderr)
+    print("%s: loaded in %.3fs, recalculated in %.3fs, written in %.3fs (%.3fs in total)" %
+          (file_name, load_time - start_time, recalculation_time - load_time,
+           end_time - recalculation_time, end_time - start_time), file=sys.stderr)
+    return True
+
+
+def _write_results(workbook: Workbook,
+                   stream: TextIO,
+                   selected_cells: Optional[List[SelectedCell]]) -> None:
+    """
+    Writes the selected cells as (cell, value) rows,
+    or the values of the active sheet as a grid, without the headers row and column,
+    up to its last populated row and column like a csv export.
+    """
+    if selected_cells is not None:
+        writer = csv.writer(stream)
+        for cell_name, sheet_name, cell_loc in selected_cells:
+            sheet = workbook.get_active_sheet() if sheet_name is None else workbook.get_sheet(sheet_name)
+            if sheet is None:
+                writer.writerow([cell_name, NO_SUCH_SHEET_TEXT])
+            else:
+                writer.writerow([cell_name, sheet.get_sheet().get_cell(*cell_loc).get_formula_result()])
+        return
+    write_delimited_rows(workbook.get_active_sheet().get_sheet(), stream)
@@ -0,0 +1,101 @@
+import argparse
+import gc
+import json
+import sys
+import tracemalloc
+from typing import Any, Callable, Dict, List, Tuple
+
+from cell import Cell
+from sheet import Sheet
+from sheet_storage import SheetStorage
+
+
+def measure_populated_cells(row_count: int, column_count: int, make_text: Callable[[int, int], str]) -> float:
+    """
+    Returns the bytes that every populated cell costs, with its entry in the storage
+    and its mirrored numeric value. the texts are made before measuring, they are not counted.
+    """
+    cell_locs = [(row, col) for row in range(1, row_count + 1) for col in range(1, column_count + 1)]
+    return _measure_written_cells(cell_locs, [make_text(row, col) for row, col in cell_locs]) / len(cell_locs)
+
+
+def _measure_written_cells(cell_locs: List[Tuple[int, int]], texts: List[str]) -> int:
+    """
+    Returns the bytes of a storage that the texts were written to, one to every cell.
+    """
+    gc.collect()
+    tracemalloc.start()
+    storage = SheetStorage()
+    for (row, col), text in zip(cell_locs, texts):
+        storage.get_cell_for_write(row, col).write_text(text)
+        storage.refresh_value(row, col)
+    used, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return used
+
+
+def measure_formula_cells(row_count: int) -> float:
+    """
+    Returns the bytes that every cell of a column of formulas costs, each formula reads the cell above it,
+    with the dependency graph, the compiled formula and the dependent cells lists.
+    """
+    sheet = Sheet(name="memory")
+    gc.collect()
+    tracemalloc.start()
+    sheet.choose_cell(1, 1)
+    sheet.write_to_chosen_cell("1")
+    sheet.enter_pressed()
+    with sheet.transaction():
+        for row in range(2, row_count + 1):
+            sheet.choose_cell(row, 1)
+            sheet.write_to_chosen_cell("MATH(A%d+1)" % (row - 1))
+            sheet.enter_pressed()
+    used, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return used / row_count
+
+
+def measure_empty_cells(row_count: int, column_count: int) -> float:
+    """
+    Returns the bytes that every empty cell of a sheet that grew through writes costs.
+    a number is written to one cell of every row, going over the columns, so the sheet grows
+    to the size with the other cells of the rows empty. the same numbers written next to each other,
+    without empty cells between them, are measured too, the difference is what the empty cells cost.
+    """
+    texts = [str(row + 0.5) for row in range(1, row_count + 1)]
+    spread_cells = [(row, 1 + (row - 1) % column_count) for row in range(1, row_count + 1)]
+    packed_cells = [(1 + i // column_count, 1 + i % column_count) for i in range(row_count)]
+    spread_bytes = _measure_written_cells(spread_cells, texts)
+    packed_bytes = _measure_written_cells(packed_cells, texts)
+    return (spread_bytes - packed_bytes) / (row_count * column_count - row_count)
+
+
+def run_cell_memory_benchmark(row_count: int, column_count: int) -> Dict[str, Any]:
+    results: List[Dict[str, Any]] = [
+        {"name": "number_cells", "bytes_per_cell": measure_populated_cells(row_count, column_count,
+                                                                           lambda row, col: str(row * col + 0.5))},
+        {"name": "text_cells", "bytes_per_cell": measure_populated_cells(row_count, column_count,
+                                                                         lambda row, col: "text %d" % col)},
+        {"name": "formula_cells", "bytes_per_cell": measure_formula_cells(row_count)},
+        {"name": "empty_cells", "bytes_per_cell": measure_empty_cells(row_count, column_count)},
+    ]
+    return {"benchmark": "cell_memory", "rows": row_count, "columns": column_count,
+            "cell_object_bytes": sys.getsizeof(Cell()), "results": results}
+
+
+def main(arguments: List[str]) -> None:
+    """
+    python -m benchmarks.cell_memory [--rows N] [--cols N]
+    writes the bytes per populated and per empty cell as json to stdout.
+    """
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.cell_memory",
+                                     description="Measure the memory that the cells of a sheet take.")
+    parser.add_argument("--rows", type=int, default=10000, help="rows of the measured sheets")
+    parser.add_argument("--cols", type=int, default=10, help="columns of the measured sheets")
+    options = parser.parse_args(arguments)
+    json.dump(run_cell_memory_benchmark(options.rows, options.cols), sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
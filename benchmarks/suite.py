@@ -0,0 +1,161 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from benchmarks.cell_memory import run_cell_memory_benchmark
+from benchmarks.workbooks import WORKBOOK_SHAPES, build_workbook
+from binary_workbook import BINARY_FILE_EXTENSION
+from recalculation_scheduler import RecalculationScheduler
+from sheet import Sheet
+from sheet_parser import SheetParser
+
+DEFAULT_SIZE = 2000
+DEFAULT_REPEAT = 3
+TEXT_FILE_EXTENSION = ".txt"
+
+
+def _raise_error(error_msg: str) -> None:
+    raise RuntimeError(error_msg)
+
+
+def time_operation(operation: Callable[[int], Any], repeat: int) -> List[float]:
+    """
+    Runs the operation repeat times, it gets the number of the run, and returns the seconds every run took.
+    """
+    seconds = []
+    for run in range(repeat):
+        start_time = time.perf_counter()
+        operation(run)
+        seconds.append(time.perf_counter() - start_time)
+    return seconds
+
+
+def benchmark_workbook(shape: str, size: int, repeat: int, scheduler: RecalculationScheduler,
+                       lazy_evaluation: bool, directory: str) -> List[Dict[str, Any]]:
+    """
+    Times the operations of the engine on a synthetic workbook of the shape and size.
+    with lazy evaluation propagating an edit only marks the dirty cells.
+    """
+    cells = WORKBOOK_SHAPES[shape](size)
+    formulas = [(cell_loc, text) for cell_loc, text in cells if "(" in text]
+    sheet = build_workbook(cells, scheduler, lazy_evaluation)
+    serialized = sheet.serialize()
+    root_cell = cells[0][0]
+
+    def parse_formulas(run: int) -> None:
+        parser = SheetParser(sheet.get_sheet())
+        for cell_loc, text in formulas:
+            parser.parse_expression(text, cell_loc)
+
+    def propagate_edit(run: int) -> None:
+        sheet.choose_cell(*root_cell)
+        sheet.write_to_chosen_cell(str(run + 2))
+
+    def deserialize(run: int) -> None:
+        Sheet(name="benchmark", recalculation_scheduler=scheduler).deserialize(serialized)
+
+    def get_file_name(run: int, extension: str) -> str:
+        return os.path.join(directory, "%s_%d%s" % (shape, run, extension))
+
+    def save(extension: str) -> Callable[[int], None]:
+        # every run saves to a new file, saving to the same file again would only sync its journal
+        return lambda run: sheet.save_to_file(get_file_name(run, extension))
+
+    def load(extension: str, load_all_cells: bool) -> Callable[[int], None]:
+        def load_file(run: int) -> None:
+            loaded_sheet = Sheet(name="benchmark", on_error=_raise_error, recalculation_scheduler=scheduler)
+            loaded_sheet.load_from_file(get_file_name(0, extension))
+            if load_all_cells:
+                loaded_sheet.get_sheet().load_all()
+        return load_file
+
+    operations: Dict[str, Callable[[int], Any]] = {
+        "build_grid_model": lambda run: build_workbook(cells, scheduler, lazy_evaluation),
+        "parse_expression": parse_formulas,
+        "propagate_edit": propagate_edit,
+        "recalculate_all": lambda run: sheet.recalculate_all(),
+        "serialize": lambda run: sheet.serialize(),
+        "deserialize": deserialize,
+        # the sheet adds the extension of text files when it saves them
+        "save_text": save(""),
+        "load_text": load(TEXT_FILE_EXTENSION, False),
+        "save_binary": save(BINARY_FILE_EXTENSION),
+        # opening a binary workbook only maps it, its cells are decoded when they are read
+        "open_binary": load(BINARY_FILE_EXTENSION, False),
+        "load_binary": load(BINARY_FILE_EXTENSION, True),
+    }
+    results = []
+    for name, operation in operations.items():
+        seconds = time_operation(operation, repeat)
+        results.append({"workbook": shape, "size": size, "cells": len(cells), "formulas": len(formulas),
+                        "operation": name, "repeat": repeat, "min_seconds": min(seconds),
+                        "median_seconds": statistics.median(seconds)})
+    return results
+
+
+def run_benchmark_suite(shapes: List[str], size: int, repeat: int, worker_count: Optional[int],
+                        lazy_evaluation: bool, include_memory: bool) -> Dict[str, Any]:
+    scheduler = RecalculationScheduler(worker_count)
+    results: List[Dict[str, Any]] = []
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            for shape in shapes:
+                results.extend(benchmark_workbook(shape, size, repeat, scheduler, lazy_evaluation, directory))
+    finally:
+        scheduler.close()
+    report: Dict[str, Any] = {
+        "benchmark": "suite",
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "options": {"shapes": shapes, "size": size, "repeat": repeat, "workers": scheduler.get_worker_count(),
+                    "lazy": lazy_evaluation},
+        "results": results,
+    }
+    if include_memory:
+        report["memory"] = run_cell_memory_benchmark(size, 10)
+    return report
+
+
+def main(arguments: List[str]) -> None:
+    """
+    python -m benchmarks.suite [--size N] [--repeat N] [--shapes a,b] [--workers N] [--lazy] [--memory] [--out FILE]
+    times the engine on synthetic workbooks and writes the results as json, to stdout or to FILE.
+    """
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.suite",
+                                     description="Time the parser, recalculation and file formats "
+                                                 "on synthetic workbooks.")
+    parser.add_argument("--size", type=int, default=DEFAULT_SIZE,
+                        help="rows (or columns for wide_row) of every workbook")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="runs of every operation")
+    parser.add_argument("--shapes", default=",".join(WORKBOOK_SHAPES),
+                        help="comma separated workbook shapes: " + ", ".join(WORKBOOK_SHAPES))
+    parser.add_argument("--workers", type=int, default=1,
+                        help="worker processes for the recalculation, 1 to recalculate serially")
+    parser.add_argument("--lazy", action="store_true", help="use lazy evaluation, edits only mark the dirty cells")
+    parser.add_argument("--memory", action="store_true", help="also measure the bytes per cell")
+    parser.add_argument("--out", help="the json file to write, stdout by default")
+    options = parser.parse_args(arguments)
+    shapes = options.shapes.split(",")
+    for shape in shapes:
+        if shape not in WORKBOOK_SHAPES:
+            parser.error("unknown workbook shape: " + shape)
+
+    report = run_benchmark_suite(shapes, options.size, options.repeat, options.workers, options.lazy,
+                                 options.memory)
+    if options.out is None:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        with open(options.out, 'w') as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,70 @@
+from typing import Callable, Dict, List, Tuple
+
+from cell_address import get_cell_name, get_column_name
+from recalculation_scheduler import RecalculationScheduler
+from sheet import Sheet
+
+# the number of SUM formulas that read the same range in the fan out workbook
+FAN_OUT_FORMULAS = 64
+
+# the text of every cell of a synthetic workbook, in the order it is written
+WorkbookCells = List[Tuple[Tuple[int, int], str]]
+
+
+def long_column_cells(size: int) -> WorkbookCells:
+    """
+    A column of numbers, and next to it a column of formulas that each read the number in their row.
+    """
+    cells = [((row, 1), str(row)) for row in range(1, size + 1)]
+    cells.extend(((row, 2), "MATH(A%d*2)" % row) for row in range(1, size + 1))
+    return cells
+
+
+def wide_row_cells(size: int) -> WorkbookCells:
+    """
+    A row of numbers, and under it a row of formulas that each read the number in their column.
+    """
+    cells = [((1, col), str(col)) for col in range(1, size + 1)]
+    cells.extend(((2, col), "MATH(%s1+1)" % get_column_name(col)) for col in range(1, size + 1))
+    return cells
+
+
+def deep_chain_cells(size: int) -> WorkbookCells:
+    """
+    A chain of formulas, each reads the one above it, so a change to the first cell goes through all of them.
+    """
+    cells = [((1, 1), "1")]
+    cells.extend(((row, 1), "MATH(A%d+1)" % (row - 1)) for row in range(2, size + 1))
+    return cells
+
+
+def fan_out_cells(size: int) -> WorkbookCells:
+    """
+    A column of numbers, and FAN_OUT_FORMULAS SUM formulas that all read the whole column.
+    """
+    cells = [((row, 1), str(row)) for row in range(1, size + 1)]
+    total_range = "SUM(A1:%s)" % get_cell_name((size, 1))
+    cells.extend(((row, 2), total_range) for row in range(1, min(size, FAN_OUT_FORMULAS) + 1))
+    return cells
+
+
+WORKBOOK_SHAPES: Dict[str, Callable[[int], WorkbookCells]] = {
+    "long_column": long_column_cells,
+    "wide_row": wide_row_cells,
+    "deep_chain": deep_chain_cells,
+    "fan_out": fan_out_cells,
+}
+
+
+def build_workbook(cells: WorkbookCells, scheduler: RecalculationScheduler, lazy_evaluation: bool = False) -> Sheet:
+    """
+    Writes the cells to a new sheet the way the screen does, in one transaction
+    so every formula is recalculated once, after all the cells are written.
+    """
+    sheet = Sheet(name="benchmark", recalculation_scheduler=scheduler, lazy_evaluation=lazy_evaluation)
+    with sheet.transaction():
+        for cell_loc, text in cells:
+            sheet.choose_cell(*cell_loc)
+            sheet.write_to_chosen_cell(text)
+            sheet.enter_pressed()
+    return sheet
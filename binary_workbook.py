@@ -0,0 +1,363 @@
+import mmap
+import os
+import struct
+import threading
+from typing import BinaryIO, Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from cell import Cell
+from cell_range import CellRange
+from cell_value import ERROR_VALUE, CellError, CellValue
+from style_table import STYLE_TABLE
+
+BINARY_FILE_MAGIC = b"MXLB"
+BINARY_FILE_VERSION = 4
+BINARY_FILE_EXTENSION = ".mxlb"
+BLOCK_ROWS = 1024
+
+# magic, version, reserved, row count, column count, block rows, block count, string count, style count,
+# range count, and the offsets of the block index, the string table, the style table, the dependents,
+# the precedents and the ranges sections
+HEADER_FORMAT = "<4sHHIIIIIIIQQQQQQ"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+# first row, cell count and offset of every block
+BLOCK_INDEX_ENTRY_FORMAT = "<IIQ"
+BLOCK_INDEX_ENTRY_SIZE = struct.calcsize(BLOCK_INDEX_ENTRY_FORMAT)
+# formula cell key, first row, first col, last row and last col of every range a formula reads,
+# a last row or col of 0 means the range is of whole columns or whole rows
+RANGE_ENTRY_FORMAT = "<QIIII"
+RANGE_ENTRY_SIZE = struct.calcsize(RANGE_ENTRY_FORMAT)
+SECTION_ALIGNMENT = 8
+# the type of the value of a cell, saved with a flag that tells if the value is the result of a formula
+VALUE_TYPE_EMPTY = 0
+VALUE_TYPE_NUMBER = 1
+VALUE_TYPE_TEXT = 2
+VALUE_TYPE_ERROR = 3
+VALUE_CALCULATED_FLAG = 0x80
+
+# The layout of a binary workbook file (all numbers are little endian):
+# - header (HEADER_FORMAT)
+# - blocks, one for every BLOCK_ROWS rows that have populated cells, each block holds its
+#   cells as fixed width columns: numeric values (f64), rows, cols, text ids, text value ids,
+#   style ids (u32) and value types (u8). a cell's value is the numeric value or the text value,
+#   according to its type, so numbers are loaded without parsing them
+# - block index (BLOCK_INDEX_ENTRY_FORMAT for every block)
+# - string table: the offsets of the strings (u64, one more than the strings)
+#   and then the utf-8 bytes of all the strings
+# - style table: the color and font string ids (u32) of every style
+# - dependents section: for every cell that formulas read, the formula cells that read it
+# - precedents section: for every formula cell, the cells it reads
+# - ranges section: the ranges formulas read (RANGE_ENTRY_FORMAT for every range), a range
+#   is not expanded into the dependency sections
+# the two dependency sections are compact adjacency lists, the cells are stored as
+# u64 keys (row << 32 | col): the sorted keys (u64), their offsets (u64, one more than the keys)
+# and the adjacent cells of all the keys (u64).
+
+
+def is_binary_workbook(file_name: str) -> bool:
+    """
+    Checks the first bytes of the file to tell a binary workbook from a text sheet file.
+    """
+    with open(file_name, 'rb') as file:
+        return file.read(len(BINARY_FILE_MAGIC)) == BINARY_FILE_MAGIC
+
+
+def write_binary_workbook(file_name: str,
+                          row_count: int,
+                          column_count: int,
+                          cells: Iterable[Tuple[Tuple[int, int], Cell]],
+                          ranges: Iterable[Tuple[Tuple[int, int], CellRange]] = ()) -> None:
+    """
+    Writes the populated cells of a sheet to a binary workbook file.
+    the dependency sections are built from the dependent cells lists of the cells,
+    and the ranges that formulas read (formula cell, range) are written to their own section.
+    the file is written next to the old one and then replaces it, so a reader
+    that has the old file mapped keeps reading the old content.
+    """
+    sorted_cells = sorted(cells, key=lambda item: item[0])
+    strings: Dict[str, int] = {}
+    blocks: Dict[int, List[Tuple[Tuple[int, int], Cell]]] = {}
+    dependents: Dict[int, List[int]] = {}
+    precedents: Dict[int, List[int]] = {}
+    for cell_loc, cell in sorted_cells:
+        blocks.setdefault(cell_loc[0] // BLOCK_ROWS, []).append((cell_loc, cell))
+        value = cell.get_value()
+        strings.setdefault(cell.get_text(), len(strings))
+        if isinstance(value, str):
+            strings.setdefault(value, len(strings))
+        for formula_cell in cell.get_dependent_formula_cells():
+            dependents.setdefault(_to_key(cell_loc), []).append(_to_key(formula_cell))
+            precedents.setdefault(_to_key(formula_cell), []).append(_to_key(cell_loc))
+    styles = STYLE_TABLE.get_styles()
+    for color, font in styles:
+        strings.setdefault(color, len(strings))
+        strings.setdefault(font, len(strings))
+
+    temp_file_name = file_name + ".tmp"
+    with open(temp_file_name, 'wb') as file:
+        file.write(b"\0" * HEADER_SIZE)
+        block_index = []
+        for block, block_cells in sorted(blocks.items()):
+            _align(file)
+            block_index.append(struct.pack(BLOCK_INDEX_ENTRY_FORMAT, block * BLOCK_ROWS, len(block_cells), file.tell()))
+            _write_block(file, block_cells, strings)
+        _align(file)
+        block_index_offset = file.tell()
+        file.write(b"".join(block_index))
+        _align(file)
+        string_table_offset = file.tell()
+        _write_string_table(file, strings)
+        _align(file)
+        style_table_offset = file.tell()
+        file.write(np.array([strings[text] for style in styles for text in style], dtype='<u4').tobytes())
+        _align(file)
+        dependents_offset = file.tell()
+        _write_adjacency(file, dependents)
+        _align(file)
+        precedents_offset = file.tell()
+        _write_adjacency(file, precedents)
+        _align(file)
+        ranges_offset = file.tell()
+        range_entries = [struct.pack(RANGE_ENTRY_FORMAT, _to_key(formula_cell), cell_range.get_first_row(),
+                                     cell_range.get_first_col(), cell_range.get_last_row() or 0,
+                                     cell_range.get_last_col() or 0)
+                         for formula_cell, cell_range in ranges]
+        file.write(b"".join(range_entries))
+        file.seek(0)
+        file.write(struct.pack(HEADER_FORMAT, BINARY_FILE_MAGIC, BINARY_FILE_VERSION, 0, row_count, column_count,
+                               BLOCK_ROWS, len(block_index), len(strings), len(styles), len(range_entries),
+                               block_index_offset, string_table_offset, style_table_offset, dependents_offset,
+                               precedents_offset, ranges_offset))
+    os.replace(temp_file_name, file_name)
+
+
+def _to_key(cell_loc: Tuple[int, int]) -> int:
+    return (cell_loc[0] << 32) | cell_loc[1]
+
+
+def _from_key(key: int) -> Tuple[int, int]:
+    return key >> 32, key & 0xFFFFFFFF
+
+
+def _align(file: BinaryIO) -> None:
+    padding = -file.tell() % SECTION_ALIGNMENT
+    file.write(b"\0" * padding)
+
+
+def _write_block(file: BinaryIO, block_cells: List[Tuple[Tuple[int, int], Cell]], strings: Dict[str, int]) -> None:
+    numbers = np.zeros(len(block_cells), dtype='<f8')
+    text_values = np.zeros(len(block_cells), dtype='<u4')
+    value_types = np.zeros(len(block_cells), dtype='u1')
+    for i, (cell_loc, cell) in enumerate(block_cells):
+        value = cell.get_value()
+        if isinstance(value, float):
+            numbers[i] = value
+            value_types[i] = VALUE_TYPE_NUMBER
+        elif isinstance(value, str):
+            text_values[i] = strings[value]
+            value_types[i] = VALUE_TYPE_TEXT
+        elif isinstance(value, CellError):
+            value_types[i] = VALUE_TYPE_ERROR
+        if cell.is_calculated():
+            value_types[i] |= VALUE_CALCULATED_FLAG
+    file.write(numbers.tobytes())
+    file.write(np.array([cell_loc[0] for cell_loc, cell in block_cells], dtype='<u4').tobytes())
+    file.write(np.array([cell_loc[1] for cell_loc, cell in block_cells], dtype='<u4').tobytes())
+    file.write(np.array([strings[cell.get_text()] for cell_loc, cell in block_cells], dtype='<u4').tobytes())
+    file.write(text_values.tobytes())
+    file.write(np.array([cell.get_style_id() for cell_loc, cell in block_cells], dtype='<u4').tobytes())
+    file.write(value_types.tobytes())
+
+
+def _write_string_table(file: BinaryIO, strings: Dict[str, int]) -> None:
+    encoded = [text.encode("utf-8") for text in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype='<u8')
+    offsets[1:] = np.cumsum([len(data) for data in encoded], dtype=np.uint64)
+    file.write(offsets.tobytes())
+    file.write(b"".join(encoded))
+
+
+def _write_adjacency(file: BinaryIO, adjacency: Dict[int, List[int]]) -> None:
+    keys = sorted(adjacency)
+    offsets = np.zeros(len(keys) + 1, dtype='<u8')
+    offsets[1:] = np.cumsum([len(adjacency[key]) for key in keys], dtype=np.uint64)
+    file.write(struct.pack("<Q", len(keys)))
+    file.write(np.array(keys, dtype='<u8').tobytes())
+    file.write(offsets.tobytes())
+    file.write(np.array([cell for key in keys for cell in adjacency[key]], dtype='<u8').tobytes())
+
+
+class BinaryWorkbookReader:
+    """
+    The BinaryWorkbookReader class opens a binary workbook file with mmap.
+    opening it only reads the header, the block index and the ranges, nothing else is decoded until it is asked for:
+    a block of cells is decoded when the sheet first reads one of its rows,
+    a string is decoded when a decoded cell needs it, and the dependencies
+    of a cell are looked up in the adjacency sections when they are needed.
+    The reader has the following attributes:
+    - map: the memory map of the file
+    - block_index: the first row, cell count and offset of every block
+    - string_offsets: the offsets of the strings in the string table
+    - strings: the strings that were already decoded
+    - style_ids: the ids in the style table of the styles of the file
+    - dependents, precedents: the keys, offsets and values arrays of the adjacency sections
+    - range_precedents: every formula cell and range it reads
+    - user_count: the number of storages that read the file, a storage and its snapshots share the reader
+      and the file is closed when all of them closed it. the file does not change while it is open,
+      so each of them can load the blocks it did not load yet, from any thread
+    """
+
+    def __init__(self, file_name: str) -> None:
+        self.__user_count = 1
+        self.__user_count_lock = threading.Lock()
+        self.__file = open(file_name, 'rb')
+        self.__map = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, reserved, self.__row_count, self.__column_count, self.__block_rows, block_count,
+         string_count, style_count, range_count, block_index_offset, string_table_offset, style_table_offset,
+         dependents_offset, precedents_offset, ranges_offset) = struct.unpack_from(HEADER_FORMAT, self.__map, 0)
+        if magic != BINARY_FILE_MAGIC or version != BINARY_FILE_VERSION:
+            self.close()
+            raise ValueError("not a supported binary workbook: " + file_name)
+        self.__block_index = {
+            first_row // self.__block_rows: (cell_count, offset)
+            for first_row, cell_count, offset in struct.iter_unpack(
+                BLOCK_INDEX_ENTRY_FORMAT,
+                self.__map[block_index_offset:block_index_offset + block_count * BLOCK_INDEX_ENTRY_SIZE])
+        }
+        self.__string_offsets = np.frombuffer(self.__map, dtype='<u8', count=string_count + 1,
+                                              offset=string_table_offset)
+        self.__strings_start = string_table_offset + (string_count + 1) * 8
+        self.__strings: Dict[int, str] = {}
+        style_strings = np.frombuffer(self.__map, dtype='<u4', count=2 * style_count, offset=style_table_offset).tolist()
+        self.__style_ids = [STYLE_TABLE.get_style_id(self.__get_string(style_strings[i]),
+                                                     self.__get_string(style_strings[i + 1]))
+                            for i in range(0, len(style_strings), 2)]
+        self.__dependents = self.__read_adjacency(dependents_offset)
+        self.__precedents = self.__read_adjacency(precedents_offset)
+        self.__range_precedents = [
+            (_from_key(key), CellRange(first_row, first_col, last_row or None, last_col or None))
+            for key, first_row, first_col, last_row, last_col in struct.iter_unpack(
+                RANGE_ENTRY_FORMAT, self.__map[ranges_offset:ranges_offset + range_count * RANGE_ENTRY_SIZE])
+        ]
+
+    def get_row_count(self) -> int:
+        return self.__row_count
+
+    def get_column_count(self) -> int:
+        return self.__column_count
+
+    def get_block_rows(self) -> int:
+        return self.__block_rows
+
+    def get_block_count(self) -> int:
+        return -(-self.__row_count // self.__block_rows)
+
+    def load_block(self, block: int) -> List[Tuple[Tuple[int, int], Cell]]:
+        """
+        Decodes the cells of a block, returns each cell's location and the cell itself.
+        """
+        if block not in self.__block_index:
+            return []
+        count, offset = self.__block_index[block]
+        numbers = np.frombuffer(self.__map, dtype='<f8', count=count, offset=offset)
+        offset += 8 * count
+        columns = []
+        for i in range(5):
+            columns.append(np.frombuffer(self.__map, dtype='<u4', count=count, offset=offset).tolist())
+            offset += 4 * count
+        value_types = np.frombuffer(self.__map, dtype='u1', count=count, offset=offset).tolist()
+        rows, cols, texts, text_values, styles = columns
+        number_values = numbers.tolist()
+        loaded_cells = []
+        for i in range(count):
+            cell_loc = (rows[i], cols[i])
+            value_type = value_types[i] & ~VALUE_CALCULATED_FLAG
+            value: CellValue = None
+            if value_type == VALUE_TYPE_NUMBER:
+                value = number_values[i]
+            elif value_type == VALUE_TYPE_TEXT:
+                value = self.__get_string(text_values[i])
+            elif value_type == VALUE_TYPE_ERROR:
+                value = ERROR_VALUE
+            cell = Cell()
+            cell.restore(self.__get_string(texts[i]), value, bool(value_types[i] & VALUE_CALCULATED_FLAG),
+                         self.__style_ids[styles[i]], self.get_dependents(cell_loc))
+            loaded_cells.append((cell_loc, cell))
+        return loaded_cells
+
+    def get_dependents(self, cell_loc: Tuple[int, int]) -> List[Tuple[int, int]]:
+        """
+        Returns the formula cells that read the given cell.
+        """
+        return self.__find_adjacent(self.__dependents, cell_loc)
+
+    def get_precedents(self, cell_loc: Tuple[int, int]) -> List[Tuple[int, int]]:
+        """
+        Returns the cells that the given formula cell reads.
+        """
+        return self.__find_adjacent(self.__precedents, cell_loc)
+
+    def get_range_precedents(self) -> List[Tuple[Tuple[int, int], CellRange]]:
+        """
+        Returns every formula cell and range it reads.
+        """
+        return self.__range_precedents
+
+    def share(self) -> "BinaryWorkbookReader":
+        """
+        Adds a user of the reader, every user closes it when it does not need it anymore.
+        """
+        with self.__user_count_lock:
+            self.__user_count += 1
+        return self
+
+    def close(self) -> None:
+        """
+        Closes the file once its last user closed it, the arrays that point into the map are dropped first.
+        """
+        with self.__user_count_lock:
+            self.__user_count -= 1
+            if self.__user_count > 0:
+                return
+        self.__string_offsets = None  # type: ignore
+        self.__dependents = None  # type: ignore
+        self.__precedents = None  # type: ignore
+        try:
+            self.__map.close()
+        except BufferError:
+            # a decoded array is still referenced, the map is closed when it is released
+            pass
+        self.__file.close()
+
+    def __get_string(self, string_id: int) -> str:
+        text = self.__strings.get(string_id)
+        if text is None:
+            start = self.__strings_start + int(self.__string_offsets[string_id])
+            end = self.__strings_start + int(self.__string_offsets[string_id + 1])
+            text = self.__map[start:end].decode("utf-8")
+            self.__strings[string_id] = text
+        return text
+
+    def __read_adjacency(self, offset: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Maps the arrays of an adjacency section, without copying them.
+        """
+        key_count = struct.unpack_from("<Q", self.__map, offset)[0]
+        offset += 8
+        keys = np.frombuffer(self.__map, dtype='<u8', count=key_count, offset=offset)
+        offset += 8 * key_count
+        offsets = np.frombuffer(self.__map, dtype='<u8', count=key_count + 1, offset=offset)
+        offset += 8 * (key_count + 1)
+        values = np.frombuffer(self.__map, dtype='<u8', count=int(offsets[-1]), offset=offset)
+        return keys, offsets, values
+
+    def __find_adjacent(self,
+                        adjacency: Tuple[np.ndarray, np.ndarray, np.ndarray],
+                        cell_loc: Tuple[int, int]) -> List[Tuple[int, int]]:
+        keys, offsets, values = adjacency
+        key = _to_key(cell_loc)
+        position = int(np.searchsorted(keys, key))
+        if position == len(keys) or int(keys[position]) != key:
+            return []
+        return [_from_key(int(value)) for value in values[int(offsets[position]):int(offsets[position + 1])]]
@@ -1,22 +1,32 @@
 import ast
-from typing import Optional, Tuple, List
+from typing import Optional, Tuple, List, Sequence
+
+from style_table import STYLE_TABLE, DEFAULT_STYLE_ID
+from cell_value import CELL_ERROR_TEXT, ERROR_VALUE, CellValue, parse_value, format_value
 
 SPACER = "%%%"
 SET_SPACER = "$$$"
-CELL_ERROR_TEXT = "ERROR!"
+
+# the dependent cells list of every cell that no formula reads, it must not be changed
+NO_DEPENDENT_CELLS: List[Tuple[int, int]] = []
 
 class Cell:
     """
     The Cell class represents a cell in the sheet.
     The cell has the following attributes:
     - text: the text of the cell
-    - formula_result: the result of the formula in the cell if there is a formula, otherwise the text
-    - color: the color of the cell
-    - font: the font of the cell
-    - dependent_formula_cells: a list of the cells that depend on this cell
+    - value: the typed value of the cell (a number, a text, an error or None when it is empty),
+      the result of the formula in the cell if there is a formula, otherwise the value of the text
+    - is_calculated: True if the value is the result of a formula and not the value of the text
+    - style_id: the id of the color and font of the cell in the style table
+    - dependent_formula_cells: a list of the cells that depend on this cell,
+      the cells that no formula reads share NO_DEPENDENT_CELLS instead of having an empty list
+    the cell has no __dict__, its attributes are slots, since a sheet has many cells
+    and most of them are small.
     """
+    __slots__ = ("__text", "__value", "__is_calculated", "__style_id", "__dependent_formula_cells")
 
-    def __init__(self, serialized_string: Optional[str]=None) -> None:
+    def __init__(self, serialized_string: Optional[str]=None, style_ids: Optional[List[int]]=None) -> None:
         """
         The constructor of the Cell class.
         It initializes the cell with the given text, color, and font.
@@ -24,87 +34,181 @@ class Cell:
         (for loading)
         """
         self.__text = ""
-        self.__formula_result = self.__text
-        self.__color = "white"
-        self.__font = "Helvetica"
-        self.__dependent_formula_cells: List[Tuple[int, int]] = []
+        self.__value: CellValue = None
+        self.__is_calculated = False
+        self.__style_id = DEFAULT_STYLE_ID
+        self.__dependent_formula_cells = NO_DEPENDENT_CELLS
 
         if serialized_string is not None:
-            self.deserialize(serialized_string)
+            self.deserialize(serialized_string, style_ids)
 
     def serialize(self) -> str:
         """
         Makes a string that represents the cell.
-        The string is used to save the cell to a file.
+        The string is used to save the cell to a file,
+        the style is saved as its id in the style table.
         """
-        st = ""
-        st += self.__text + SPACER
-        st += self.__formula_result + SPACER
-        st += self.__color + SPACER
-        st += self.__font + SPACER
-        for cel in self.__dependent_formula_cells:
-            st += str(cel) + SET_SPACER
-        return st
+        parts = [self.__text, self.get_formula_result(), str(self.__style_id), ""]
+        dependent_cells = "".join([str(cel) + SET_SPACER for cel in self.__dependent_formula_cells])
+        return SPACER.join(parts) + dependent_cells
 
-    def deserialize(self, serialized_string: str) -> None:
+    def deserialize(self, serialized_string: str, style_ids: Optional[List[int]]=None) -> None:
         """
         Deserialize the cell from a string.
         The string is used to load the cell from a file.
+        style_ids maps the style ids of the file to the ids in the style table,
+        files that were saved without a style table keep the color and font of every cell.
+        the value is parsed from the saved formula result, a result that is different
+        from the text is the result of a formula.
         """
         param_list = serialized_string.split(SPACER)
         param_list[-1] = param_list[-1].split(SET_SPACER)[:-1]#  type: ignore
         self.__text = param_list[0]
-        self.__formula_result = param_list[1]
-        self.__color = param_list[2]
-        self.__font = param_list[3]
-        self.__dependent_formula_cells = []
-        temp = list(param_list[4])
-        for index in temp:
-            self.__dependent_formula_cells.append(ast.literal_eval(index))
+        if param_list[1] == self.__text:
+            self.__value = parse_value(self.__text)
+            self.__is_calculated = False
+        else:
+            self.__value = ERROR_VALUE if param_list[1] == CELL_ERROR_TEXT else parse_value(param_list[1])
+            self.__is_calculated = True
+        if style_ids is None:
+            self.__style_id = STYLE_TABLE.get_style_id(param_list[2], param_list[3])
+        else:
+            self.__style_id = style_ids[int(param_list[2])]
+        self.__dependent_formula_cells = [ast.literal_eval(index) for index in param_list[-1]] or NO_DEPENDENT_CELLS
+
+    def restore(self, text: str, value: CellValue, is_calculated: bool, style_id: int,
+                dependent_formula_cells: List[Tuple[int, int]]) -> None:
+        """
+        Sets all the attributes of the cell at once,
+        used when the cell is loaded from a binary workbook.
+        """
+        self.__text = text
+        self.__value = value
+        self.__is_calculated = is_calculated
+        self.__style_id = style_id
+        self.__dependent_formula_cells = dependent_formula_cells or NO_DEPENDENT_CELLS
 
     def write_text(self, text: str) -> bool:
-        if text == self.__formula_result:
+        if text == self.get_formula_result():
             return False
         if text == CELL_ERROR_TEXT:
-            self.__formula_result = text
+            self.__value = ERROR_VALUE
+            self.__is_calculated = True
             return False
-        self.__text = text
-        self.__formula_result = text
+        self.__set_text_value(text)
+        return True
+
+    def set_text(self, text: str) -> bool:
+        """
+        Sets the text of the cell, even if it is the same as its formula result.
+        returns True if the cell changed.
+        """
+        if text == self.__text and not self.__is_calculated:
+            return False
+        self.__set_text_value(text)
         return True
 
+    def __set_text_value(self, text: str) -> None:
+        self.__text = text
+        self.__value = parse_value(text)
+        self.__is_calculated = False
+
     def change_color(self, color: str) -> None:
-        self.__color = color
+        self.__style_id = STYLE_TABLE.with_color(self.__style_id, color)
 
     def change_font(self, font: str) -> None:
-        self.__font = font
+        self.__style_id = STYLE_TABLE.with_font(self.__style_id, font)
 
     def get_font(self) -> str:
-        return self.__font
+        return STYLE_TABLE.get_font(self.__style_id)
 
     def get_text(self) -> str:
         return self.__text
 
     def get_color(self) -> str:
-        return self.__color
+        return STYLE_TABLE.get_color(self.__style_id)
+
+    def get_style_id(self) -> int:
+        return self.__style_id
+
+    def get_value(self) -> CellValue:
+        return self.__value
+
+    def get_number(self) -> Optional[float]:
+        """
+        Returns the value of the cell if it is a number, otherwise None.
+        """
+        return self.__value if isinstance(self.__value, float) else None
+
+    def is_calculated(self) -> bool:
+        return self.__is_calculated
 
     def get_formula_result(self) -> str:
-        return self.__formula_result
+        """
+        Returns the result of the formula as text, or the text of the cell if it is not a formula.
+        """
+        if self.__is_calculated:
+            return format_value(self.__value)
+        return self.__text
+
+    def copy(self) -> "Cell":
+        """
+        Returns a copy of the cell that can be changed without changing this one,
+        used by the storage when the cell is shared with a snapshot.
+        """
+        cell = Cell.__new__(Cell)
+        cell.restore(self.__text, self.__value, self.__is_calculated, self.__style_id,
+                     list(self.__dependent_formula_cells))
+        return cell
 
     def get_dependent_formula_cells(self) -> List[Tuple[int, int]]:
         return self.__dependent_formula_cells
 
     def add_dependent_formula_cell(self, formula_cell: Tuple[int, int]) -> None:
-        if formula_cell not in self.__dependent_formula_cells:
+        if self.__dependent_formula_cells is NO_DEPENDENT_CELLS:
+            self.__dependent_formula_cells = [formula_cell]
+        elif formula_cell not in self.__dependent_formula_cells:
             self.__dependent_formula_cells.append(formula_cell)
 
-    def update_formula_result(self, formula_result: str) -> None:
-        self.__formula_result = formula_result
+    def remove_dependent_formula_cell(self, formula_cell: Tuple[int, int]) -> None:
+        if formula_cell in self.__dependent_formula_cells:
+            self.__dependent_formula_cells.remove(formula_cell)
+            if not self.__dependent_formula_cells:
+                self.__dependent_formula_cells = NO_DEPENDENT_CELLS
+
+    def set_calculated_value(self, value: CellValue) -> None:
+        """
+        Sets the value of the cell to the result of its formula.
+        """
+        self.__value = value
+        self.__is_calculated = True
+
+    def is_empty(self) -> bool:
+        """
+        Returns True if the cell holds nothing that
+        is different from a cell that was never written.
+        """
+        return (self.__text == "" and self.__value is None and self.__style_id == DEFAULT_STYLE_ID and
+                not self.__dependent_formula_cells)
 
     def __str__(self) -> str:
-        return ("text: " + self.__text + ", formula result: " + self.__formula_result + ", color: " + str(self.__color) +
-                ", font: " + str(self.__font) + ", dependent cells: " + str(self.__dependent_formula_cells))
+        return ("text: " + self.__text + ", value: " + repr(self.__value) + ", color: " + self.get_color() +
+                ", font: " + self.get_font() + ", dependent cells: " + str(self.__dependent_formula_cells))
 
     def __repr__(self) -> str:
         return self.__str__()
 
 
+
+
+def new_cells(texts: List[str], values: Sequence[CellValue]) -> List[Cell]:
+    """
+    Makes a cell for every text and its value at once, used when a file is imported.
+    the cells are restored directly, without setting the attributes of an empty cell first.
+    """
+    cells = []
+    for text, value in zip(texts, values):
+        cell = Cell.__new__(Cell)
+        cell.restore(text, value, False, DEFAULT_STYLE_ID, NO_DEPENDENT_CELLS)
+        cells.append(cell)
+    return cells
@@ -0,0 +1,43 @@
+import re
+from typing import Optional, Tuple
+
+CELL_ADDRESS_PATTERN = re.compile('([A-Z]+)([0-9]+)')
+
+
+def get_column_index(column_name: str) -> int:
+    """
+    Returns the index of a column from its letters, for example A -> 1, Z -> 26, AA -> 27.
+    """
+    index = 0
+    for letter in column_name:
+        index = index * 26 + ord(letter) - ord('A') + 1
+    return index
+
+
+def get_column_name(column_index: int) -> str:
+    """
+    Returns the letters of a column from its index, for example 1 -> A, 26 -> Z, 27 -> AA.
+    """
+    column_name = ""
+    while column_index > 0:
+        column_index, remainder = divmod(column_index - 1, 26)
+        column_name = chr(ord('A') + remainder) + column_name
+    return column_name
+
+
+def get_cell_name(cell_loc: Tuple[int, int]) -> str:
+    """
+    Returns the name of the cell in the formulas syntax, for example (3, 2) -> B3.
+    """
+    return get_column_name(cell_loc[1]) + str(cell_loc[0])
+
+
+def get_cell_loc(cell_name: str) -> Optional[Tuple[int, int]]:
+    """
+    Returns the (row, col) of a cell from its name, for example B3 -> (3, 2),
+    or None if it is not a cell name.
+    """
+    match = CELL_ADDRESS_PATTERN.fullmatch(cell_name.strip().upper())
+    if match is None:
+        return None
+    return int(match.group(2)), get_column_index(match.group(1))
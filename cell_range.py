@@ -0,0 +1,119 @@
+import re
+from typing import Iterator, Optional, Tuple, Union
+
+from cell_address import get_column_index, get_column_name
+
+CELL_RANGE_PATTERN = re.compile('([A-Z]+)([0-9]+):([A-Z]+)([0-9]+)')
+COLUMNS_RANGE_PATTERN = re.compile('([A-Z]+):([A-Z]+)')
+ROWS_RANGE_PATTERN = re.compile('([0-9]+):([0-9]+)')
+
+
+class CellRange:
+    """
+    The CellRange class is a rectangle of cells that a formula reads, for example A1:C100.
+    a range of whole columns (A:C) has no last row, and a range of whole rows (1:3)
+    has no last column, they reach the end of the sheet however much it grows.
+    a range is never expanded into its cells: the dependency graph keeps it as one edge,
+    and its cells are aggregated column by column in the sheet's numeric columns.
+    The range has the following attributes:
+    - first_row, first_col: the top left cell
+    - last_row, last_col: the bottom right cell, None for whole columns or whole rows
+    """
+
+    def __init__(self, first_row: int, first_col: int, last_row: Optional[int], last_col: Optional[int]) -> None:
+        self.__first_row = first_row
+        self.__first_col = first_col
+        self.__last_row = last_row
+        self.__last_col = last_col
+
+    def get_first_row(self) -> int:
+        return self.__first_row
+
+    def get_first_col(self) -> int:
+        return self.__first_col
+
+    def get_last_row(self) -> Optional[int]:
+        return self.__last_row
+
+    def get_last_col(self) -> Optional[int]:
+        return self.__last_col
+
+    def is_bounded(self) -> bool:
+        """
+        Returns False for whole columns and whole rows.
+        """
+        return self.__last_row is not None and self.__last_col is not None
+
+    def contains(self, cell_loc: Tuple[int, int]) -> bool:
+        return (self.__first_row <= cell_loc[0] and (self.__last_row is None or cell_loc[0] <= self.__last_row) and
+                self.__first_col <= cell_loc[1] and (self.__last_col is None or cell_loc[1] <= self.__last_col))
+
+    def clip(self, last_row: int, last_col: int) -> Tuple[int, int, int, int]:
+        """
+        Returns the first and last row and column of the range,
+        whole columns and rows end at the given last row and column.
+        """
+        return (self.__first_row, self.__first_col,
+                last_row if self.__last_row is None else self.__last_row,
+                last_col if self.__last_col is None else self.__last_col)
+
+    def get_size(self, last_row: int, last_col: int) -> int:
+        """
+        Returns the number of cells in the range, when it is clipped to the given last row and column.
+        """
+        first_row, first_col, clipped_last_row, clipped_last_col = self.clip(last_row, last_col)
+        return max(0, clipped_last_row - first_row + 1) * max(0, clipped_last_col - first_col + 1)
+
+    def iter_cells(self, last_row: int, last_col: int) -> Iterator[Tuple[int, int]]:
+        """
+        Goes over the cells of the range one at a time, without making a list of them,
+        whole columns and rows end at the given last row and column.
+        """
+        first_row, first_col, clipped_last_row, clipped_last_col = self.clip(last_row, last_col)
+        for row in range(first_row, clipped_last_row + 1):
+            for col in range(first_col, clipped_last_col + 1):
+                yield row, col
+
+    def __eq__(self, other: object) -> bool:
+        return (isinstance(other, CellRange) and
+                (self.__first_row, self.__first_col, self.__last_row, self.__last_col) ==
+                (other.get_first_row(), other.get_first_col(), other.get_last_row(), other.get_last_col()))
+
+    def __hash__(self) -> int:
+        return hash((self.__first_row, self.__first_col, self.__last_row, self.__last_col))
+
+    def __str__(self) -> str:
+        if self.__last_row is None:
+            return get_column_name(self.__first_col) + ":" + get_column_name(self.__last_col or 0)
+        if self.__last_col is None:
+            return str(self.__first_row) + ":" + str(self.__last_row)
+        return (get_column_name(self.__first_col) + str(self.__first_row) + ":" +
+                get_column_name(self.__last_col) + str(self.__last_row))
+
+    def __repr__(self) -> str:
+        return "CellRange(" + str(self) + ")"
+
+
+# what a formula reads: a single cell or a range of cells
+Dependency = Union[Tuple[int, int], CellRange]
+
+
+def parse_cell_range(text: str) -> Optional[CellRange]:
+    """
+    Returns the range of a text like A1:C100, A:C (whole columns) or 1:3 (whole rows),
+    or None if it is not a range. the corners can be given in any order.
+    """
+    match = CELL_RANGE_PATTERN.fullmatch(text)
+    if match is not None:
+        rows = sorted((int(match.group(2)), int(match.group(4))))
+        cols = sorted((get_column_index(match.group(1)), get_column_index(match.group(3))))
+        return CellRange(rows[0], cols[0], rows[1], cols[1])
+    match = COLUMNS_RANGE_PATTERN.fullmatch(text)
+    if match is not None:
+        cols = sorted((get_column_index(match.group(1)), get_column_index(match.group(2))))
+        return CellRange(1, cols[0], None, cols[1])
+    match = ROWS_RANGE_PATTERN.fullmatch(text)
+    if match is not None:
+        rows = sorted((int(match.group(1)), int(match.group(2))))
+        return CellRange(rows[0], 1, rows[1], None)
+    return None
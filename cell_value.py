@@ -0,0 +1,62 @@
+from typing import Union
+
+CELL_ERROR_TEXT = "ERROR!"
+
+
+class CellError:
+    """
+    The CellError class is the value of a formula that could not be calculated
+    (a bad operand, a circular reference). it is not a number, so formulas
+    that read it can not be calculated either.
+    The error has the following attributes:
+    - text: the text the error is shown as
+    """
+
+    def __init__(self, text: str = CELL_ERROR_TEXT) -> None:
+        self.__text = text
+
+    def get_text(self) -> str:
+        return self.__text
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, CellError) and other.get_text() == self.__text
+
+    def __hash__(self) -> int:
+        return hash(self.__text)
+
+    def __str__(self) -> str:
+        return self.__text
+
+    def __repr__(self) -> str:
+        return "CellError(" + repr(self.__text) + ")"
+
+
+ERROR_VALUE = CellError()
+
+# the value of a cell: a number, a text, an error, or None if the cell is empty
+CellValue = Union[float, str, CellError, None]
+
+
+def parse_value(text: str) -> CellValue:
+    """
+    Returns the value of a cell that holds the text (and not a formula),
+    a number if the text is a number. the text is parsed only here, when it is written.
+    """
+    if text == "":
+        return None
+    try:
+        return float(text)
+    except ValueError:
+        return text
+
+
+def format_value(value: CellValue) -> str:
+    """
+    Returns the text of a value, as it is shown and saved.
+    numbers are written with all their digits, so parsing the text gives back the same number.
+    """
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return repr(float(value))
+    return str(value)
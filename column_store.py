@@ -0,0 +1,215 @@
+from typing import Dict, Optional, Set
+
+import numpy as np
+
+from aggregate_index import ColumnAggregateIndex
+from aggregate_index import AGGREGATE_SUM, AGGREGATE_AVG, AGGREGATE_MIN, AGGREGATE_MAX
+
+INITIAL_COLUMN_CAPACITY = 64
+# ranges shorter than this are aggregated by slicing, building an index does not pay off for them
+INDEX_MIN_RANGE_LENGTH = 8192
+
+
+class NumericColumnStore:
+    """
+    The NumericColumnStore class mirrors the numeric values of the cells
+    in a typed array per column, so ranges of a column can be aggregated
+    with one vectorized operation instead of cell by cell.
+    The store has the following attributes:
+    - values: for each column, an array of the cells values as floats
+    - valid: for each column, a mask that is True where the cell holds a number
+    (cells that are empty or hold text are not valid)
+    - errors: for each column, a mask that is True where the cell holds an error,
+    so the ranges that skip the cells that are not numbers still fail on errors
+    - indexes: the aggregate indexes of the columns that long ranges were aggregated over,
+    they are kept up to date on every change (only if use_aggregate_index is True)
+    - is_shared: True once the arrays were shared with a snapshot, then a column is copied
+    the first time it is changed after the snapshot
+    - owned_columns: the columns that were copied since the last snapshot, only they are changed in place
+    """
+
+    def __init__(self, use_aggregate_index: bool = True) -> None:
+        self.__values: Dict[int, np.ndarray] = {}
+        self.__valid: Dict[int, np.ndarray] = {}
+        self.__errors: Dict[int, np.ndarray] = {}
+        self.__use_aggregate_index = use_aggregate_index
+        self.__indexes: Dict[int, ColumnAggregateIndex] = {}
+        self.__is_shared = False
+        self.__owned_columns: Set[int] = set()
+
+    def set_number(self, row: int, col: int, value: Optional[float], is_error: bool = False) -> None:
+        """
+        Sets the value of a cell that is already known as a number,
+        None means the cell does not hold a number, is_error tells that it holds an error.
+        """
+        if self.__is_shared and col not in self.__owned_columns:
+            self.__own_column(col)
+        if value is None:
+            self.clear_value(row, col)
+            if is_error:
+                self.__ensure_capacity(col, row)
+                self.__errors[col][row] = True
+            return
+        self.__ensure_capacity(col, row)
+        self.__values[col][row] = value
+        self.__valid[col][row] = True
+        self.__errors[col][row] = False
+        index = self.__indexes.get(col)
+        if index is not None:
+            index.update(row, value)
+
+    def set_numbers(self, col: int, rows: np.ndarray, values: np.ndarray) -> None:
+        """
+        Sets the values of many cells of a column at once, all of them numbers.
+        """
+        if self.__is_shared and col not in self.__owned_columns:
+            self.__own_column(col)
+        self.__ensure_capacity(col, int(rows.max()))
+        self.__values[col][rows] = values
+        self.__valid[col][rows] = True
+        self.__errors[col][rows] = False
+        # the index is built again the next time a long range is aggregated
+        self.__indexes.pop(col, None)
+
+    def clear_value(self, row: int, col: int) -> None:
+        if self.__is_shared and col not in self.__owned_columns:
+            self.__own_column(col)
+        valid = self.__valid.get(col)
+        if valid is not None and row < len(valid):
+            valid[row] = False
+            self.__errors[col][row] = False
+            index = self.__indexes.get(col)
+            if index is not None:
+                index.update(row, None)
+
+    def get_value(self, row: int, col: int) -> Optional[float]:
+        """
+        Returns the value of the cell, or None if it does not hold a number.
+        """
+        valid = self.__valid.get(col)
+        if valid is None or row >= len(valid) or not valid[row]:
+            return None
+        return float(self.__values[col][row])
+
+    def aggregate(self, function: str, col: int, first_row: int, last_row: int,
+                  skip_non_numbers: bool = False) -> Optional[float]:
+        """
+        Calculates SUM, AVG, MIN or MAX over the rows first_row..last_row (inclusive) of a column.
+        returns None if the range is empty or one of its cells does not hold a number.
+        with skip_non_numbers the cells that do not hold a number are left out (and the range
+        may reach past the column), None is returned only if none of the cells holds a number.
+        """
+        if skip_non_numbers:
+            return self.__aggregate_numbers(function, col, first_row, last_row)
+        valid = self.__valid.get(col)
+        if valid is None or first_row > last_row or last_row >= len(valid):
+            return None
+        index = self.__indexes.get(col)
+        if index is None and self.__use_aggregate_index and last_row - first_row + 1 >= INDEX_MIN_RANGE_LENGTH:
+            index = ColumnAggregateIndex(self.__values[col], valid)
+            self.__indexes[col] = index
+        if index is not None:
+            return index.query(function, first_row, last_row)
+        if not valid[first_row:last_row + 1].all():
+            return None
+        values = self.__values[col][first_row:last_row + 1]
+        if function == AGGREGATE_SUM:
+            return float(values.sum())
+        if function == AGGREGATE_AVG:
+            return float(values.sum()) / len(values)
+        if function == AGGREGATE_MIN:
+            return float(values.min())
+        if function == AGGREGATE_MAX:
+            return float(values.max())
+        return None
+
+    def count_numbers(self, col: int, first_row: int, last_row: int) -> int:
+        """
+        Returns how many of the rows first_row..last_row (inclusive) of a column hold a number.
+        """
+        valid = self.__valid.get(col)
+        if valid is None:
+            return 0
+        return int(np.count_nonzero(valid[first_row:last_row + 1]))
+
+    def has_errors(self, col: int, first_row: int, last_row: int) -> bool:
+        errors = self.__errors.get(col)
+        return errors is not None and bool(errors[first_row:last_row + 1].any())
+
+    def __aggregate_numbers(self, function: str, col: int, first_row: int, last_row: int) -> Optional[float]:
+        valid = self.__valid.get(col)
+        if valid is None or first_row > last_row:
+            return None
+        values = self.__values[col][first_row:last_row + 1][valid[first_row:last_row + 1]]
+        if len(values) == 0:
+            return None
+        if function == AGGREGATE_SUM:
+            return float(values.sum())
+        if function == AGGREGATE_AVG:
+            return float(values.sum()) / len(values)
+        if function == AGGREGATE_MIN:
+            return float(values.min())
+        if function == AGGREGATE_MAX:
+            return float(values.max())
+        return None
+
+    def snapshot(self) -> "NumericColumnStore":
+        """
+        Returns a store that shares the arrays of the columns with this one, without copying them.
+        after it both stores copy a column the first time they change it, so neither sees the changes
+        of the other. the indexes are not shared, the snapshot builds its own when it needs them.
+        """
+        store = NumericColumnStore(self.__use_aggregate_index)
+        store.__values = self.__values.copy()
+        store.__valid = self.__valid.copy()
+        store.__errors = self.__errors.copy()
+        store.__is_shared = True
+        self.__is_shared = True
+        self.__owned_columns = set()
+        return store
+
+    def __own_column(self, col: int) -> None:
+        """
+        Copies the arrays of a column that may be shared with a snapshot, before it is changed.
+        the index of the column is kept, it has its own copy of the values.
+        """
+        self.__owned_columns.add(col)
+        if col in self.__values:
+            self.__values[col] = self.__values[col].copy()
+            self.__valid[col] = self.__valid[col].copy()
+            self.__errors[col] = self.__errors[col].copy()
+
+    def clear(self) -> None:
+        self.__values = {}
+        self.__valid = {}
+        self.__errors = {}
+        self.__indexes = {}
+        self.__is_shared = False
+        self.__owned_columns = set()
+
+    def __ensure_capacity(self, col: int, row: int) -> None:
+        """
+        Makes sure the arrays of the column can hold the row,
+        growing them by doubling so appending rows is amortized O(1).
+        """
+        values = self.__values.get(col)
+        if values is None:
+            capacity = max(INITIAL_COLUMN_CAPACITY, row + 1)
+            self.__values[col] = np.zeros(capacity, dtype=np.float64)
+            self.__valid[col] = np.zeros(capacity, dtype=np.bool_)
+            self.__errors[col] = np.zeros(capacity, dtype=np.bool_)
+            return
+        if row < len(values):
+            return
+        # the index is built again, for the new size, the next time a long range is aggregated
+        self.__indexes.pop(col, None)
+        capacity = max(2 * len(values), row + 1)
+        new_values = np.zeros(capacity, dtype=np.float64)
+        new_valid = np.zeros(capacity, dtype=np.bool_)
+        new_values[:len(values)] = values
+        new_valid[:len(values)] = self.__valid[col]
+        new_errors = np.zeros(capacity, dtype=np.bool_)
+        new_errors[:len(values)] = self.__errors[col]
+        self.__values[col] = new_values
+        self.__valid[col] = new_valid
+        self.__errors[col] = new_errors
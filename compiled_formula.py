@@ -0,0 +1,84 @@
+from typing import Any, List, Optional
+
+from cell_range import CellRange
+from math_expression import MathExpression
+from sheet_reference import FormulaDependency, SheetReference
+
+
+class CompiledFormula:
+    """
+    The CompiledFormula class represents the text of a cell after it went
+    through the parser's compile step, so it can be evaluated again and again
+    without re-tokenizing the text.
+    The compiled formula has the following attributes:
+    - text: the text the formula was compiled from
+    - function: the formula function (MATH, SUM...) or None if the text is not a formula
+    - operands: the resolved operands (index tuples, references to other sheets, numbers and operators),
+      or None if the text is a formula that could not be compiled
+    - cell_range: the range of a range formula (for example SUM(A1:C5) or SUM(A:A)),
+      it is aggregated without going over the cells one by one
+    - range_reference: the range with the name of its sheet, if the range is in another sheet (SUM(Sheet2!A:A))
+    - math_expression: the compiled program of a MATH formula
+    - dependencies: the cells the formula reads, a range formula reads its range as one dependency
+    - sheet_references: the dependencies that are in other sheets
+    """
+
+    def __init__(self,
+                 text: str,
+                 function: Optional[str] = None,
+                 operands: Optional[List[Any]] = None,
+                 cell_range: Optional[CellRange] = None,
+                 math_expression: Optional[MathExpression] = None,
+                 range_sheet_name: Optional[str] = None) -> None:
+        self.__text = text
+        self.__function = function
+        self.__operands = operands
+        self.__cell_range = cell_range
+        self.__range_reference: Optional[SheetReference] = None
+        self.__math_expression = math_expression
+        self.__dependencies: List[FormulaDependency] = []
+        if cell_range is not None and range_sheet_name is not None:
+            self.__range_reference = SheetReference(range_sheet_name, cell_range)
+            self.__dependencies = [self.__range_reference]
+        elif cell_range is not None:
+            self.__dependencies = [cell_range]
+        elif operands is not None:
+            self.__dependencies = [item for item in operands if isinstance(item, (tuple, SheetReference))]
+        self.__sheet_references = [item for item in self.__dependencies if isinstance(item, SheetReference)]
+
+    def get_text(self) -> str:
+        return self.__text
+
+    def get_function(self) -> Optional[str]:
+        return self.__function
+
+    def get_operands(self) -> Optional[List[Any]]:
+        return self.__operands
+
+    def get_cell_range(self) -> Optional[CellRange]:
+        return self.__cell_range
+
+    def get_range_reference(self) -> Optional[SheetReference]:
+        return self.__range_reference
+
+    def get_math_expression(self) -> Optional[MathExpression]:
+        return self.__math_expression
+
+    def get_dependencies(self) -> List[FormulaDependency]:
+        return self.__dependencies
+
+    def get_sheet_references(self) -> List[SheetReference]:
+        return self.__sheet_references
+
+    def is_formula(self) -> bool:
+        return self.__function is not None
+
+    def is_valid(self) -> bool:
+        return self.__operands is not None
+
+    def __str__(self) -> str:
+        return ("text: " + self.__text + ", function: " + str(self.__function) +
+                ", operands: " + str(self.__operands))
+
+    def __repr__(self) -> str:
+        return self.__str__()
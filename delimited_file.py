@@ -0,0 +1,122 @@
+import csv
+import itertools
+import os
+from typing import Callable, Iterator, List, Optional, TextIO, Tuple
+
+import numpy as np
+
+from cell import new_cells
+from cell_value import CellValue, parse_value
+from sheet_storage import SheetStorage
+from style_table import DEFAULT_STYLE_ID
+
+# the delimiter of every file extension that is read and written as delimited text
+DELIMITERS = {".csv": ",", ".tsv": "\t"}
+# the rows of a file are read, and their types inferred, this many at a time
+CHUNK_ROWS = 8192
+# the progress of reading a file is reported once every this many lines
+PROGRESS_REPORT_LINES = 65536
+
+
+def is_delimited_file(file_name: str) -> bool:
+    return os.path.splitext(file_name)[1].lower() in DELIMITERS
+
+
+def get_delimiter(file_name: str) -> str:
+    return DELIMITERS.get(os.path.splitext(file_name)[1].lower(), ",")
+
+
+def read_delimited_file(file_name: str,
+                        storage: SheetStorage,
+                        is_formula: Callable[[str], bool],
+                        on_progress: Optional[Callable[[int, int], None]] = None) -> List[Tuple[int, int]]:
+    """
+    Reads a csv or tsv file into the storage, a chunk of CHUNK_ROWS rows at a time,
+    so only one chunk of the file is in memory. the first line goes to row 1 and the first field to column 1.
+    the type of every column of a chunk is inferred at once: if all its fields are numbers they are
+    converted together and mirrored to the numeric columns with one vectorized write,
+    only the columns that mix numbers and text are parsed field by field.
+    the formulas are stored as text, returns their cells so the sheet can evaluate them.
+    on_progress is called with the number of characters read so far and the size of the file.
+    """
+    file_size = os.path.getsize(file_name)
+    formula_cells: List[Tuple[int, int]] = []
+    with open(file_name, 'r', newline='', encoding='utf-8') as file:
+        reader = csv.reader(_read_lines(file, file_size, on_progress), delimiter=get_delimiter(file_name))
+        first_row = 1
+        while True:
+            chunk = list(itertools.islice(reader, CHUNK_ROWS))
+            if not chunk:
+                break
+            for col, fields in enumerate(itertools.zip_longest(*chunk, fillvalue=""), start=1):
+                _store_column(storage, col, first_row, fields, is_formula, formula_cells)
+            first_row += len(chunk)
+    if on_progress is not None:
+        on_progress(file_size, file_size)
+    return formula_cells
+
+
+def _read_lines(file: TextIO, file_size: int, on_progress: Optional[Callable[[int, int], None]]) -> Iterator[str]:
+    read_characters = 0
+    for line_number, line in enumerate(file):
+        read_characters += len(line)
+        if on_progress is not None and line_number % PROGRESS_REPORT_LINES == 0:
+            on_progress(min(read_characters, file_size), file_size)
+        yield line
+
+
+def _store_column(storage: SheetStorage,
+                  col: int,
+                  first_row: int,
+                  fields: Tuple[str, ...],
+                  is_formula: Callable[[str], bool],
+                  formula_cells: List[Tuple[int, int]]) -> None:
+    """
+    Stores the fields of one column of a chunk, the empty fields are not stored.
+    the whole column is converted to a numpy array of numbers at once (numpy accepts the texts
+    that float does), a column that is not all numbers fails and is then parsed field by field.
+    """
+    rows = [first_row + i for i, text in enumerate(fields) if text]
+    if not rows:
+        return
+    texts = [text for text in fields if text]
+    try:
+        numbers: Optional[np.ndarray] = np.array(texts, dtype=np.float64)
+    except ValueError:
+        numbers = None
+    if numbers is not None:
+        # the cells keep python floats, the array goes to the numeric columns as it is
+        storage.set_column_cells(col, rows, new_cells(texts, numbers.tolist()), numbers)
+        return
+    values: List[CellValue] = []
+    for row, text in zip(rows, texts):
+        values.append(parse_value(text))
+        if is_formula(text):
+            formula_cells.append((row, col))
+    storage.set_column_cells(col, rows, new_cells(texts, values))
+
+
+def write_delimited_rows(storage: SheetStorage, stream: TextIO, delimiter: str = ",") -> None:
+    """
+    Writes the values of the sheet one row at a time, without the headers row and column,
+    the formulas are written as their results. the empty rows and columns after
+    the last populated cell are not written.
+    """
+    row_count = 1
+    column_count = 1
+    for cell_loc, cell in storage.get_populated_cells():
+        row_count = max(row_count, cell_loc[0] + 1)
+        column_count = max(column_count, cell_loc[1] + 1)
+    writer = csv.writer(stream, delimiter=delimiter)
+    for row in range(1, row_count):
+        writer.writerow([storage.get_cell(row, col).get_formula_result() for col in range(1, column_count)])
+
+
+def write_delimited_file(file_name: str, storage: SheetStorage) -> None:
+    """
+    Writes the values of the sheet to a csv or tsv file, next to the old one and then replaces it.
+    """
+    temp_file_name = file_name + ".tmp"
+    with open(temp_file_name, 'w', newline='', encoding='utf-8') as file:
+        write_delimited_rows(storage, file, get_delimiter(file_name))
+    os.replace(temp_file_name, file_name)
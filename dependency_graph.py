@@ -0,0 +1,291 @@
+from collections import deque
+from typing import Callable, Deque, Dict, Hashable, Iterable, List, Optional, Set, Tuple, TypeVar
+
+from binary_workbook import BinaryWorkbookReader
+from cell_range import CellRange
+
+# a node of a graph: a cell of a sheet, or a cell of a workbook
+Node = TypeVar('Node', bound=Hashable)
+
+
+class DependencyGraph:
+    """
+    The DependencyGraph class keeps the dependencies between the cells of a sheet.
+    The graph has the following attributes:
+    - precedents: for each formula cell, the cells it reads (forward edges)
+    - dependents: for each cell, the formula cells that read it (reverse edges)
+    - base: the binary workbook the sheet was opened from, if any. the edges that were
+      not changed since it was opened are looked up in its adjacency sections, and the
+      edges of a cell are copied to the dictionaries above only when they are changed
+    - range_precedents: for each formula cell, the ranges it reads. a range is one edge,
+      however many cells it covers, so its cells are not kept in the dictionaries above
+    - range_dependents: for each range, the formula cells that read it
+    - column_ranges, row_ranges: the ranges that cover each column (whole rows are kept
+      by the rows they cover instead), to find the ranges a cell is in without going over all of them
+    """
+
+    def __init__(self) -> None:
+        self.__precedents: Dict[Tuple[int, int], Set[Tuple[int, int]]] = {}
+        self.__dependents: Dict[Tuple[int, int], Set[Tuple[int, int]]] = {}
+        self.__base: Optional[BinaryWorkbookReader] = None
+        self.__range_precedents: Dict[Tuple[int, int], List[CellRange]] = {}
+        self.__range_dependents: Dict[CellRange, Set[Tuple[int, int]]] = {}
+        self.__column_ranges: Dict[int, Set[CellRange]] = {}
+        self.__row_ranges: Dict[int, Set[CellRange]] = {}
+
+    def attach_base(self, base: BinaryWorkbookReader) -> None:
+        self.clear()
+        self.__base = base
+        for cell, cell_range in base.get_range_precedents():
+            self.__range_precedents.setdefault(cell, []).append(cell_range)
+            self.__add_range_dependent(cell_range, cell)
+
+    def set_precedents(self,
+                       cell: Tuple[int, int],
+                       precedents: Iterable[Tuple[int, int]]
+                       ) -> Tuple[Set[Tuple[int, int]], Set[Tuple[int, int]]]:
+        """
+        Replaces the edges of a formula cell with the given precedents,
+        called every time the formula of the cell is entered again.
+        returns the precedents that were removed and the ones that were added.
+        """
+        new_precedents = set(precedents)
+        old_precedents = self.get_precedents(cell)
+        removed = old_precedents - new_precedents
+        added = new_precedents - old_precedents
+        for precedent in removed:
+            dependents = self.__get_changeable_dependents(precedent)
+            dependents.discard(cell)
+            if not dependents and self.__base is None:
+                del self.__dependents[precedent]
+        for precedent in added:
+            self.__get_changeable_dependents(precedent).add(cell)
+        if new_precedents or self.__base is not None:
+            # with a base, an empty set means the cell's edges in the base were removed
+            self.__precedents[cell] = new_precedents
+        else:
+            self.__precedents.pop(cell, None)
+        return removed, added
+
+    def get_precedents(self, cell: Tuple[int, int]) -> Set[Tuple[int, int]]:
+        precedents = self.__precedents.get(cell)
+        if precedents is not None:
+            return precedents
+        if self.__base is not None:
+            return set(self.__base.get_precedents(cell))
+        return set()
+
+    def set_range_precedents(self, cell: Tuple[int, int], ranges: Iterable[CellRange]) -> None:
+        """
+        Replaces the ranges a formula cell reads, called with its other precedents.
+        """
+        for cell_range in self.__range_precedents.pop(cell, []):
+            dependents = self.__range_dependents[cell_range]
+            dependents.discard(cell)
+            if not dependents:
+                del self.__range_dependents[cell_range]
+                for ranges_of_line in self.__get_range_index(cell_range):
+                    ranges_of_line.discard(cell_range)
+        new_ranges = list(dict.fromkeys(ranges))
+        if new_ranges:
+            self.__range_precedents[cell] = new_ranges
+        for cell_range in new_ranges:
+            self.__add_range_dependent(cell_range, cell)
+
+    def get_range_precedents(self, cell: Tuple[int, int]) -> List[CellRange]:
+        return self.__range_precedents.get(cell, [])
+
+    def get_all_range_precedents(self) -> List[Tuple[Tuple[int, int], CellRange]]:
+        """
+        Returns every formula cell and range it reads, to save them.
+        """
+        return [(cell, cell_range) for cell, ranges in self.__range_precedents.items() for cell_range in ranges]
+
+    def __add_range_dependent(self, cell_range: CellRange, cell: Tuple[int, int]) -> None:
+        dependents = self.__range_dependents.get(cell_range)
+        if dependents is None:
+            dependents = set()
+            self.__range_dependents[cell_range] = dependents
+            for ranges_of_line in self.__get_range_index(cell_range):
+                ranges_of_line.add(cell_range)
+        dependents.add(cell)
+
+    def __get_range_index(self, cell_range: CellRange) -> List[Set[CellRange]]:
+        """
+        Returns the sets of the columns the range covers,
+        or of the rows it covers if it is a range of whole rows.
+        """
+        first_row, first_col, last_row, last_col = cell_range.clip(0, 0)
+        if cell_range.get_last_col() is None:
+            return [self.__row_ranges.setdefault(row, set()) for row in range(first_row, last_row + 1)]
+        return [self.__column_ranges.setdefault(col, set()) for col in range(first_col, last_col + 1)]
+
+    def __get_ranges_of_cell(self, cell: Tuple[int, int]) -> List[CellRange]:
+        ranges = [cell_range for cell_range in self.__column_ranges.get(cell[1], ()) if cell_range.contains(cell)]
+        ranges.extend(cell_range for cell_range in self.__row_ranges.get(cell[0], ()) if cell_range.contains(cell))
+        return ranges
+
+    def __get_dirty_cells_in_range(self, cell_range: CellRange,
+                                   dirty: Set[Tuple[int, int]]) -> Iterable[Tuple[int, int]]:
+        """
+        Returns the dirty cells in the range, going over the range or over the dirty cells, whichever is smaller.
+        """
+        if cell_range.is_bounded() and cell_range.get_size(0, 0) <= len(dirty):
+            return [cell for cell in cell_range.iter_cells(0, 0) if cell in dirty]
+        return [cell for cell in dirty if cell_range.contains(cell)]
+
+    def get_dependents(self, cell: Tuple[int, int]) -> Set[Tuple[int, int]]:
+        """
+        Returns the formula cells that read the cell, directly or through a range.
+        """
+        dependents = self.__get_cell_dependents(cell)
+        if not self.__range_dependents:
+            return dependents
+        ranges = self.__get_ranges_of_cell(cell)
+        if not ranges:
+            return dependents
+        dependents = set(dependents)
+        for cell_range in ranges:
+            dependents |= self.__range_dependents[cell_range]
+        return dependents
+
+    def __get_cell_dependents(self, cell: Tuple[int, int]) -> Set[Tuple[int, int]]:
+        dependents = self.__dependents.get(cell)
+        if dependents is not None:
+            return dependents
+        if self.__base is not None:
+            return set(self.__base.get_dependents(cell))
+        return set()
+
+    def __get_changeable_dependents(self, cell: Tuple[int, int]) -> Set[Tuple[int, int]]:
+        dependents = self.__dependents.get(cell)
+        if dependents is None:
+            dependents = self.__get_cell_dependents(cell)
+            self.__dependents[cell] = dependents
+        return dependents
+
+    def clear(self) -> None:
+        self.__precedents = {}
+        self.__dependents = {}
+        self.__base = None
+        self.__range_precedents = {}
+        self.__range_dependents = {}
+        self.__column_ranges = {}
+        self.__row_ranges = {}
+
+    def get_dirty_cells(self, changed_cells: Iterable[Tuple[int, int]],
+                        already_dirty: Optional[Set[Tuple[int, int]]] = None) -> Set[Tuple[int, int]]:
+        """
+        Returns all the formula cells that depend on the changed cells,
+        directly or through other formula cells.
+        a changed cell is returned only if it depends on itself (a circular reference).
+        the cells in already_dirty are not returned and not gone through,
+        the cells that depend on them are already dirty too.
+        """
+        return find_dirty_cells(changed_cells, self.get_dependents, already_dirty)
+
+    def get_dirty_precedents(self, cells: Iterable[Tuple[int, int]],
+                             dirty: Set[Tuple[int, int]]) -> Set[Tuple[int, int]]:
+        """
+        Returns the given cells that are dirty, and the dirty cells they read,
+        directly or through other dirty cells. these are the cells that must be
+        evaluated before the given cells can be read.
+        """
+        needed = {cell for cell in cells if cell in dirty}
+        queue: Deque[Tuple[int, int]] = deque(needed)
+        while queue:
+            cell = queue.popleft()
+            precedents = list(self.get_precedents(cell))
+            for cell_range in self.get_range_precedents(cell):
+                precedents.extend(self.__get_dirty_cells_in_range(cell_range, dirty))
+            for precedent in precedents:
+                if precedent in dirty and precedent not in needed:
+                    needed.add(precedent)
+                    queue.append(precedent)
+        return needed
+
+    def topological_order(self,
+                          cells: Set[Tuple[int, int]]
+                          ) -> Tuple[List[Tuple[int, int]], List[Tuple[int, int]]]:
+        """
+        Orders the given cells so every cell comes after the cells it reads.
+        returns the ordered cells and the cells that could not be ordered,
+        because they are part of a circular reference or depend on one.
+        """
+        in_degree = _get_in_degrees(cells, self.get_dependents)
+        queue = deque(cell for cell in cells if in_degree[cell] == 0)
+        ordered = []
+        while queue:
+            cell = queue.popleft()
+            ordered.append(cell)
+            for dependent in self.get_dependents(cell):
+                if dependent in in_degree:
+                    in_degree[dependent] -= 1
+                    if in_degree[dependent] == 0:
+                        queue.append(dependent)
+        circular = sorted(cell for cell in cells if in_degree[cell] > 0)
+        return ordered, circular
+
+    def topological_levels(self,
+                           cells: Set[Tuple[int, int]]
+                           ) -> Tuple[List[List[Tuple[int, int]]], List[Tuple[int, int]]]:
+        """
+        Groups the given cells into levels, every cell comes in a level after
+        all the levels of the cells it reads, so the cells of a level do not depend
+        on each other and can be evaluated in any order, or at the same time.
+        returns the levels and the cells that could not be ordered,
+        because they are part of a circular reference or depend on one.
+        """
+        return order_in_levels(cells, self.get_dependents)
+
+
+def find_dirty_cells(changed_cells: Iterable[Node],
+                     get_dependents: Callable[[Node], Set[Node]],
+                     already_dirty: Optional[Set[Node]] = None) -> Set[Node]:
+    """
+    Returns all the cells that depend on the changed cells in a graph, directly or through other cells,
+    the cells in already_dirty are not returned and not gone through.
+    """
+    dirty: Set[Node] = set()
+    queue: Deque[Node] = deque(changed_cells)
+    while queue:
+        cell = queue.popleft()
+        for dependent in get_dependents(cell):
+            if dependent not in dirty and (already_dirty is None or dependent not in already_dirty):
+                dirty.add(dependent)
+                queue.append(dependent)
+    return dirty
+
+
+def order_in_levels(cells: Set[Node], get_dependents: Callable[[Node], Set[Node]]) -> Tuple[List[List[Node]], List[Node]]:
+    """
+    Groups the given cells of a graph into levels, every cell comes after the levels of the cells it reads.
+    returns the levels and the cells that are part of a circular reference or depend on one.
+    """
+    in_degree = _get_in_degrees(cells, get_dependents)
+    levels = []
+    level = [cell for cell in cells if in_degree[cell] == 0]
+    while level:
+        levels.append(level)
+        next_level = []
+        for cell in level:
+            for dependent in get_dependents(cell):
+                if dependent in in_degree:
+                    in_degree[dependent] -= 1
+                    if in_degree[dependent] == 0:
+                        next_level.append(dependent)
+        level = next_level
+    circular = sorted(cell for cell in cells if in_degree[cell] > 0)  # type: ignore
+    return levels, circular
+
+
+def _get_in_degrees(cells: Set[Node], get_dependents: Callable[[Node], Set[Node]]) -> Dict[Node, int]:
+    """
+    Returns the number of the given cells that every given cell reads.
+    """
+    in_degree = {cell: 0 for cell in cells}
+    for cell in cells:
+        for dependent in get_dependents(cell):
+            if dependent in in_degree:
+                in_degree[dependent] += 1
+    return in_degree
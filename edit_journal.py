@@ -0,0 +1,170 @@
+import json
+import os
+from typing import IO, List, Optional, Tuple
+
+JOURNAL_EXTENSION = ".journal"
+# saving folds the journal back into the workbook file once it has this many records
+JOURNAL_COMPACTION_RECORDS = 5000
+# a line of the journal that marks the records before it as saved
+JOURNAL_SAVE_MARKER = "saved"
+
+# a record of the journal: the cell, its text, color and font
+JournalRecord = Tuple[Tuple[int, int], str, str, str]
+
+
+class EditJournal:
+    """
+    The EditJournal class is a write-ahead journal of a workbook file, kept next to it.
+    every committed change of a cell (its text and style) is appended to it as one line,
+    and flushed right away, so saving only has to mark the records as saved and sync it,
+    and a crash loses at most the edit that was not committed yet. loading the workbook replays
+    the journal over it. the records after the last save marker are changes that were not saved,
+    they are removed when the sheet is closed without saving, so they are replayed only after a crash.
+    the first line of the journal has the size and modification time of the workbook file
+    it was written for, a journal that does not match the file (because the file was saved
+    again without it) is ignored.
+    The journal has the following attributes:
+    - base_file_name: the workbook file
+    - file: the journal file, it is opened when the first record is appended
+    - record_count: the number of records in the journal
+    - size: the size of the part of the journal that was read or written, without a record
+      that was not written completely. the journal is cut to it before appending to it
+    - saved_size, saved_record_count: the size and the records of the journal up to its last save marker
+    """
+
+    def __init__(self, base_file_name: str) -> None:
+        self.__base_file_name = os.path.abspath(base_file_name)
+        self.__file: Optional[IO[str]] = None
+        self.__record_count = 0
+        self.__size = 0
+        self.__saved_size = 0
+        self.__saved_record_count = 0
+
+    def get_base_file_name(self) -> str:
+        return self.__base_file_name
+
+    def get_record_count(self) -> int:
+        return self.__record_count
+
+    def read_records(self) -> List[JournalRecord]:
+        """
+        Reads the records of the journal of the workbook file, if it has a journal that matches it.
+        a record that was not written completely (the program crashed while writing it) ends the journal.
+        the records that are appended later are added after the ones that were read.
+        the records that were not saved (the program crashed before the sheet was saved or closed)
+        are read too, they are saved with the next save.
+        """
+        records: List[JournalRecord] = []
+        self.__record_count = 0
+        try:
+            with open(self.__get_file_name(), 'rb') as file:
+                header = file.readline()
+                if header.decode("utf-8") != self.__get_header():
+                    return records
+                size = saved_size = len(header)
+                saved_record_count = 0
+                for line in file:
+                    if not line.endswith(b"\n"):
+                        break
+                    entry = json.loads(line)
+                    size += len(line)
+                    if entry == JOURNAL_SAVE_MARKER:
+                        saved_size = size
+                        saved_record_count = len(records)
+                        continue
+                    row, col, text, color, font = entry
+                    records.append(((row, col), text, color, font))
+        except (OSError, ValueError):
+            if not records:
+                return records
+        self.__record_count = len(records)
+        self.__size = size
+        self.__saved_size = saved_size
+        self.__saved_record_count = saved_record_count
+        return records
+
+    def append(self, cell_loc: Tuple[int, int], text: str, color: str, font: str) -> None:
+        if self.__file is None:
+            self.__open()
+        self.__write_line(json.dumps([cell_loc[0], cell_loc[1], text, color, font]))
+        self.__record_count += 1
+
+    def sync(self) -> None:
+        """
+        Marks the records as saved and makes sure they are written to the disk,
+        called when the workbook is saved.
+        """
+        if self.__size > self.__saved_size:
+            if self.__file is None:
+                self.__open()
+            self.__write_line(json.dumps(JOURNAL_SAVE_MARKER))
+            self.__saved_size = self.__size
+            self.__saved_record_count = self.__record_count
+        if self.__file is not None:
+            os.fsync(self.__file.fileno())
+
+    def discard_unsaved(self) -> None:
+        """
+        Removes the records that were appended after the last save, called when the sheet
+        is closed or another file is loaded to it without saving it.
+        """
+        self.close()
+        if self.__size <= self.__saved_size:
+            return
+        if self.__saved_record_count == 0:
+            self.discard()
+            return
+        try:
+            os.truncate(self.__get_file_name(), self.__saved_size)
+        except OSError:
+            return
+        self.__size = self.__saved_size
+        self.__record_count = self.__saved_record_count
+
+    def close(self) -> None:
+        if self.__file is not None:
+            self.__file.close()
+            self.__file = None
+
+    def discard(self) -> None:
+        """
+        Deletes the journal, called when its records were written to the workbook file.
+        """
+        self.close()
+        self.__record_count = 0
+        self.__size = 0
+        self.__saved_size = 0
+        self.__saved_record_count = 0
+        try:
+            os.remove(self.__get_file_name())
+        except OSError:
+            pass
+
+    def __open(self) -> None:
+        """
+        Continues the journal that was read, or starts a new one for the workbook file as it is now.
+        """
+        if self.__record_count > 0:
+            os.truncate(self.__get_file_name(), self.__size)
+            self.__file = open(self.__get_file_name(), 'a')
+        else:
+            self.__file = open(self.__get_file_name(), 'w')
+            self.__size = 0
+            self.__write_line(self.__get_header().rstrip("\n"))
+            self.__saved_size = self.__size
+
+    def __write_line(self, line: str) -> None:
+        """
+        Appends a line and flushes it, json is ascii so its size is the number of its characters.
+        """
+        assert self.__file is not None
+        self.__file.write(line + "\n")
+        self.__file.flush()
+        self.__size += len(line) + 1
+
+    def __get_file_name(self) -> str:
+        return self.__base_file_name + JOURNAL_EXTENSION
+
+    def __get_header(self) -> str:
+        base_stat = os.stat(self.__base_file_name)
+        return json.dumps({"base_size": base_stat.st_size, "base_mtime": base_stat.st_mtime_ns}) + "\n"
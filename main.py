@@ -1,7 +1,19 @@
+import time
+
+# taken first, so the startup time counts the imports too
+START_TIME = time.perf_counter()
+
+import atexit
 import sys
 
-from sheet import Sheet
-from program_screen import ProgramScreen
+from batch_evaluation import EVAL_COMMAND, run_eval_command
+from recalculation_profiler import RecalculationProfiler, enable_default_profiler
+
+PROFILE_FLAG = "--profile"
+LAZY_FLAG = "--lazy"
+NO_SPLASH_FLAG = "--no-splash"
+STARTUP_TIME_FLAG = "--startup-time"
+WINDOW_FLAGS = (LAZY_FLAG, NO_SPLASH_FLAG, STARTUP_TIME_FLAG)
 
 
 class Program:
@@ -9,18 +21,42 @@ class Program:
     The main class of the program.
     """
 
-    def __init__(self) -> None:
-        self.__program_screen = ProgramScreen()
+    def __init__(self, lazy_evaluation: bool = False, show_welcome: bool = True,
+                 report_startup_time: bool = False) -> None:
+        # imported here so the batch evaluation does not import tkinter
+        from program_screen import ProgramScreen
+        self.__program_screen = ProgramScreen(lazy_evaluation, show_welcome,
+                                              print_startup_time if report_startup_time else _ignore_event)
 
     def start(self) -> None:
         self.__program_screen.show_screen()
 
 
+def _ignore_event() -> None:
+    pass
+
+
+def print_startup_time() -> None:
+    print("ready to edit after %.3f seconds" % (time.perf_counter() - START_TIME), file=sys.stderr)
+
+
+def print_profile_report(profiler: RecalculationProfiler) -> None:
+    print(profiler.format_report(), file=sys.stderr)
+
+
 if __name__ == "__main__":
-    if len(sys.argv) == 1:
-        program = Program()
+    arguments = sys.argv[1:]
+    if PROFILE_FLAG in arguments:
+        arguments.remove(PROFILE_FLAG)
+        atexit.register(print_profile_report, enable_default_profiler())
+    if all(argument in WINDOW_FLAGS for argument in arguments):
+        program = Program(lazy_evaluation=LAZY_FLAG in arguments,
+                          show_welcome=NO_SPLASH_FLAG not in arguments,
+                          report_startup_time=STARTUP_TIME_FLAG in arguments)
         program.start()
-    elif sys.argv[1] == "--help":
+    elif arguments[0] == EVAL_COMMAND:
+        sys.exit(run_eval_command(arguments[1:]))
+    elif arguments[0] == "--help":
         print(
               "To SUM, MIN, AVG and MAX use the following syntax:\n"
               "for an operation on a range of cells(can be executed in rows and in columns)\n"
@@ -28,7 +64,24 @@ if __name__ == "__main__":
               "for an operation on a list of cells:\n"
               " SUM(A1, A2, A3), MIN(A1, C7, J8), AVG(D4, A2, F6), MAX(B7, A2, A3))\n"
               "To make mathematical calculations(between cells and numbers) function use the following syntax:\n"
-              "MATH(1+2*3/4-5) or MATH(1+A2*3/4-5, 1+B7*3/4-C9)\n"
-              "do not use spaces between the cells, the operator, parentheses and the numbers\n")
+              "MATH(1+2*3/4-5) or MATH((1+A2)*3/-4-C9)\n"
+              "do not use spaces between the cells, the operator, parentheses and the numbers\n"
+              "\n"
+              "To read a cell or a range of another sheet of the workbook, put the name of the sheet before it:\n"
+              "MATH(Sheet2!A1*2), SUM(Sheet2!A1:A5), SUM(Sheet2!A:A)\n"
+              "save to a name ending with .mxlw to save all the sheets, a workbook opens only the sheet it shows\n"
+              "\n"
+              "To recalculate saved sheets without opening the window:\n"
+              "python main.py eval FILE... [--out OUT] [--cells A1,B2,Sheet2!C3] [--workers N]\n"
+              "the results are written as csv to stdout, to OUT, or to OUT/<file name>.csv for many files (in.txt.csv)\n"
+              "\n"
+              "add --profile to print a report of the recalculation (cascades, slow formulas,\n"
+              "parse cache hits) when the program exits, for example: python main.py --profile eval FILE\n"
+              "\n"
+              "python main.py --lazy opens the window with lazy evaluation: an edit only marks the formulas\n"
+              "that depend on it, and they are recalculated when they are shown or saved\n"
+              "\n"
+              "python main.py --no-splash opens the window without the welcome window,\n"
+              "and --startup-time prints how long it took until the sheet could be edited\n")
 
 
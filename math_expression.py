@@ -0,0 +1,154 @@
+import operator
+import re
+from typing import Any, Callable, List, Optional, Tuple, Union
+
+from cell_address import get_column_index
+from sheet_reference import SheetReference
+
+# the instructions of a compiled program
+PUSH_NUMBER = 0
+PUSH_CELL = 1
+ADD = 2
+SUBTRACT = 3
+MULTIPLY = 4
+DIVIDE = 5
+NEGATE = 6
+
+BINARY_OPERATORS = {"+": ADD, "-": SUBTRACT, "*": MULTIPLY, "/": DIVIDE}
+BINARY_FUNCTIONS = {ADD: operator.add, SUBTRACT: operator.sub, MULTIPLY: operator.mul, DIVIDE: operator.truediv}
+OPERATORS_PRECEDENCE = {ADD: 1, SUBTRACT: 1, MULTIPLY: 2, DIVIDE: 2, NEGATE: 3}
+LEFT_PARENTHESIS = -1
+
+TOKEN_PATTERN = re.compile(r'\s*(?:(\d+\.?\d*(?:[eE][-+]?\d+)?|\.\d+(?:[eE][-+]?\d+)?)|'
+                           r'(?:([A-Za-z_][A-Za-z0-9_]*)!)?([A-Z]+)([0-9]+)|(\S))')
+
+# a cell an expression reads: a cell of its own sheet, or a cell of another sheet (Sheet2!A1)
+CellOperand = Union[Tuple[int, int], SheetReference]
+Instruction = Tuple[int, Union[float, CellOperand, None]]
+
+
+class MathExpression:
+    """
+    The MathExpression class represents the text inside MATH() after it was compiled
+    to a program in reverse polish notation. the program is run by a loop over its instructions
+    with a stack of values, so an expression of any length is evaluated without nested python calls.
+    The expression has the following attributes:
+    - program: the list of instructions, each one is an opcode and its argument
+    - cells: the cells the expression reads, the cells of other sheets are sheet references
+    - constant: the result of the expression if it does not read any cell
+    """
+
+    def __init__(self, program: List[Instruction]) -> None:
+        self.__program = program
+        self.__cells: List[CellOperand] = []
+        for opcode, argument in program:
+            if opcode == PUSH_CELL and argument not in self.__cells:
+                self.__cells.append(argument)  # type: ignore
+        self.__constant: Optional[float] = None
+        if not self.__cells:
+            self.__constant = self.__run(lambda cell: None)
+
+    def get_cells(self) -> List[CellOperand]:
+        return self.__cells
+
+    def get_program(self) -> List[Instruction]:
+        return self.__program
+
+    def evaluate(self, get_value: Callable[[CellOperand], Optional[float]]) -> Optional[float]:
+        """
+        Evaluates the program, reading the cells values with get_value.
+        returns None if a cell does not hold a number or on division by zero.
+        """
+        if not self.__cells:
+            return self.__constant
+        return self.__run(get_value)
+
+    def __run(self, get_value: Callable[[CellOperand], Optional[float]]) -> Optional[float]:
+        """
+        Runs the program as a stack machine: numbers and cells values are pushed,
+        and every operator replaces the values it takes from the top of the stack with its result.
+        """
+        stack: List[Any] = []
+        try:
+            for opcode, argument in self.__program:
+                if opcode == PUSH_NUMBER:
+                    stack.append(argument)
+                elif opcode == PUSH_CELL:
+                    stack.append(get_value(argument))  # type: ignore
+                elif opcode == NEGATE:
+                    stack.append(-stack.pop())
+                else:
+                    right = stack.pop()
+                    stack.append(BINARY_FUNCTIONS[opcode](stack.pop(), right))
+        except (TypeError, ZeroDivisionError):
+            # a cell that is not a number is read as None, so it fails the arithmetic
+            return None
+        return stack[0]
+
+
+def compile_math_expression(text: str, sheet_name: Optional[str] = None) -> Optional[MathExpression]:
+    """
+    Compiles an arithmetic expression of numbers, cells, + - * /, parentheses
+    and unary minus, using the shunting yard algorithm.
+    a cell can have the name of its sheet before it (Sheet2!A1), the cells of
+    sheet_name (the sheet of the expression) are read as cells without a sheet name.
+    returns None if the expression is not valid.
+    """
+    program: List[Instruction] = []
+    operators: List[int] = []
+    expect_operand = True
+    position = 0
+    text = text.rstrip()
+    if not text:
+        return None
+    while position < len(text):
+        match = TOKEN_PATTERN.match(text, position)
+        if match is None:
+            return None
+        position = match.end()
+        number, cell_sheet_name, column_name, row_number, symbol = match.groups()
+        if number is not None or column_name is not None:
+            if not expect_operand:
+                return None
+            if number is not None:
+                program.append((PUSH_NUMBER, float(number)))
+            elif cell_sheet_name is None or cell_sheet_name == sheet_name:
+                program.append((PUSH_CELL, (int(row_number), get_column_index(column_name))))
+            else:
+                program.append((PUSH_CELL, SheetReference(cell_sheet_name,
+                                                          (int(row_number), get_column_index(column_name)))))
+            expect_operand = False
+        elif symbol == "(":
+            if not expect_operand:
+                return None
+            operators.append(LEFT_PARENTHESIS)
+        elif symbol == ")":
+            if expect_operand:
+                return None
+            while operators and operators[-1] != LEFT_PARENTHESIS:
+                program.append((operators.pop(), None))
+            if not operators:
+                return None
+            operators.pop()
+        elif symbol in BINARY_OPERATORS and expect_operand:
+            if symbol == "-":
+                operators.append(NEGATE)
+            elif symbol != "+":
+                return None
+        elif symbol in BINARY_OPERATORS:
+            opcode = BINARY_OPERATORS[symbol]
+            while (operators and operators[-1] != LEFT_PARENTHESIS and
+                   OPERATORS_PRECEDENCE[operators[-1]] >= OPERATORS_PRECEDENCE[opcode]):
+                program.append((operators.pop(), None))
+            operators.append(opcode)
+            expect_operand = True
+        else:
+            return None
+    if expect_operand:
+        return None
+    while operators:
+        opcode = operators.pop()
+        if opcode == LEFT_PARENTHESIS:
+            return None
+        program.append((opcode, None))
+    return MathExpression(program)
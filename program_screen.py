@@ -1,9 +1,15 @@
 import tkinter as tk
+from typing import Callable
+
 from sheet_screen import SheetScreen
 from toolbar_screen import ToolbarScreen
 from welcome_window import WelcomeWindow
 
 
+def _ignore_event() -> None:
+    pass
+
+
 class ProgramScreen:
     """
     The class represents the main screen of the program using tkinter.
@@ -11,27 +17,48 @@ class ProgramScreen:
     - window: the window of the program
     - toolbar_screen: the toolbar screen of the program
     - sheet_screen: the sheet screen of the program
+    - on_ready: called once the cells of the sheet are shown and can be edited
     """
-    def __init__(self) -> None:
+    def __init__(self,
+                 lazy_evaluation: bool = False,
+                 show_welcome: bool = True,
+                 on_ready: Callable[[], None] = _ignore_event) -> None:
         """
         The constructor of the ProgramScreen class. It makes the main screen of the program using tkinter.
         generates the toolbar screen and the sheet screen of the program. and packs them.
+        the cells of the sheet are created only after the window is first drawn, so it shows at once.
+        the welcome window is shown over the main window if show_welcome is True.
         """
-        welcome_window = WelcomeWindow()
-        welcome_window.show()
         self.__window = tk.Tk()
+        self.__window.title("Super Duper Excel")
+        self.__on_ready = on_ready
 
         self.__toolbar_screen = ToolbarScreen(self.__window, self.__change_color_for_cell,
                                               self.__change_font_for_cell, self.__save_file_button_pressed,
                                               self.__load_file_button_pressed)
         self.__toolbar_screen.get_screen().pack(anchor=tk.W, fill=tk.X, expand=False)
 
-        self.__sheet_screen = SheetScreen(self.__window)
-        self.__sheet_screen.update_sheet()
+        self.__sheet_screen = SheetScreen(self.__window, lazy_evaluation)
         self.__sheet_screen.get_screen().pack()
 
-        self.__window.title("Super Duper Excel")
+        self.__window.protocol("WM_DELETE_WINDOW", self.__close)
 
+        if show_welcome:
+            WelcomeWindow(self.__window)
+        # the idle callbacks that draw the window were scheduled first, so the cells are made after them
+        self.__window.after_idle(self.__show_sheet)
+
+    def __show_sheet(self) -> None:
+        self.__sheet_screen.update_sheet()
+        self.__window.update_idletasks()
+        self.__on_ready()
+
+    def __close(self) -> None:
+        """
+        Closes the window without saving, the changes since the last save are dropped.
+        """
+        self.__sheet_screen.close()
+        self.__window.destroy()
 
     def __change_color_for_cell(self, color: str) -> None:
         self.__sheet_screen.report_cell_color_changed(color)
@@ -53,5 +80,3 @@ class ProgramScreen:
 
     def show_screen(self) -> None:
         self.__window.mainloop()
-
-
@@ -0,0 +1,160 @@
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from cell_address import get_cell_name
+from sheet_reference import SHEET_NAME_SEPARATOR
+
+# only the last cascades are kept one by one, older ones are kept only in the totals
+MAX_CASCADE_RECORDS = 10000
+# the report lists this many of the formulas that took the most time
+REPORT_TOP_FORMULAS = 20
+CASCADE_EDIT = "edit"
+CASCADE_RECALCULATE_ALL = "recalculate_all"
+# the evaluation of dirty cells that were read, with lazy evaluation
+CASCADE_PULL = "pull"
+# a cascade that was evaluated in the background thread, its seconds are until its last result was applied
+CASCADE_BACKGROUND = "background"
+
+# a record of a cascade: its kind, the changed cells, the recalculated cells,
+# its depth (levels) and width (the largest level), the cells in circular references, and its seconds
+CascadeRecord = Tuple[str, int, int, int, int, int, float]
+
+# a formula cell: the name of its sheet (None for a sheet without a name) and its (row, col)
+FormulaKey = Tuple[Optional[str], Tuple[int, int]]
+
+
+class RecalculationProfiler:
+    """
+    The RecalculationProfiler class collects what the recalculation of a sheet does:
+    the cascade of every edit (how many cells it recalculated, how deep and wide it was),
+    the time every formula took to evaluate, and how often the parser found the compiled formula in its cache.
+    a sheet and its parser only call it when they have one, so a sheet without a profiler does not pay for it.
+    formulas evaluated in worker processes are counted in their cascade but are not timed one by one.
+    The profiler has the following attributes:
+    - cascades: the last cascades, as CascadeRecord tuples
+    - cascade_count, recalculated_count, cascade_seconds: the totals of all the cascades
+    - formula_seconds, formula_counts: the evaluation time and the number of evaluations of every formula cell,
+      by its sheet and cell, so the same cell of two sheets of a workbook is counted apart
+    - parse_hits, parse_misses: the parses that found the compiled formula in the cache and that compiled it
+    - compile_seconds: the time compiling formulas took
+    """
+
+    def __init__(self) -> None:
+        self.__cascades: Deque[CascadeRecord] = deque(maxlen=MAX_CASCADE_RECORDS)
+        self.__cascade_count = 0
+        self.__recalculated_count = 0
+        self.__cascade_seconds = 0.0
+        self.__formula_seconds: Dict[FormulaKey, float] = {}
+        self.__formula_counts: Dict[FormulaKey, int] = {}
+        self.__parse_hits = 0
+        self.__parse_misses = 0
+        self.__compile_seconds = 0.0
+
+    def record_cascade(self, kind: str, changed_count: int, levels: List[List[Tuple[int, int]]],
+                       circular_count: int, seconds: float) -> None:
+        recalculated_count = sum(len(level) for level in levels) + circular_count
+        width = max((len(level) for level in levels), default=0)
+        self.__cascades.append((kind, changed_count, recalculated_count, len(levels), width, circular_count, seconds))
+        self.__cascade_count += 1
+        self.__recalculated_count += recalculated_count
+        self.__cascade_seconds += seconds
+
+    def record_formula(self, sheet_name: Optional[str], cell_loc: Tuple[int, int], seconds: float) -> None:
+        key = (sheet_name, cell_loc)
+        self.__formula_seconds[key] = self.__formula_seconds.get(key, 0.0) + seconds
+        self.__formula_counts[key] = self.__formula_counts.get(key, 0) + 1
+
+    def record_parse(self, cache_hit: bool, compile_seconds: float = 0.0) -> None:
+        if cache_hit:
+            self.__parse_hits += 1
+        else:
+            self.__parse_misses += 1
+            self.__compile_seconds += compile_seconds
+
+    def get_cascades(self) -> List[CascadeRecord]:
+        return list(self.__cascades)
+
+    def get_parse_cache_hit_rate(self) -> Optional[float]:
+        parse_count = self.__parse_hits + self.__parse_misses
+        if parse_count == 0:
+            return None
+        return self.__parse_hits / parse_count
+
+    def get_slowest_formulas(self, count: int = REPORT_TOP_FORMULAS) -> List[Tuple[FormulaKey, float, int]]:
+        """
+        Returns the formula cells that took the most time in total, with their seconds and evaluations.
+        """
+        slowest = sorted(self.__formula_seconds.items(), key=lambda item: item[1], reverse=True)[:count]
+        return [(key, seconds, self.__formula_counts[key]) for key, seconds in slowest]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        The collected numbers in a form that can be written as json.
+        """
+        cascades = list(self.__cascades)
+        return {
+            "cascade_count": self.__cascade_count,
+            "recalculated_cells": self.__recalculated_count,
+            "cascade_seconds": self.__cascade_seconds,
+            "max_cascade_depth": max((cascade[3] for cascade in cascades), default=0),
+            "max_cascade_width": max((cascade[4] for cascade in cascades), default=0),
+            "parse_cache_hits": self.__parse_hits,
+            "parse_cache_misses": self.__parse_misses,
+            "compile_seconds": self.__compile_seconds,
+            "slowest_formulas": [{"sheet": sheet_name, "cell": get_cell_name(cell_loc), "seconds": seconds,
+                                  "evaluations": evaluations}
+                                 for (sheet_name, cell_loc), seconds, evaluations in self.get_slowest_formulas()],
+            "cascades": [{"kind": kind, "changed": changed, "recalculated": recalculated, "depth": depth,
+                          "width": width, "circular": circular, "seconds": seconds}
+                         for kind, changed, recalculated, depth, width, circular, seconds in cascades],
+        }
+
+    def format_report(self) -> str:
+        """
+        A short report for people, printed at exit by the --profile flag.
+        """
+        lines = ["recalculation profile:",
+                 "  %d cascades recalculated %d cells in %.3fs" %
+                 (self.__cascade_count, self.__recalculated_count, self.__cascade_seconds)]
+        if self.__cascades:
+            kind, changed, recalculated, depth, width, circular, seconds = max(self.__cascades,
+                                                                               key=lambda cascade: cascade[2])
+            lines.append("  largest cascade (%s): %d changed cells, %d recalculated, depth %d, width %d, %.3fs" %
+                         (kind, changed, recalculated, depth, width, seconds))
+            lines.append("  deepest cascade: %d levels, widest level: %d cells" %
+                         (max(cascade[3] for cascade in self.__cascades),
+                          max(cascade[4] for cascade in self.__cascades)))
+        hit_rate = self.get_parse_cache_hit_rate()
+        if hit_rate is not None:
+            lines.append("  parse cache: %d hits, %d misses (%.1f%% hit rate), %.3fs compiling" %
+                         (self.__parse_hits, self.__parse_misses, hit_rate * 100, self.__compile_seconds))
+        slowest = self.get_slowest_formulas()
+        if slowest:
+            lines.append("  slowest formulas (total time, evaluations):")
+            for key, seconds, evaluations in slowest:
+                lines.append("    %-16s %.6fs %d" % (_get_formula_name(key), seconds, evaluations))
+        return "\n".join(lines)
+
+
+def _get_formula_name(key: FormulaKey) -> str:
+    sheet_name, cell_loc = key
+    if sheet_name is None:
+        return get_cell_name(cell_loc)
+    return sheet_name + SHEET_NAME_SEPARATOR + get_cell_name(cell_loc)
+
+
+_default_profiler: Optional[RecalculationProfiler] = None
+
+
+def enable_default_profiler() -> RecalculationProfiler:
+    """
+    Makes every sheet that is created from now on report to one profiler, used by the --profile flag.
+    """
+    global _default_profiler
+    if _default_profiler is None:
+        _default_profiler = RecalculationProfiler()
+    return _default_profiler
+
+
+def get_default_profiler() -> Optional[RecalculationProfiler]:
+    return _default_profiler
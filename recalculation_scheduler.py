@@ -0,0 +1,101 @@
+import os
+from concurrent.futures import Executor
+from typing import Any, Callable, Iterable, List, Optional, Tuple
+
+from cell import Cell
+from sheet_parser import SheetParser
+from sheet_storage import SheetStorage
+from style_table import DEFAULT_STYLE_ID
+
+# levels with fewer formulas than this are evaluated serially, sending them to the workers costs more
+PARALLEL_MIN_LEVEL_SIZE = 2048
+# a level is split into this many chunks for every worker, so a slow chunk does not keep the others waiting
+CHUNKS_PER_WORKER = 4
+
+
+def _evaluate_chunk(row_count: int,
+                    column_count: int,
+                    formulas: List[Tuple[Tuple[int, int], str]],
+                    values: List[Tuple[Tuple[int, int], float]]) -> List[Tuple[Tuple[int, int], str, Any, Any]]:
+    """
+    Runs in a worker process: evaluates the formulas of a chunk against a snapshot of the
+    numeric values of the cells they read, and returns the parser's result of every formula.
+    """
+    snapshot = SheetStorage(row_count, column_count)
+    for cell_loc, value in values:
+        cell = Cell()
+        cell.restore("", value, True, DEFAULT_STYLE_ID, [])
+        snapshot.set_cell(cell_loc[0], cell_loc[1], cell)
+    parser = SheetParser(snapshot)
+    results = []
+    for cell_loc, text in formulas:
+        result, dependent_cell_list, answer = parser.parse_expression(text)
+        results.append((cell_loc, result, dependent_cell_list, answer))
+    return results
+
+
+class RecalculationScheduler:
+    """
+    The RecalculationScheduler class evaluates a level of formula cells, cells that do not
+    depend on each other, in a pool of worker processes.
+    each worker gets a read-only snapshot of the numeric values of the cells its formulas read,
+    and the results are applied to the sheet by the caller. levels that are smaller than the
+    parallel threshold, or a scheduler with one worker, are left to the caller to evaluate serially.
+    The scheduler has the following attributes:
+    - worker_count: the number of worker processes
+    - parallel_threshold: the smallest level that is evaluated in parallel
+    - executor: the pool of worker processes, it is started the first time it is needed
+    """
+
+    def __init__(self, worker_count: Optional[int] = None, parallel_threshold: int = PARALLEL_MIN_LEVEL_SIZE) -> None:
+        self.__worker_count = worker_count if worker_count is not None else (os.cpu_count() or 1)
+        self.__parallel_threshold = parallel_threshold
+        self.__executor: Optional[Executor] = None
+
+    def get_worker_count(self) -> int:
+        return self.__worker_count
+
+    def should_run_in_parallel(self, level_size: int) -> bool:
+        return self.__worker_count > 1 and level_size >= self.__parallel_threshold
+
+    def evaluate_level(self,
+                       row_count: int,
+                       column_count: int,
+                       formulas: List[Tuple[Tuple[int, int], str]],
+                       get_precedents: Callable[[Tuple[int, int]], Iterable[Tuple[int, int]]],
+                       get_number: Callable[[int, int], Optional[float]]
+                       ) -> List[Tuple[Tuple[int, int], str, Any, Any]]:
+        """
+        Evaluates the formulas (cell, text) of a level in the workers.
+        returns the parser's result, dependencies and answer of every formula, in the same order.
+        """
+        if self.__executor is None:
+            # imported here, multiprocessing is slow to import and most sheets never need the pool
+            from concurrent.futures import ProcessPoolExecutor
+            self.__executor = ProcessPoolExecutor(max_workers=self.__worker_count)
+        chunk_count = min(len(formulas), self.__worker_count * CHUNKS_PER_WORKER)
+        chunk_size = -(-len(formulas) // chunk_count)
+        futures = []
+        for start in range(0, len(formulas), chunk_size):
+            chunk = formulas[start:start + chunk_size]
+            values = {}
+            for cell_loc, text in chunk:
+                for precedent in get_precedents(cell_loc):
+                    if precedent not in values:
+                        values[precedent] = get_number(*precedent)
+            futures.append(self.__executor.submit(_evaluate_chunk, row_count, column_count, chunk,
+                                                  [(cell_loc, value) for cell_loc, value in values.items()
+                                                   if value is not None]))
+        results = []
+        for future in futures:
+            results.extend(future.result())
+        return results
+
+    def close(self) -> None:
+        """
+        Stops the worker processes, the chunks that did not start yet are cancelled.
+        they are started again if another level is evaluated in parallel.
+        """
+        if self.__executor is not None:
+            self.__executor.shutdown(cancel_futures=True)
+            self.__executor = None
@@ -1,49 +1,167 @@
 
-from typing import List, Tuple, Callable
+import io
+from collections import deque
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, List, Tuple, Callable, Deque, Dict, Iterable, Iterator, Optional, Set, TextIO
 from cell import Cell
-from cell import CELL_ERROR_TEXT
+from cell import SPACER
+from cell_range import CellRange
+from cell_value import ERROR_VALUE, CellValue
+from style_table import STYLE_TABLE, DEFAULT_COLOR, DEFAULT_FONT
 from sheet_parser import SheetParser
+from compiled_formula import CompiledFormula
 from sheet_parser import PARSER_ERROR, PARSER_FORMULA, PARSER_NOT_FORMULA,PARSER_FORMULA_ERROR_CALCULATING
+from cell_address import get_cell_name
+from dependency_graph import DependencyGraph
+from recalculation_scheduler import RecalculationScheduler
+from recalculation_profiler import RecalculationProfiler, get_default_profiler
+from recalculation_profiler import CASCADE_BACKGROUND, CASCADE_EDIT, CASCADE_PULL, CASCADE_RECALCULATE_ALL
+from background_recalculation import BackgroundRecalculator
+from edit_journal import EditJournal, JournalRecord, JOURNAL_COMPACTION_RECORDS
+from sheet_storage import SheetStorage, EMPTY_CELL
+from binary_workbook import BinaryWorkbookReader, BINARY_FILE_EXTENSION
+from binary_workbook import is_binary_workbook, write_binary_workbook
+from delimited_file import is_delimited_file, read_delimited_file, write_delimited_file
+from sheet_reference import FormulaDependency, SheetReference, SHEET_NAME_SEPARATOR
+from workbook_graph import WorkbookGraph
 
 SHEET_SPACER = "@"
 BAD_FORMULA_ERROR_MSG = "Please enter a valid formula!"
 ERROR_LOADING_FILE_MSG = "Error loading file! Please try again or choose a different one..."
 ERROR_SAVING_FILE_MSG = "Error saving file! Please try again later..."
+CIRCULAR_REFERENCE_ERROR_MSG = "Circular reference! The following cells depend on themselves: "
+# the progress of saving and loading a text file is reported once every this many rows
+PROGRESS_REPORT_ROWS = 256
+# the number of changes that can be undone, the oldest ones are forgotten
+UNDO_LIMIT = 100
+
+
+def _ignore_cell_change(cell_loc: Tuple[int, int], value: Any) -> None:
+    pass
+
+
+def _ignore_text(text: str) -> None:
+    pass
+
+
+def _ignore_event() -> None:
+    pass
+
+
+def _ignore_workbook_change(sheet_name: str, cells: Set[Tuple[int, int]]) -> None:
+    pass
 
 
 class Sheet:
     """The class represents a sheet of cells.
-    The sheet is a 2D array of cells and has the following attributes:
+    The sheet is a grid of cells and has the following attributes:
     - name: name of the sheet
-    - sheet: a 2D array of cells
+    - sheet: a sparse storage of the cells, that grows on demand
     - parser: an instance of SheetParser
+    - dependency_graph: the dependencies between the cells, used to recalculate formulas
+    - recalculation_scheduler: evaluates big levels of formulas that do not depend on each other in parallel
+    - background_recalculator: evaluates the cascades of edits in a background thread, if the sheet has one.
+      the cells it did not apply yet are dirty, and they are evaluated at once if they are read before.
+      a new job waits in pending_background_cells until the results are applied next
     - chosen_cell: the cell that is currently chosen
+    - transaction_depth: the number of transactions that were begun and not committed yet
+    - pending_changed_cells: the cells that changed in the current transaction,
+      their dependent cells are recalculated once, when the transaction is committed
+    - journal: the edit journal of the file the sheet was loaded from or saved to, if any.
+      the changes of the cells are appended to it when they are committed, so saving to
+      the same file again only marks them as saved. the changes that were not saved
+      are removed from it when the sheet is closed, and replayed only after a crash
+    - unjournaled_cells: the cells that changed and were not appended to the journal yet
+    - undo_steps, redo_steps: the changes that can be undone and redone, every step is a snapshot
+      of the storage from before the change and the cells whose text or style it changed.
+      the snapshots share the cells that did not change, so a step costs about the chunks it changed
+    - undo_snapshot, undo_cells: the step of the change that is being made, it is kept
+      when the change (or its transaction) ends, if it changed any cell
+    - workbook_graph: the dependency graph of the workbook of the sheet, if it is in one.
+      the formulas that read other sheets are kept in it, and a change that reaches other sheets
+      is recalculated by the workbook, in the order of this graph
     """
 
     def __init__(self,
                  name: str,
-                 on_cell_text_changed: Callable[[Tuple[int, int], str], None],
-                 on_cell_color_changed: Callable[[Tuple[int, int], str], None],
-                 on_cell_font_changed: Callable[[Tuple[int, int], str], None],
-                 on_error: Callable[[str], None],
-                 update_formula_box_text_written_to_cell: Callable[[str], None]) -> None:
+                 on_cell_text_changed: Callable[[Tuple[int, int], CellValue], None] = _ignore_cell_change,
+                 on_cell_color_changed: Callable[[Tuple[int, int], str], None] = _ignore_cell_change,
+                 on_cell_font_changed: Callable[[Tuple[int, int], str], None] = _ignore_cell_change,
+                 on_error: Callable[[str], None] = _ignore_text,
+                 update_formula_box_text_written_to_cell: Callable[[str], None] = _ignore_text,
+                 recalculation_scheduler: Optional[RecalculationScheduler] = None,
+                 profiler: Optional[RecalculationProfiler] = None,
+                 lazy_evaluation: bool = False,
+                 background_recalculation: bool = False,
+                 on_background_recalculation_started: Callable[[], None] = _ignore_event,
+                 undo_limit: int = UNDO_LIMIT,
+                 workbook_graph: Optional[WorkbookGraph] = None,
+                 sheet_resolver: Optional[Callable[[SheetReference], Optional[SheetStorage]]] = None,
+                 on_workbook_cells_changed: Callable[[str, Set[Tuple[int, int]]], None] = _ignore_workbook_change
+                 ) -> None:
 
         """
         :param name: name of the sheet
-        the following parameters are functions that are used as callbacks to the screen:
-        :param on_cell_text_changed: function to call when cell text is changed
+        the following parameters are functions that are used as callbacks to the screen,
+        a sheet without a screen (for batch evaluation) can leave them out:
+        :param on_cell_text_changed: function to call when the text or the value of a cell is changed,
+        it gets the typed value of a calculated cell (a number or an error), and formats it for showing
         :param on_cell_color_changed: function to call when cell color is changed
         :param on_cell_font_changed: function to call when cell font is changed
         :param on_error: function to call when error occurs
         :param update_formula_box_text_written_to_cell: function to call when formula box text is written to cell
+        :param recalculation_scheduler: the scheduler of the parallel recalculation,
+        by default one with a worker for every core
+        :param profiler: collects what the recalculation does, by default the one of the --profile flag if it is on
+        :param lazy_evaluation: if True, an edit only marks the formulas that depend on it as dirty,
+        and a dirty formula is evaluated when it is read: when it is in the visible region,
+        when a formula that reads it is entered, when the sheet is saved, or by get_value
+        :param background_recalculation: if True, the cells that depend on an edit are recalculated
+        in a background thread, the results are applied by apply_background_results
+        :param on_background_recalculation_started: function to call when a background recalculation starts,
+        so the screen can show the cells that are being calculated and start applying the results
+        :param undo_limit: the number of changes that can be undone, 0 turns undo off
+        the following parameters are given by the workbook of the sheet:
+        :param workbook_graph: the dependency graph of the workbook
+        :param sheet_resolver: returns the storage of the sheet a reference to another sheet reads,
+        after the cells it reads were evaluated, or None if there is no such sheet
+        :param on_workbook_cells_changed: function to call with the name of the sheet and the cells that changed,
+        when cells of other sheets depend on them, the workbook recalculates the cells of all the sheets
 
         """
         self.__on_cell_text_changed = on_cell_text_changed
         self.__name = name
 
-        self.__sheet: List[List[Cell]] = [[Cell() for i in range(15)] for j in range(20)]
-        self.__parser = SheetParser(self.__sheet)  # type: ignore
+        self.__sheet = SheetStorage()
+        self.__parser = SheetParser(self.__sheet, name, sheet_resolver)
+        self.__dependency_graph = DependencyGraph()
+        self.__recalculation_scheduler = recalculation_scheduler or RecalculationScheduler()
+        self.__profiler: Optional[RecalculationProfiler] = None
+        self.set_profiler(profiler or get_default_profiler())
+        self.__lazy_evaluation = lazy_evaluation
+        self.__dirty_cells: Set[Tuple[int, int]] = set()
+        self.__visible_region: Optional[Tuple[int, int, int, int]] = None
+        self.__background_recalculator = BackgroundRecalculator() if background_recalculation else None
+        self.__on_background_recalculation_started = on_background_recalculation_started
+        self.__background_start_time = 0.0
+        self.__pending_background_cells: Optional[Set[Tuple[int, int]]] = None
+        self.__background_levels: List[List[Tuple[int, int]]] = []
         self.__chosen_cell = (1, 1)
+        self.__transaction_depth = 0
+        self.__pending_changed_cells: Set[Tuple[int, int]] = set()
+        self.__journal: Optional[EditJournal] = None
+        self.__unjournaled_cells: Set[Tuple[int, int]] = set()
+        self.__undo_limit = undo_limit
+        self.__undo_steps: Deque[Tuple[SheetStorage, Set[Tuple[int, int]]]] = deque(maxlen=undo_limit)
+        self.__redo_steps: Deque[Tuple[SheetStorage, Set[Tuple[int, int]]]] = deque(maxlen=undo_limit)
+        self.__undo_snapshot: Optional[SheetStorage] = None
+        self.__undo_cells: Set[Tuple[int, int]] = set()
+        self.__is_undoing = False
+        self.__workbook_graph = workbook_graph
+        self.__sheet_resolver = sheet_resolver
+        self.__on_workbook_cells_changed = on_workbook_cells_changed
         self.__on_cell_color_changed = on_cell_color_changed
         self.__on_cell_font_changed = on_cell_font_changed
         self.__on_error = on_error
@@ -54,34 +172,113 @@ class Sheet:
         Serialize the sheet to a string that
         can be written to a file.
         """
-        st = str(len(self.__sheet)) + SHEET_SPACER + str(len(self.__sheet[0])) + "\n"
-        for i, row in enumerate(self.__sheet):
-            for j, cell in enumerate(row):
-                st += cell.serialize()
-                if j != len(self.__sheet[0]) - 1:
-                    st += "\t"
-            if i != len(self.__sheet) - 1:
-                st += "\n"
-        return st
+        stream = io.StringIO()
+        self.serialize_to(stream)
+        return stream.getvalue()
+
+    def serialize_to(self, stream: TextIO, on_progress: Optional[Callable[[int, int], None]] = None) -> None:
+        """
+        Serialize the sheet to a stream, one row at a time,
+        so the whole file is never kept in memory.
+        the first line has the size of the sheet and the number of styles,
+        then the style table is written once, a style in a line, and the cells keep only style ids.
+        on_progress is called with the number of rows written so far and the number of rows.
+        """
+        self.evaluate_dirty_cells()
+        row_count = self.__sheet.get_length()
+        column_count = self.__sheet.get_width()
+        empty_cell_string = EMPTY_CELL.serialize()
+        styles = STYLE_TABLE.get_styles()
+        stream.write(str(row_count) + SHEET_SPACER + str(column_count) + SHEET_SPACER + str(len(styles)) + "\n")
+        for color, font in styles:
+            stream.write(color + "\t" + font + "\n")
+        for i in range(row_count):
+            row_strings = [empty_cell_string] * column_count
+            for j in range(column_count):
+                cell = self.__sheet.get_cell(i, j)
+                if cell is not EMPTY_CELL:
+                    row_strings[j] = cell.serialize()
+            stream.write("\t".join(row_strings))
+            if i != row_count - 1:
+                stream.write("\n")
+            self.__report_progress(on_progress, i + 1, row_count)
 
     def deserialize(self, serialized_string: str) -> None:
         """
         Deserialize the sheet from a string that was
         read from a file.
         """
-        rows_strings = serialized_string.split("\n")
-        row_num, col_num = rows_strings[0].split(SHEET_SPACER)
-        serialized_sheet_array = list(map(lambda x: x.split("\t"), rows_strings[1:]))
-        self.__sheet = [[Cell(serialized_sheet_array[i][j]) for j in range(int(col_num))] for i in range(int(row_num))]
+        self.deserialize_from(io.StringIO(serialized_string))
+
+    def deserialize_from(self, stream: TextIO, on_progress: Optional[Callable[[int, int], None]] = None) -> None:
+        """
+        Deserialize the sheet from a stream, one row at a time,
+        only the cells that are not empty are made.
+        files that were saved before the style table was added
+        have no styles count in their first line and keep the color and font in every cell.
+        on_progress is called with the number of rows read so far and the number of rows.
+        """
+        header = stream.readline().rstrip("\n").split(SHEET_SPACER)
+        row_count = int(header[0])
+        column_count = int(header[1])
+        style_ids: Optional[List[int]] = None
+        if len(header) > 2:
+            style_ids = []
+            for k in range(int(header[2])):
+                color, font = stream.readline().rstrip("\n").split("\t")
+                style_ids.append(STYLE_TABLE.get_style_id(color, font))
+            empty_cell_string = EMPTY_CELL.serialize()
+        else:
+            empty_cell_string = SPACER.join(["", "", DEFAULT_COLOR, DEFAULT_FONT, ""])
+        sheet = SheetStorage(row_count, column_count)
+        for i in range(row_count):
+            serialized_row = stream.readline().rstrip("\n").split("\t")
+            for j in range(column_count):
+                if serialized_row[j] != empty_cell_string:
+                    cell = Cell(serialized_row[j], style_ids)
+                    if not cell.is_empty():
+                        sheet.set_cell(i, j, cell)
+            self.__report_progress(on_progress, i + 1, row_count)
+        self.__replace_sheet(sheet)
+
+    def __replace_sheet(self, sheet: SheetStorage) -> None:
+        """
+        Replaces the storage with a loaded one, the cells that changed before and
+        the changes that can be undone belong to the storage that was replaced.
+        """
+        self.__sheet.close_block_reader()
+        self.__sheet = sheet
+        if self.__workbook_graph is not None:
+            self.__workbook_graph.clear_sheet_references(self.__name)
+        self.__pending_changed_cells = set()
+        self.__clear_dirty_cells()
+        self.__undo_steps.clear()
+        self.__redo_steps.clear()
+        self.__undo_snapshot = None
+        self.__undo_cells = set()
+
+    def __report_progress(self, on_progress: Optional[Callable[[int, int], None]], done: int, total: int) -> None:
+        if on_progress is not None and (done % PROGRESS_REPORT_ROWS == 0 or done == total):
+            on_progress(done, total)
+
+    def get_sheet(self) -> SheetStorage:
+        """
+        Returns the cells of the sheet as they are, with lazy evaluation the values
+        of dirty cells are old, evaluate_dirty_cells or get_value evaluate them.
+        """
+        return self.__sheet
+
+    def get_name(self) -> str:
+        return self.__name
 
-    def get_sheet(self) -> List[List[Cell]]:
-        return self.__sheet.copy()
+    def get_dependency_graph(self) -> DependencyGraph:
+        return self.__dependency_graph
 
     def get_length(self) -> int:
-        return len(self.__sheet)
+        return self.__sheet.get_length()
 
     def get_width(self) -> int:
-        return len(self.__sheet[0])
+        return self.__sheet.get_width()
 
     def choose_cell(self, row: int, col: int) -> None:
         self.__chosen_cell = (row, col)
@@ -90,94 +287,760 @@ class Sheet:
         """
         Called when the enter key is pressed.
         send the text in the chosen cell to the parser
-        and update the cell with the result.
+        and update the cell with the result,
+        then recalculate the cells that depend on it.
+        """
+        self.__evaluate_cell(self.__chosen_cell, True)
+        if self.__dirty_cells:
+            # the formula may have read cells that were not evaluated yet, it is evaluated again after them
+            self.__dirty_cells.add(self.__chosen_cell)
+            self.evaluate_cells([self.__chosen_cell])
+        self.__cell_changed(self.__chosen_cell)
+
+    def begin_transaction(self) -> None:
+        """
+        Begins a transaction, the cells can be written as usual but the cells that depend on them
+        are recalculated only once, when the transaction is committed.
+        transactions can be nested, only the outermost commit recalculates.
+        """
+        self.__transaction_depth += 1
+
+    def commit_transaction(self) -> None:
+        """
+        Commits a transaction, recalculates the dependent cells of all
+        the cells that changed in it in one pass.
+        """
+        if self.__transaction_depth == 0:
+            return
+        self.__transaction_depth -= 1
+        if self.__transaction_depth == 0 and self.__pending_changed_cells:
+            changed_cells = self.__pending_changed_cells
+            self.__pending_changed_cells = set()
+            self.__update_dependent_cells(changed_cells)
+        if self.__transaction_depth == 0:
+            self.__write_journal()
+            self.__end_undo_step()
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """
+        A transaction for a with statement:
+        with sheet.transaction():
+            ...
+        """
+        self.begin_transaction()
+        try:
+            yield
+        finally:
+            self.commit_transaction()
+
+    def set_profiler(self, profiler: Optional[RecalculationProfiler]) -> None:
+        """
+        Starts reporting the recalculation to the profiler, or stops it with None.
+        """
+        self.__profiler = profiler
+        self.__parser.set_profiler(profiler)
+
+    def get_profiler(self) -> Optional[RecalculationProfiler]:
+        return self.__profiler
+
+    def is_lazy(self) -> bool:
+        return self.__lazy_evaluation
+
+    def get_dirty_count(self) -> int:
+        return len(self.__dirty_cells)
+
+    def get_value(self, row: int, col: int) -> CellValue:
+        """
+        Returns the value of a cell, it is evaluated first if it is dirty.
+        """
+        if self.__dirty_cells:
+            self.evaluate_cells([(row, col)])
+        return self.__sheet.get_cell(row, col).get_value()
+
+    def set_visible_region(self, first_row: int, first_col: int, last_row: int, last_col: int) -> None:
+        """
+        Tells the sheet which cells are shown (inclusive), the dirty ones among them
+        are evaluated now and after every edit, the cells that are not shown are left dirty.
+        """
+        self.__visible_region = (first_row, first_col, last_row, last_col)
+        self.__evaluate_visible_cells()
+
+    def evaluate_cells(self, cells: Iterable[Tuple[int, int]]) -> bool:
+        """
+        Evaluates the dirty cells among the given cells, and before them the dirty cells they read.
+        the values are kept until one of the cells they read changes again.
+        returns True if any cell was evaluated.
+        """
+        if not self.__dirty_cells:
+            return False
+        start_time = time.perf_counter() if self.__profiler is not None else 0.0
+        needed_cells = self.__dependency_graph.get_dirty_precedents(cells, self.__dirty_cells)
+        if not needed_cells:
+            return False
+        self.__dirty_cells -= needed_cells
+        if not self.__dirty_cells:
+            self.__cancel_background_recalculation()
+        levels, circular_cells = self.__dependency_graph.topological_levels(needed_cells)
+        for level in levels:
+            self.__evaluate_level(level)
+        self.__mark_circular_cells(circular_cells)
+        if self.__profiler is not None:
+            self.__profiler.record_cascade(CASCADE_PULL, len(needed_cells), levels, len(circular_cells),
+                                           time.perf_counter() - start_time)
+        return True
+
+    def evaluate_range(self, cell_range: CellRange) -> None:
+        """
+        Evaluates the dirty cells in a range, called before another sheet reads it.
+        """
+        if self.__dirty_cells:
+            self.evaluate_cells([cell_loc for cell_loc in self.__dirty_cells if cell_range.contains(cell_loc)])
+
+    def recalculate_cells(self, cells: List[Tuple[int, int]]) -> None:
+        """
+        Evaluates the given cells again, even if they are not dirty, and before them the dirty cells they read.
+        the workbook calls it for every level of its graph, so the cells are evaluated
+        after the cells they read in other sheets. the cells that depend on them are not recalculated.
+        """
+        self.__dirty_cells.update(cells)
+        self.evaluate_cells(cells)
+
+    def refresh_cells(self, cells: Iterable[Tuple[int, int]]) -> None:
+        """
+        Evaluates the given formula cells again and then the cells that depend on them, the workbook calls it
+        for the formulas that read other sheets when the sheet is loaded, the other sheets may have changed since.
+        """
+        with self.transaction():
+            for cell_loc in cells:
+                self.__dirty_cells.discard(cell_loc)
+                self.__evaluate_cell(cell_loc, False)
+                self.__cell_changed(cell_loc)
+
+    def mark_circular_cells(self, cells: List[Tuple[int, int]]) -> None:
+        """
+        Marks cells that are part of a circular reference through other sheets as errors, the workbook reports them.
+        """
+        self.__dirty_cells.difference_update(cells)
+        self.__set_error_values(cells)
+
+    def is_dirty(self, row: int, col: int) -> bool:
+        """
+        True if the cell was not recalculated since a cell it reads changed,
+        with background recalculation it is shown as being calculated.
+        """
+        return (row, col) in self.__dirty_cells
+
+    def apply_background_results(self) -> bool:
+        """
+        Starts the background recalculation that is waiting, and applies the results
+        that the background thread finished so far. called from the thread of the sheet
+        (the screen calls it from its event loop). returns True while the recalculation is still running.
+        """
+        if self.__background_recalculator is None:
+            return False
+        self.__start_background_job()
+        self.__apply_formula_results(self.__background_recalculator.take_results())
+        return self.__finish_background_recalculation()
+
+    def wait_for_background_recalculation(self) -> None:
+        """
+        Waits until the background recalculation is done and applies all its results.
+        """
+        if self.__background_recalculator is None:
+            return
+        self.__start_background_job()
+        self.__apply_formula_results(self.__background_recalculator.wait())
+        self.__finish_background_recalculation()
+
+    def close(self) -> None:
+        """
+        Closes the sheet without saving it: the changes that were not saved are removed
+        from the journal of its file, so opening the file again does not bring them back.
+        stops the background thread, if the sheet has one, and the worker processes of the recalculation.
+        """
+        if self.__journal is not None:
+            self.__journal.discard_unsaved()
+        self.__journal = None
+        self.__unjournaled_cells = set()
+        if self.__background_recalculator is not None:
+            self.__background_recalculator.close()
+        self.__recalculation_scheduler.close()
+
+    def __apply_formula_results(self, results: List[Tuple[Tuple[int, int], str, Any, Any]]) -> None:
+        """
+        Applies results of the background thread, only to the cells that are still dirty,
+        the cells that were read in the meantime were already evaluated.
+        """
+        for cell_loc, result, dependent_cell_list, answer in results:
+            if cell_loc in self.__dirty_cells:
+                self.__dirty_cells.discard(cell_loc)
+                self.__apply_parse_result(cell_loc, result, dependent_cell_list, answer, False)
+
+    def __finish_background_recalculation(self) -> bool:
+        if self.__background_recalculator is None or self.__background_recalculator.is_running():
+            return True
+        if self.__profiler is not None and self.__background_levels:
+            self.__profiler.record_cascade(CASCADE_BACKGROUND, 0, self.__background_levels, 0,
+                                           time.perf_counter() - self.__background_start_time)
+        self.__background_levels = []
+        return False
+
+    def __recalculate_in_background(self, cells: Set[Tuple[int, int]]) -> None:
+        """
+        Asks to evaluate the dirty cells in the background thread, the job that is running is cancelled
+        (its cells that were not applied are still dirty). the new job is only started when
+        the results are applied next, so the cascades of the writes of one edit start one job.
+        """
+        if self.__background_recalculator is None or not cells:
+            return
+        self.__background_recalculator.cancel()
+        if not self.__background_levels and self.__pending_background_cells is None:
+            self.__background_start_time = time.perf_counter()
+        self.__pending_background_cells = cells
+        self.__on_background_recalculation_started()
+
+    def __start_background_job(self) -> None:
         """
-        result, dependent_cell_list, answer =\
-            self.__parser.parse_expression(self.get_chosen_cell_from_sheet().get_text())
+        Starts the job that is waiting, against a snapshot of the values of the sheet.
+        the cells in circular references are marked now, they are not sent to the thread.
+        the snapshot does not load the blocks of a binary workbook, the thread loads the ones the formulas read.
+        """
+        if self.__background_recalculator is None or self.__pending_background_cells is None:
+            return
+        cells = self.__pending_background_cells & self.__dirty_cells
+        self.__pending_background_cells = None
+        levels, circular_cells = self.__dependency_graph.topological_levels(cells)
+        self.__dirty_cells.difference_update(circular_cells)
+        self.__mark_circular_cells(circular_cells)
+        if not levels:
+            return
+        compiled_levels = [[(cell_loc, self.__parser.get_compiled(self.__sheet.get_cell(*cell_loc).get_text(), cell_loc))
+                            for cell_loc in level] for level in levels]
+        sheet_snapshots = self.__snapshot_referenced_sheets(compiled_levels)
+        self.__background_recalculator.start_job(self.__sheet.snapshot(), compiled_levels, sheet_snapshots)
+        self.__background_levels = levels
+
+    def __snapshot_referenced_sheets(self, compiled_levels: List[List[Tuple[Tuple[int, int], CompiledFormula]]]
+                                     ) -> Dict[str, SheetStorage]:
+        """
+        Takes a snapshot of the other sheets that the formulas of a background job read,
+        after the cells they read were evaluated, the background thread reads the snapshots instead of the sheets.
+        """
+        referenced_sheets: Dict[str, SheetStorage] = {}
+        if self.__sheet_resolver is None:
+            return referenced_sheets
+        for level in compiled_levels:
+            for cell_loc, compiled in level:
+                for reference in compiled.get_sheet_references():
+                    storage = self.__sheet_resolver(reference)
+                    if storage is not None:
+                        referenced_sheets[reference.get_sheet_name()] = storage
+        return {sheet_name: storage.snapshot() for sheet_name, storage in referenced_sheets.items()}
+
+    def __cancel_background_recalculation(self) -> None:
+        if self.__background_recalculator is not None:
+            self.__background_recalculator.cancel()
+            self.__background_levels = []
+            self.__pending_background_cells = None
+
+    def __clear_dirty_cells(self) -> None:
+        self.__dirty_cells = set()
+        self.__cancel_background_recalculation()
+
+    def evaluate_dirty_cells(self) -> None:
+        """
+        Evaluates all the dirty cells, called before the values are saved.
+        """
+        self.evaluate_cells(set(self.__dirty_cells))
+
+    def __evaluate_visible_cells(self) -> None:
+        """
+        Evaluates the dirty cells in the visible region with lazy evaluation,
+        with background recalculation they are evaluated in the background thread instead.
+        without lazy evaluation the background thread already evaluates all the dirty cells.
+        """
+        if not self.__dirty_cells or self.__visible_region is None or not self.__lazy_evaluation:
+            return
+        first_row, first_col, last_row, last_col = self.__visible_region
+        if len(self.__dirty_cells) < (last_row - first_row + 1) * (last_col - first_col + 1):
+            visible_cells = [cell_loc for cell_loc in self.__dirty_cells
+                             if first_row <= cell_loc[0] <= last_row and first_col <= cell_loc[1] <= last_col]
+        else:
+            visible_cells = [(row, col) for row in range(first_row, last_row + 1)
+                             for col in range(first_col, last_col + 1)]
+        if self.__background_recalculator is not None:
+            self.__recalculate_in_background(
+                self.__dependency_graph.get_dirty_precedents(visible_cells, self.__dirty_cells))
+        else:
+            self.evaluate_cells(visible_cells)
+
+    def recalculate_all(self) -> None:
+        """
+        Recalculates every formula of the sheet once,
+        each of them after all the cells it reads.
+        cells in a circular reference are marked as errors.
+        """
+        start_time = time.perf_counter() if self.__profiler is not None else 0.0
+        self.__clear_dirty_cells()
+        formula_cells = self.get_formula_cells()
+        levels, circular_cells = self.__dependency_graph.topological_levels(formula_cells)
+        for level in levels:
+            self.__evaluate_level(level)
+        self.__mark_circular_cells(circular_cells)
+        if self.__profiler is not None:
+            self.__profiler.record_cascade(CASCADE_RECALCULATE_ALL, len(formula_cells), levels, len(circular_cells),
+                                           time.perf_counter() - start_time)
+
+    def get_formula_cells(self) -> Set[Tuple[int, int]]:
+        return {cell_loc for cell_loc, cell in self.__sheet.get_populated_cells()
+                if self.__parser.is_formula(cell.get_text())}
+
+    def __evaluate_level(self, level: List[Tuple[int, int]]) -> None:
+        """
+        Evaluates cells that do not depend on each other, in parallel
+        if there are enough of them, otherwise one after the other.
+        formulas that read ranges are always evaluated here, they are aggregated
+        in the sheet's numeric columns instead of sending their cells to the workers,
+        and so are the formulas that read other sheets.
+        """
+        if not self.__recalculation_scheduler.should_run_in_parallel(len(level)):
+            for cell_loc in level:
+                self.__evaluate_cell(cell_loc, False)
+            return
+        formulas = []
+        for cell_loc in level:
+            text = self.__sheet.get_cell(*cell_loc).get_text()
+            if self.__dependency_graph.get_range_precedents(cell_loc) or SHEET_NAME_SEPARATOR in text:
+                # the workers read only the numbers of the cells the formula reads in this sheet
+                self.__evaluate_cell(cell_loc, False)
+            else:
+                formulas.append((cell_loc, text))
+        if not formulas:
+            return
+        results = self.__recalculation_scheduler.evaluate_level(
+            self.__sheet.get_length(), self.__sheet.get_width(), formulas,
+            self.__dependency_graph.get_precedents,
+            self.__sheet.get_number)
+        for cell_loc, result, dependent_cell_list, answer in results:
+            self.__apply_parse_result(cell_loc, result, dependent_cell_list, answer, False)
+
+    def __journal_cell(self, cell_loc: Tuple[int, int]) -> None:
+        """
+        Records that the text or style of a cell changed, it is appended to
+        the journal now, or when the current transaction is committed.
+        the cell is also added to the undo step of the change.
+        """
+        if self.__undo_snapshot is not None:
+            self.__undo_cells.add(cell_loc)
+        if self.__journal is None:
+            return
+        self.__unjournaled_cells.add(cell_loc)
+        if self.__transaction_depth == 0:
+            self.__write_journal()
+
+    def __write_journal(self) -> None:
+        if self.__journal is None:
+            self.__unjournaled_cells = set()
+            return
+        for cell_loc in sorted(self.__unjournaled_cells):
+            cell = self.__sheet.get_cell(*cell_loc)
+            self.__journal.append(cell_loc, cell.get_text(), cell.get_color(), cell.get_font())
+        self.__unjournaled_cells = set()
+
+    def __cell_changed(self, cell_loc: Tuple[int, int]) -> None:
+        if self.__transaction_depth > 0:
+            self.__pending_changed_cells.add(cell_loc)
+        else:
+            self.__update_dependent_cells({cell_loc})
+
+    def __evaluate_cell(self, cell_loc: Tuple[int, int], report_bad_formula: bool) -> None:
+        """
+        Evaluates the text of a cell with the parser,
+        replaces the cell's edges in the dependency graph
+        and updates the cell with the result.
+        """
+        cell_text = self.__sheet.get_cell(*cell_loc).get_text()
+        result, dependent_cell_list, answer = self.__parser.parse_expression(cell_text, cell_loc)
+        self.__apply_parse_result(cell_loc, result, dependent_cell_list, answer, report_bad_formula)
+
+    def __apply_parse_result(self, cell_loc: Tuple[int, int], result: str,
+                             dependent_cell_list: List[FormulaDependency],
+                             answer: Any, report_bad_formula: bool) -> None:
         if result == PARSER_FORMULA:
-            self.__add_dependent_cell_to_relevant_cells(dependent_cell_list)
-            self.__update_formula_result_in_chosen_cell_in_sheet(answer)
-            self.__update_screen_formula_applied()
+            self.__set_cell_dependencies(cell_loc, dependent_cell_list)
+            self.__set_calculated_value(cell_loc, answer)
+            self.__on_cell_text_changed(cell_loc, answer)
         if result == PARSER_FORMULA_ERROR_CALCULATING:
-            self.__add_dependent_cell_to_relevant_cells(dependent_cell_list)
-            self.__on_cell_text_changed(self.__chosen_cell, CELL_ERROR_TEXT)
+            self.__set_cell_dependencies(cell_loc, dependent_cell_list)
+            self.__set_calculated_value(cell_loc, ERROR_VALUE)
+            self.__on_cell_text_changed(cell_loc, ERROR_VALUE)
         if result == PARSER_ERROR:
-            self.__on_error(BAD_FORMULA_ERROR_MSG)
+            self.__set_cell_dependencies(cell_loc, [])
+            if report_bad_formula:
+                self.__on_error(BAD_FORMULA_ERROR_MSG)
         if result == PARSER_NOT_FORMULA:
-            self.__on_cell_text_changed(self.__chosen_cell, answer)
+            self.__set_cell_dependencies(cell_loc, [])
+            self.__on_cell_text_changed(cell_loc, answer)
 
-    def __add_dependent_cell_to_relevant_cells(self, dependent_cell_list: List[Tuple[int, int]]) -> None:
+    def __set_calculated_value(self, cell_loc: Tuple[int, int], value: CellValue) -> None:
+        self.__sheet.set_calculated_value(cell_loc[0], cell_loc[1], value)
+
+    def __set_cell_dependencies(self, cell_loc: Tuple[int, int], dependent_cell_list: List[FormulaDependency]) -> None:
         """
-        Adding the dependent cell to the relevant cells in the sheet.
+        Replaces the edges of the cell in the dependency graph,
+        and keeps the dependent cells list of the read cells in the sheet in sync.
+        a range is kept only in the graph, as one edge, the cells it covers are not changed.
+        the cells and ranges of other sheets are kept in the graph of the workbook.
         """
-        for cell in dependent_cell_list:
-            self.get_sheet()[cell[0]][cell[1]].add_dependent_formula_cell(self.__chosen_cell)
+        cells = [loc for loc in dependent_cell_list if isinstance(loc, tuple) and self.__is_in_sheet(loc)]
+        self.__dependency_graph.set_range_precedents(
+            cell_loc, [loc for loc in dependent_cell_list if isinstance(loc, CellRange)])
+        if self.__workbook_graph is not None:
+            self.__workbook_graph.set_references(
+                self.__name, cell_loc, [loc for loc in dependent_cell_list if isinstance(loc, SheetReference)])
+        removed, added = self.__dependency_graph.set_precedents(cell_loc, cells)
+        for loc in removed:
+            self.__sheet.get_cell_for_write(*loc).remove_dependent_formula_cell(cell_loc)
+            self.__sheet.release_if_empty(*loc)
+        for loc in added:
+            self.__sheet.get_cell_for_write(*loc).add_dependent_formula_cell(cell_loc)
 
-    def __update_formula_result_in_chosen_cell_in_sheet(self, answer: str) -> None:
-        self.get_chosen_cell_from_sheet().update_formula_result(answer)
+    def __is_in_sheet(self, cell_loc: Tuple[int, int]) -> bool:
+        """
+        the sheet grows when a cell outside of it is written,
+        so every cell after the headers row and column is in it.
+        """
+        return cell_loc[0] > 0 and cell_loc[1] > 0
 
-    def __update_screen_formula_applied(self) -> None:
-        self.__on_cell_text_changed(self.__chosen_cell, self.get_chosen_cell_from_sheet().get_formula_result())
+    def __rebuild_dependency_graph(self) -> None:
+        """
+        Builds the dependency graph from the dependent cells
+        lists of the cells, called after the sheet was loaded.
+        the ranges are not in the lists, they are found in the formulas that read them.
+        """
+        self.__dependency_graph.clear()
+        precedents: Dict[Tuple[int, int], List[Tuple[int, int]]] = {}
+        for cell_loc, cell in self.__sheet.get_populated_cells():
+            for formula_cell in cell.get_dependent_formula_cells():
+                precedents.setdefault(tuple(formula_cell), []).append(cell_loc)  # type: ignore
+            if ":" in cell.get_text() and self.__parser.is_formula(cell.get_text()):
+                compiled = self.__parser.compile_expression(cell.get_text())
+                cell_range = compiled.get_cell_range()
+                if cell_range is not None and compiled.get_range_reference() is None:
+                    self.__dependency_graph.set_range_precedents(cell_loc, [cell_range])
+        for formula_cell, cells in precedents.items():
+            self.__dependency_graph.set_precedents(formula_cell, cells)
 
     def update_cell_color(self, color: str) -> None:
-        self.__sheet[self.__chosen_cell[0]][self.__chosen_cell[1]].change_color(color)
+        self.__begin_undo_step()
+        self.__sheet.get_cell_for_write(*self.__chosen_cell).change_color(color)
+        self.__sheet.release_if_empty(*self.__chosen_cell)
+        self.__journal_cell(self.__chosen_cell)
         self.__on_cell_color_changed(self.__chosen_cell, color)
+        self.__end_undo_step()
 
     def update_cell_font(self, font: str) -> None:
-        self.__sheet[self.__chosen_cell[0]][self.__chosen_cell[1]].change_font(font)
+        self.__begin_undo_step()
+        self.__sheet.get_cell_for_write(*self.__chosen_cell).change_font(font)
+        self.__sheet.release_if_empty(*self.__chosen_cell)
+        self.__journal_cell(self.__chosen_cell)
         self.__on_cell_font_changed(self.__chosen_cell, font)
+        self.__end_undo_step()
 
-    def save_to_file(self, file_name: str) -> None:
+    def save_to_file(self, file_name: str, on_progress: Optional[Callable[[int, int], None]] = None) -> None:
         """
         this function saves the sheet to a file with the given name.
+        if the name ends with the binary workbook extension, the sheet is saved
+        as a binary workbook, if it ends with .csv or .tsv only the values of
+        the cells are exported, otherwise it is saved as text, row by row.
+        saving to the file the sheet was loaded from or saved to before only syncs
+        its journal, the changes are folded into the file once the journal is long.
+        on_progress is called with the number of rows saved so far and the number of rows.
+        """
+        if is_delimited_file(file_name):
+            # an exported file is not the file of the sheet, it has no journal
+            self.__save_to_delimited_file(file_name)
+            return
+        if file_name.endswith(BINARY_FILE_EXTENSION):
+            filename = file_name
+        else:
+            filename = file_name + ".txt"
+        journal = self.__journal
+        if (journal is not None and journal.get_base_file_name() == os.path.abspath(filename) and
+                journal.get_record_count() < JOURNAL_COMPACTION_RECORDS):
+            try:
+                journal.sync()
+            except:
+                self.__on_error(ERROR_SAVING_FILE_MSG)
+            return
+        if filename.endswith(BINARY_FILE_EXTENSION):
+            is_saved = self.__save_to_binary_file(filename)
+        else:
+            is_saved = self.__save_to_text_file(filename, on_progress)
+        if is_saved:
+            if self.__journal is not None:
+                # the changes were saved to this file, not to the file of the old journal
+                self.__journal.discard_unsaved()
+            self.__journal = EditJournal(filename)
+            self.__journal.discard()
+
+    def __save_to_delimited_file(self, file_name: str) -> None:
+        self.evaluate_dirty_cells()
+        try:
+            write_delimited_file(file_name, self.__sheet)
+        except:
+            self.__on_error(ERROR_SAVING_FILE_MSG)
+
+    def __save_to_text_file(self, file_name: str, on_progress: Optional[Callable[[int, int], None]]) -> bool:
+        """
+        The file is written next to the old one and then replaces it,
+        so a crash while saving does not leave a half written file.
         """
-        data = self.serialize()
-        filename = file_name + ".txt"
+        temp_file_name = file_name + ".tmp"
         try:
-            with open(filename, 'w') as file:
-                file.write(data)
+            with open(temp_file_name, 'w') as file:
+                self.serialize_to(file, on_progress)
+            os.replace(temp_file_name, file_name)
         except:
             self.__on_error(ERROR_SAVING_FILE_MSG)
+            return False
+        return True
 
-    def load_from_file(self, file_name: str) -> None:
+    def load_from_file(self, file_name: str, on_progress: Optional[Callable[[int, int], None]] = None) -> None:
         """
         this function loads the sheet from a file with the given name.
+        a text file is read row by row, a .csv or .tsv file is imported a chunk of rows at a time.
+        on_progress is called with the number of rows loaded so far and the number of rows
+        (for csv and tsv files, the characters read so far and the size of the file).
+        the changes in the journal of the file are replayed over it.
         """
         filename = file_name  # + ".txt"
         try:
-            with open(filename, 'r') as file:
-                data_str = file.read()
-                self.deserialize(data_str)
-                self.__parser.update_sheet(self.__sheet)  # type: ignore
+            if is_delimited_file(filename):
+                self.__load_from_delimited_file(filename, on_progress)
+            elif is_binary_workbook(filename):
+                self.__load_from_binary_file(filename)
+            else:
+                with open(filename, 'r') as file:
+                    self.deserialize_from(file, on_progress)
+                    self.__parser.update_sheet(self.__sheet)
+                    self.__rebuild_dependency_graph()
         except:
             self.__on_error(ERROR_LOADING_FILE_MSG)
+            return
+        if self.__journal is not None:
+            # the changes to the file that was open were not saved
+            self.__journal.discard_unsaved()
+        self.__journal = None
+        self.__unjournaled_cells = set()
+        if is_delimited_file(filename):
+            return
+        journal = EditJournal(filename)
+        self.__replay_journal(journal.read_records())
+        self.__journal = journal
+
+    def __replay_journal(self, records: List[JournalRecord]) -> None:
+        """
+        Writes the changes of the journal to the cells again, in one transaction,
+        so the cells that depend on them are recalculated once.
+        """
+        with self.transaction():
+            for cell_loc, text, color, font in records:
+                self.__restore_cell(cell_loc, text, color, font)
+
+    def __restore_cell(self, cell_loc: Tuple[int, int], text: str, color: str, font: str) -> None:
+        """
+        Gives a cell a text and a style it had before, when the journal is replayed or a change is undone,
+        the cell is evaluated again and so are the cells that depend on it.
+        """
+        cell = self.__sheet.get_cell_for_write(*cell_loc)
+        cell.change_color(color)
+        cell.change_font(font)
+        cell.set_text(text)
+        self.__sheet.refresh_value(*cell_loc)
+        self.__dirty_cells.discard(cell_loc)
+        self.__parser.forget_compiled(cell_loc)
+        self.__journal_cell(cell_loc)
+        self.__evaluate_cell(cell_loc, False)
+        self.__cell_changed(cell_loc)
+        self.__on_cell_color_changed(cell_loc, color)
+        self.__on_cell_font_changed(cell_loc, font)
+        self.__sheet.release_if_empty(*cell_loc)
+
+    def can_undo(self) -> bool:
+        return bool(self.__undo_steps)
+
+    def can_redo(self) -> bool:
+        return bool(self.__redo_steps)
+
+    def undo(self) -> bool:
+        """
+        Undoes the last change of the text or the style of cells, they get the text and style
+        they have in the snapshot of the step and the cells that depend on them are recalculated.
+        returns False if there is nothing to undo, or a transaction is not committed yet.
+        """
+        return self.__undo_step(self.__undo_steps, self.__redo_steps)
+
+    def redo(self) -> bool:
+        """
+        Makes the last change that was undone again, returns False if there is nothing to redo.
+        """
+        return self.__undo_step(self.__redo_steps, self.__undo_steps)
+
+    def __undo_step(self, steps: Deque[Tuple[SheetStorage, Set[Tuple[int, int]]]],
+                    opposite_steps: Deque[Tuple[SheetStorage, Set[Tuple[int, int]]]]) -> bool:
+        """
+        Gives the cells of the last step of steps the text and style they have in its snapshot,
+        the step is moved to opposite_steps with a snapshot of now, so it can be made again.
+        """
+        if not steps or self.__transaction_depth > 0:
+            return False
+        snapshot, cells = steps.pop()
+        opposite_steps.append((self.__sheet.snapshot(with_values=False), cells))
+        self.__is_undoing = True
+        try:
+            with self.transaction():
+                for cell_loc in sorted(cells):
+                    cell = snapshot.get_cell(*cell_loc)
+                    self.__restore_cell(cell_loc, cell.get_text(), cell.get_color(), cell.get_font())
+        finally:
+            self.__is_undoing = False
+        return True
+
+    def __begin_undo_step(self) -> None:
+        """
+        Takes the snapshot of the step before a change is made, a change in a transaction
+        is part of the step of the transaction.
+        """
+        if self.__undo_limit == 0 or self.__is_undoing or self.__undo_snapshot is not None:
+            return
+        self.__undo_snapshot = self.__sheet.snapshot(with_values=False)
+
+    def __end_undo_step(self) -> None:
+        """
+        Keeps the step of the change if it changed any cell, the changes that were undone
+        cannot be made again after a new change.
+        """
+        if self.__transaction_depth > 0 or self.__undo_snapshot is None:
+            return
+        if self.__undo_cells:
+            self.__undo_steps.append((self.__undo_snapshot, self.__undo_cells))
+            self.__redo_steps.clear()
+        self.__undo_snapshot = None
+        self.__undo_cells = set()
+
+    def __save_to_binary_file(self, file_name: str) -> bool:
+        self.evaluate_dirty_cells()
+        try:
+            write_binary_workbook(file_name, self.__sheet.get_length(), self.__sheet.get_width(),
+                                  self.__sheet.get_populated_cells(),
+                                  self.__dependency_graph.get_all_range_precedents())
+        except:
+            self.__on_error(ERROR_SAVING_FILE_MSG)
+            return False
+        return True
+
+    def __load_from_binary_file(self, file_name: str) -> None:
+        """
+        Opens a binary workbook, the cells are loaded lazily
+        by the storage when they are first read, and the dependencies
+        are looked up in the file until they are changed.
+        """
+        reader = BinaryWorkbookReader(file_name)
+        sheet = SheetStorage(reader.get_row_count(), reader.get_column_count())
+        sheet.attach_block_reader(reader)
+        self.__replace_sheet(sheet)
+        self.__parser.update_sheet(self.__sheet)
+        self.__dependency_graph.attach_base(reader)
+
+    def __load_from_delimited_file(self, file_name: str, on_progress: Optional[Callable[[int, int], None]]) -> None:
+        """
+        Imports a csv or tsv file into a new storage, the values are stored directly
+        and then the formulas in it are evaluated, in one transaction.
+        """
+        sheet = SheetStorage()
+        formula_cells = read_delimited_file(file_name, sheet, self.__parser.is_formula, on_progress)
+        self.__replace_sheet(sheet)
+        self.__parser.update_sheet(self.__sheet)
+        self.__dependency_graph.clear()
+        with self.transaction():
+            for cell_loc in formula_cells:
+                self.__evaluate_cell(cell_loc, False)
+                self.__cell_changed(cell_loc)
 
     def write_to_chosen_cell(self, text: str) -> None:
-        self.__write_text_to_cell(text)
-        self.__update_dependent_cells()
+        self.__begin_undo_step()
+        if self.__write_text_to_cell(text):
+            self.__cell_changed(self.__chosen_cell)
+        self.__end_undo_step()
 
-    def __update_dependent_cells(self) -> None:
+    def __update_dependent_cells(self, changed_cells: Set[Tuple[int, int]]) -> None:
         """
-        updating the dependent cells of each cell that
-        a change was made in them.
+        updating the cells that depend on the changed cells,
+        directly or through other formulas. each of them is
+        recalculated once, after all the cells it reads.
+        cells in a circular reference are marked as errors.
+        with lazy evaluation they are only marked as dirty, and the visible ones are evaluated.
+        with background recalculation they are marked as dirty and evaluated in the background thread.
+        if cells of other sheets depend on them, the workbook recalculates the cells of all the sheets at once.
         """
-        cur_cell_loc = self.get_chosen_cell_loc()
-        cur_cell = self.get_chosen_cell_from_sheet()
-        cells_to_update = cur_cell.get_dependent_formula_cells()
-        for cell in cells_to_update:
-            self.__chosen_cell = cell
-            self.enter_pressed()
-        self.__chosen_cell = cur_cell_loc
+        if (self.__workbook_graph is not None and
+                self.__workbook_graph.reaches_other_sheets(self.__name, changed_cells, self.__dirty_cells)):
+            self.__on_workbook_cells_changed(self.__name, changed_cells)
+            return
+        if self.__lazy_evaluation or self.__background_recalculator is not None:
+            self.__dirty_cells |= self.__dependency_graph.get_dirty_cells(changed_cells, self.__dirty_cells)
+            if self.__lazy_evaluation:
+                self.__evaluate_visible_cells()
+            else:
+                self.__recalculate_in_background(set(self.__dirty_cells))
+            return
+        start_time = time.perf_counter() if self.__profiler is not None else 0.0
+        dirty_cells = self.__dependency_graph.get_dirty_cells(changed_cells)
+        levels, circular_cells = self.__dependency_graph.topological_levels(dirty_cells)
+        for level in levels:
+            self.__evaluate_level(level)
+        self.__mark_circular_cells(circular_cells)
+        if self.__profiler is not None:
+            self.__profiler.record_cascade(CASCADE_EDIT, len(changed_cells), levels, len(circular_cells),
+                                           time.perf_counter() - start_time)
+
+    def __mark_circular_cells(self, circular_cells: List[Tuple[int, int]]) -> None:
+        self.__set_error_values(circular_cells)
+        if circular_cells:
+            self.__on_error(CIRCULAR_REFERENCE_ERROR_MSG + ", ".join(map(get_cell_name, circular_cells)))
+
+    def __set_error_values(self, cells: List[Tuple[int, int]]) -> None:
+        for cell_loc in cells:
+            self.__set_calculated_value(cell_loc, ERROR_VALUE)
+            self.__on_cell_text_changed(cell_loc, ERROR_VALUE)
 
     def get_chosen_cell_from_sheet(self) -> Cell:
-        x = self.__sheet[self.__chosen_cell[0]][self.__chosen_cell[1]]
-        return self.__sheet[self.__chosen_cell[0]][self.__chosen_cell[1]]
+        """
+        Returns the chosen cell for reading, it must not be changed directly.
+        """
+        if self.__dirty_cells:
+            self.evaluate_cells([self.__chosen_cell])
+        return self.__sheet.get_cell(*self.__chosen_cell)
 
-    def __write_text_to_cell(self, text: str) -> None:
-        did_cell_write_new_text = self.get_chosen_cell_from_sheet().write_text(text)
+    def __write_text_to_cell(self, text: str) -> bool:
+        """
+        Writes the text to the chosen cell, the cell is not
+        a formula anymore until enter is pressed on it.
+        returns True if the text of the cell changed.
+        """
+        did_cell_write_new_text = self.__sheet.get_cell_for_write(*self.__chosen_cell).write_text(text)
+        self.__sheet.refresh_value(*self.__chosen_cell)
         if did_cell_write_new_text:
+            self.__dirty_cells.discard(self.__chosen_cell)
+            self.__journal_cell(self.__chosen_cell)
+            self.__parser.forget_compiled(self.__chosen_cell)
+            self.__set_cell_dependencies(self.__chosen_cell, [])
             self.__update_formula_box_text_written_to_cell(text)
             self.__on_cell_text_changed(self.__chosen_cell, text)
+        self.__sheet.release_if_empty(*self.__chosen_cell)
+        return did_cell_write_new_text
 
     def get_chosen_cell_loc(self) -> Tuple[int, int]:
         return self.__chosen_cell
@@ -1,5 +1,13 @@
-import re
-from typing import Tuple, List, Optional, Any
+import time
+from typing import Tuple, List, Optional, Any, Callable, Dict
+
+from cell_range import parse_cell_range, CellRange
+from compiled_formula import CompiledFormula
+from sheet_storage import SheetStorage
+from math_expression import CellOperand, compile_math_expression
+from cell_address import CELL_ADDRESS_PATTERN, get_column_index
+from recalculation_profiler import RecalculationProfiler
+from sheet_reference import SheetReference, split_sheet_name
 
 EXPRESSIONS_LIST = ["MATH", "SUM", "AVG", "MIN", "MAX"]
 FUNC_LIST = ["MATH", "SUM", "AVG", "MIN", "MAX"]
@@ -14,161 +22,198 @@ class SheetParser:
     """This class is responsible for parsing the expression in the cells
     that the user presses enter on. It is also responsible for calculating
     the result of the expression and updating the cell with the result.
+    the cells of other sheets of the workbook (Sheet2!A1) are read through the sheet resolver.
     """
-    def __init__(self, sheet: List[List[Optional[Any]]]) -> None:
+    def __init__(self,
+                 sheet: SheetStorage,
+                 sheet_name: Optional[str] = None,
+                 sheet_resolver: Optional[Callable[[SheetReference], Optional[SheetStorage]]] = None) -> None:
         """
         The constructor creates a sheet
         that will be called when the sheetscreen
         will construct the parser, and will be used to
         access the cells in the sheet.
+        a reference with sheet_name (the name of the sheet) is read as a cell of the sheet.
+        sheet_resolver returns the storage of the sheet a reference reads, after the cells it reads
+        were evaluated, or None if there is no such sheet. without it the references are errors.
         """
         self.__sheet = sheet
+        self.__sheet_name = sheet_name
+        self.__sheet_resolver = sheet_resolver
+        self.__compiled_cache: Dict[Tuple[int, int], CompiledFormula] = {}
+        self.__profiler: Optional[RecalculationProfiler] = None
+
+    def set_profiler(self, profiler: Optional[RecalculationProfiler]) -> None:
+        self.__profiler = profiler
 
-    def update_sheet(self, sheet: List[List[Optional[Any]]]) -> None:
+    def update_sheet(self, sheet: SheetStorage) -> None:
         self.__sheet = sheet
+        self.__compiled_cache = {}
 
-    def parse_expression(self, expression: str): # type: ignore
+    def parse_expression(self, expression: str, cell: Optional[Tuple[int, int]] = None): # type: ignore
         """
         The main function that parses the expression in the cell.
         It checks if the expression is a formula or not, according to the rules
         and if it is a formula
         it calculates the result of the formula and returns the result.
+        when the cell of the expression is given, the compiled formula is cached
+        for that cell, so recalculating it only evaluates the cached formula.
+        """
+        if cell is None:
+            return self.evaluate(self.compile_expression(expression))
+        if self.__profiler is not None:
+            return self.__parse_expression_profiled(expression, cell, self.__profiler)
+        return self.evaluate(self.get_compiled(expression, cell))
+
+    def get_compiled(self, expression: str, cell: Tuple[int, int]) -> CompiledFormula:
+        """
+        Returns the compiled formula of the cell from the cache, it is compiled if the text changed.
+        a compiled formula is not changed after it is made, so it can be evaluated in another thread.
+        """
+        compiled = self.__compiled_cache.get(cell)
+        if compiled is None or compiled.get_text() != expression:
+            compiled = self.compile_expression(expression)
+            self.__compiled_cache[cell] = compiled
+        return compiled
+
+    def __parse_expression_profiled(self, expression: str, cell: Tuple[int, int],  # type: ignore
+                                    profiler: RecalculationProfiler):
+        """
+        parse_expression when there is a profiler, it also reports
+        the cache hits, the compile time and the evaluation time of formulas.
+        """
+        compiled = self.__compiled_cache.get(cell)
+        if compiled is None or compiled.get_text() != expression:
+            start_time = time.perf_counter()
+            compiled = self.compile_expression(expression)
+            profiler.record_parse(False, time.perf_counter() - start_time)
+            self.__compiled_cache[cell] = compiled
+        else:
+            profiler.record_parse(True)
+        if compiled.get_function() is None:
+            return self.evaluate(compiled)
+        start_time = time.perf_counter()
+        result = self.evaluate(compiled)
+        profiler.record_formula(self.__sheet_name, cell, time.perf_counter() - start_time)
+        return result
+
+    def is_formula(self, expression: str) -> bool:
+        """
+        Checks only the function name of the expression,
+        so cells that are not formulas can be skipped without compiling them.
+        """
+        return expression.split("(", 1)[0] in FUNC_LIST
+
+    def forget_compiled(self, cell: Tuple[int, int]) -> None:
+        """
+        Drops the cached compiled formula of the cell,
+        called when the text of the cell changes.
+        """
+        self.__compiled_cache.pop(cell, None)
+
+    def compile_expression(self, expression: str) -> CompiledFormula:
+        """
+        Turns the text of a cell into a compiled formula:
+        finds the function, tokenizes the text inside the brackets
+        and resolves the cells addresses to index tuples.
         """
         func = expression.split("(", 2)[0]
         if func not in FUNC_LIST:
-            return PARSER_NOT_FORMULA, [], expression
+            return CompiledFormula(expression)
 
         start = expression.find('(') + 1
         end = expression.find(')')
         if start == -1 or end == -1:
-            return PARSER_ERROR, [], None
+            return CompiledFormula(expression, func)
         inside_brackets = expression[start:end]
         tuples_cells_list = []
 
         if func == "MATH":
-            cells_list = self.__split_and_keep(inside_brackets)
-            if not cells_list:
-                return PARSER_ERROR, [], None
-            index_operators_list = self.__swap_alphabetical_cells_with_index_tuples(cells_list, True, True)
-            if not index_operators_list:
-                return PARSER_ERROR, [], None
-            values_list = self.__swap_locations_with_values(index_operators_list, True)
-            if not values_list:
-                return PARSER_FORMULA_ERROR_CALCULATING, self.__get_only_tuples_from_list(index_operators_list), None
-            math_result = self.__calculate_math_expression(values_list)
-            if math_result == PARSER_FORMULA_ERROR_CALCULATING:
-                return PARSER_FORMULA_ERROR_CALCULATING, self.__get_only_tuples_from_list(index_operators_list), None
-            return PARSER_FORMULA, self.__get_only_tuples_from_list(index_operators_list), str(math_result)
+            math_expression = compile_math_expression(expression[start:expression.rfind(')')], self.__sheet_name)
+            if math_expression is None:
+                return CompiledFormula(expression, func)
+            return CompiledFormula(expression, func, math_expression.get_cells(), math_expression=math_expression)
 
         if ":" in inside_brackets:
-            cells_list = inside_brackets.split(":")
-            if len(cells_list) != 2:
-                return PARSER_ERROR, [], None
-            tuples_cells_list = self.__swap_alphabetical_cells_with_index_tuples(cells_list, False, False)
-            if not tuples_cells_list:
-                return PARSER_ERROR, [], None
-            tuples_cells_list = self.__add_missing_tuples(tuples_cells_list)
+            range_sheet_name, range_text = split_sheet_name(inside_brackets)
+            cell_range = parse_cell_range(range_text)
+            if cell_range is None:
+                return CompiledFormula(expression, func)
+            if range_sheet_name == self.__sheet_name:
+                range_sheet_name = None
+            return CompiledFormula(expression, func, [], cell_range, range_sheet_name=range_sheet_name)
 
         if "," in inside_brackets:
             cells_list = inside_brackets.split(",")
-            tuples_cells_list = self.__swap_alphabetical_cells_with_index_tuples(cells_list, True, False)
+            tuples_cells_list = self.__swap_alphabetical_cells_with_index_tuples(cells_list, True)
             if not tuples_cells_list:
-                return PARSER_ERROR, [], None
+                return CompiledFormula(expression, func)
+
+        return CompiledFormula(expression, func, tuples_cells_list)
+
+    def evaluate(self, compiled: CompiledFormula): # type: ignore
+        """
+        Calculates the result of a compiled formula
+        against the current values in the sheet.
+        """
+        func = compiled.get_function()
+        if func is None:
+            return PARSER_NOT_FORMULA, [], compiled.get_text()
+        operands = compiled.get_operands()
+        if operands is None:
+            return PARSER_ERROR, [], None
+        dependencies = compiled.get_dependencies()
+
+        math_expression = compiled.get_math_expression()
+        if math_expression is not None:
+            math_result = math_expression.evaluate(self.__get_cell_number)
+            if math_result is None:
+                return PARSER_FORMULA_ERROR_CALCULATING, dependencies, None
+            return PARSER_FORMULA, dependencies, float(math_result)
+
+        cell_range = compiled.get_cell_range()
+        if cell_range is not None:
+            range_reference = compiled.get_range_reference()
+            storage = self.__sheet if range_reference is None else self.__resolve(range_reference)
+            aggregate = None if storage is None else _aggregate_range(storage, func, cell_range)
+            if aggregate is None:
+                return PARSER_FORMULA_ERROR_CALCULATING, dependencies, None
+            return PARSER_FORMULA, dependencies, float(aggregate)
 
-        values_list = self.__swap_locations_with_values(tuples_cells_list, False)
+        values_list = self.__swap_locations_with_values(operands)
         if not values_list:
-            return PARSER_FORMULA_ERROR_CALCULATING, self.__get_only_tuples_from_list(tuples_cells_list), None
+            return PARSER_FORMULA_ERROR_CALCULATING, dependencies, None
 
         if func == "SUM":
-            return PARSER_FORMULA, self.__get_only_tuples_from_list(tuples_cells_list), str(sum(values_list))
+            return PARSER_FORMULA, dependencies, float(sum(values_list))
         if func == "AVG":
-            return (PARSER_FORMULA, self.__get_only_tuples_from_list(tuples_cells_list),
-                    str(sum(values_list) / len(values_list)))
+            return PARSER_FORMULA, dependencies, float(sum(values_list) / len(values_list))
         if func == "MIN":
-            return PARSER_FORMULA, self.__get_only_tuples_from_list(tuples_cells_list), str(min(values_list))
+            return PARSER_FORMULA, dependencies, float(min(values_list))
         if func == "MAX":
-            return PARSER_FORMULA, self.__get_only_tuples_from_list(tuples_cells_list), str(max(values_list))
+            return PARSER_FORMULA, dependencies, float(max(values_list))
 
-    def __split_and_keep(self, s: str) -> List[str]:
-        """
-        Return a list of the words in the string, using sep as the delimiter string,
-        but keeping the delimiters as well. For example, 'A+B-C' -> ['A', '+', 'B', '-', 'C']
-        """
-        delimiters = ['*', '+', '-', '/']
-        pattern = '|'.join(map(re.escape, delimiters))
-        split_arr = re.split(f'({pattern})', s)
-        if split_arr[-1] == "":
-            return []
-        for i, item in enumerate(split_arr):
-            if i % 2 == 1 and item not in delimiters:
-                return []
-        return split_arr
-
-    # def __calculate_math_expression(self, expression: List[float]):  # type: ignore
-    #     """
-    #     Gets a list of numbers and operators and calculates the result of the expression.
-    #     """
-    #     if len(expression) % 2 == 0:
-    #         return []
-    #
-    #     result = expression[0]
-    #     for i in range(1, len(expression), 2):
-    #         operator = expression[i]
-    #         number = expression[i + 1]
-    #         if operator == '+':  # type: ignore
-    #             result += number
-    #         elif operator == '-':  # type: ignore
-    #             result -= number
-    #         elif operator == '*':  # type: ignore
-    #             result *= number
-    #         elif operator == '/':  # type: ignore
-    #             if number == 0:
-    #                 return PARSER_FORMULA_ERROR_CALCULATING
-    #             result /= number
-    #         else:
-    #             return []
-    #     return result
-
-    def __calculate_math_expression(self, expression: List[str]) -> float or str:  # type: ignore
-        """
-        Gets a list of numbers and operators and calculates the result of the expression.
-        """
-        try:
-            expression_str = ''.join(str(e) for e in expression)
-            result = eval(expression_str)
-            return result
-        except ZeroDivisionError:
-            return PARSER_FORMULA_ERROR_CALCULATING
-        except Exception as e:
-            return str(e)
-
-    def __get_only_tuples_from_list(self, lst: List[Any]) -> List[Tuple[int, int]] or List[Tuple[None]]:  # type: ignore
-        return [item for item in lst if isinstance(item, tuple)]
-
-    def __swap_alphabetical_cells_with_index_tuples(self, cells_list, allow_floats, is_math) -> List[Tuple[int, int]] or List[float] or None:  # type: ignore
+    def __swap_alphabetical_cells_with_index_tuples(self, cells_list, allow_floats) -> List[Tuple[int, int]] or List[float] or None:  # type: ignore
         """
         This function is responsible for swapping the cells in the expression
         with their indexes in the sheet. It also checks if the cells are valid.
+        the cells of other sheets are swapped with sheet references.
         """
-        alpha_cells_list = []
-        for i, cell in enumerate(cells_list):
-            if (i % 2 == 1) and is_math:
-                alpha_cells_list.append(cell)
-                continue
+        alpha_cells_list: List[Any] = []
+        for cell in cells_list:
             if allow_floats and self.__check_if_string_is_float(cell):
                 alpha_cells_list.append(float(cell))
                 continue
-            if len(cell) > 3 or len(cell) < 2:
-                return []
-            letter = cell[0]
-            if not letter.isupper():
+            cell_sheet_name, cell = split_sheet_name(cell)
+            address_match = CELL_ADDRESS_PATTERN.fullmatch(cell)
+            if address_match is None:
                 return []
-            letter_num = ord(letter) - ord('A') + 1
-            for c in cell[1:]:
-                if not c.isdigit():
-                    return []
-            number = int(cell[1:])
-            alpha_cells_list.append((number, letter_num))
+            letter_num = get_column_index(address_match.group(1))
+            number = int(address_match.group(2))
+            if cell_sheet_name is None or cell_sheet_name == self.__sheet_name:
+                alpha_cells_list.append((number, letter_num))
+            else:
+                alpha_cells_list.append(SheetReference(cell_sheet_name, (number, letter_num)))
         return alpha_cells_list
 
     def __check_if_string_is_float(self, string: str) -> bool:
@@ -178,43 +223,58 @@ class SheetParser:
         except ValueError:
             return False
 
-    def __add_missing_tuples(self, location: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
-        cell1 = location[0]
-        cell2 = location[1]
-
-        result = []
-        if cell1[0] == cell2[0]:
-            for col in range(cell1[1], cell2[1] + 1):
-                result.append((cell1[0], col))
-
-        elif cell1[1] == cell2[1]:
-            for row in range(cell1[0], cell2[0] + 1):
-                result.append((row, cell1[1]))
-        else:
-            return []
-        return result
-
-    def __swap_locations_with_values(self, locations, is_math) -> List[float] or List[str] or None: # type: ignore
+    def __swap_locations_with_values(self, locations) -> List[float] or None: # type: ignore
         """
         This func is responsible for swapping the locations in the expression
         with their values in the sheet. It also checks if the locations are valid.
         """
         values = []
-        for i, loc in enumerate(locations):
-            if (i % 2 == 1) and is_math:
-                values.append(loc)
-                continue
+        for loc in locations:
             if type(loc) is float:
                 values.append(loc)
                 continue
-            if loc[0] >= len(self.__sheet) or loc[1] >= len(self.__sheet[0]):
-                return []
-            if loc[0] <= 0 or loc[1] <= 0:
-                return []
-            x = self.__sheet[loc[0]][loc[1]].get_formula_result()
-            try:
-                y = float(x)
-                values.append(y)
-            except ValueError:
+            value = self.__get_cell_number(loc)
+            if value is None:
                 return []
+            values.append(value)
         return values
+
+    def __get_cell_number(self, loc: CellOperand) -> Optional[float]:
+        """
+        Returns the numeric value of the cell in the given location,
+        or None if the location is not valid or the cell is not a number.
+        """
+        if isinstance(loc, SheetReference):
+            storage = self.__resolve(loc)
+            if storage is None:
+                return None
+            return _get_number(storage, loc.get_target())  # type: ignore
+        return _get_number(self.__sheet, loc)
+
+    def __resolve(self, reference: SheetReference) -> Optional[SheetStorage]:
+        if self.__sheet_resolver is None:
+            return None
+        return self.__sheet_resolver(reference)
+
+
+def _get_number(sheet: SheetStorage, loc: Tuple[int, int]) -> Optional[float]:
+    if loc[0] >= sheet.get_length() or loc[1] >= sheet.get_width():
+        return None
+    if loc[0] <= 0 or loc[1] <= 0:
+        return None
+    return sheet.get_number(loc[0], loc[1])
+
+
+def _aggregate_range(sheet: SheetStorage, func: str, cell_range: CellRange) -> Optional[float]:
+    """
+    Aggregates a range of cells with the numeric values mirrored in the sheet's column store.
+    returns None if the range is not valid or one of its cells is not a number,
+    whole columns and whole rows skip the cells that are not numbers.
+    """
+    if cell_range.get_first_row() <= 0 or cell_range.get_first_col() <= 0:
+        return None
+    if cell_range.is_bounded():
+        first_row, first_col, last_row, last_col = cell_range.clip(0, 0)
+        if last_row >= sheet.get_length() or last_col >= sheet.get_width():
+            return None
+    return sheet.aggregate_range(func, cell_range)
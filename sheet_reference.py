@@ -0,0 +1,68 @@
+import re
+from typing import Optional, Tuple, Union
+
+from cell_address import get_cell_name
+from cell_range import CellRange, Dependency
+
+SHEET_NAME_PATTERN = re.compile('[A-Za-z_][A-Za-z0-9_]*')
+SHEET_NAME_SEPARATOR = "!"
+
+
+class SheetReference:
+    """
+    The SheetReference class is a cell or a range of another sheet of the workbook that a formula reads,
+    for example Sheet2!A1 or Sheet2!A1:C5.
+    it is not an edge of the dependency graph of the sheet, the graph of the workbook keeps it.
+    The reference has the following attributes:
+    - sheet_name: the name of the sheet it reads
+    - target: the cell (row, col) or the range it reads in that sheet
+    """
+
+    def __init__(self, sheet_name: str, target: Dependency) -> None:
+        self.__sheet_name = sheet_name
+        self.__target = target
+        self.__hash = hash((sheet_name, target))
+
+    def get_sheet_name(self) -> str:
+        return self.__sheet_name
+
+    def get_target(self) -> Dependency:
+        return self.__target
+
+    def __eq__(self, other: object) -> bool:
+        return (isinstance(other, SheetReference) and
+                self.__sheet_name == other.get_sheet_name() and self.__target == other.get_target())
+
+    def __hash__(self) -> int:
+        return self.__hash
+
+    def __str__(self) -> str:
+        if isinstance(self.__target, CellRange):
+            return self.__sheet_name + SHEET_NAME_SEPARATOR + str(self.__target)
+        return self.__sheet_name + SHEET_NAME_SEPARATOR + get_cell_name(self.__target)
+
+    def __repr__(self) -> str:
+        return "SheetReference(" + str(self) + ")"
+
+
+# what a formula reads: a cell or a range of its own sheet, or of another sheet
+FormulaDependency = Union[Dependency, SheetReference]
+
+
+def is_sheet_name(name: str) -> bool:
+    """
+    A sheet name is letters, digits and underscores, and does not start with a digit.
+    """
+    return SHEET_NAME_PATTERN.fullmatch(name) is not None
+
+
+def split_sheet_name(text: str) -> Tuple[Optional[str], str]:
+    """
+    Splits a reference to the name of its sheet and the cell or range, for example Sheet2!A1 -> (Sheet2, A1).
+    a reference without a sheet name gives (None, text). a name that is not a sheet name
+    is left in the text, so the text is not a cell or a range.
+    """
+    sheet_name, separator, target = text.partition(SHEET_NAME_SEPARATOR)
+    if not separator or not is_sheet_name(sheet_name):
+        return None, text
+    return sheet_name, target
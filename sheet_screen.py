@@ -1,30 +1,65 @@
-
 import tkinter as tk
-from typing import Tuple, Dict
+from typing import Any, Tuple, Dict, List, Optional
 
 from sheet import Sheet
+from sheet_tabs import SheetTabs
+from workbook import Workbook
+from cell_address import get_column_name
 from tkinter import font
 from tkinter import messagebox
 from formula_box import FormulaBox
+from style_table import STYLE_TABLE
+from cell import Cell
+from cell_value import CellValue, format_value
 
 DEFAULT_FONT_SIZE = 10
+SAVING_PROGRESS_TITLE = "Saving... "
+LOADING_PROGRESS_TITLE = "Loading... "
+# the number of rows and columns of cells that are shown on the screen at once,
+# only these entries are created and they show different cells as the sheet is scrolled
+VIEWPORT_ROWS = 19
+VIEWPORT_COLUMNS = 14
+MOUSE_WHEEL_ROWS = 3
+# the dependent cells are recalculated once the user stops typing for this long, or confirms the edit
+TYPING_RECALCULATION_DELAY_MS = 300
+# the cells that are recalculated in the background show this until their value is ready
+CALCULATING_TEXT = "..."
+# the results of the background recalculation are applied to the screen this often
+BACKGROUND_POLL_MS = 50
 
 
 class SheetScreen:
     """
     The class represents the screen of the sheet using tkinter.
+    only the cells in the viewport have widgets, the entries are recycled
+    and show other cells of the sheet when it is scrolled.
     The screen has the following attributes:
-    - sheet: a Sheet object
+    - workbook: a Workbook object, its sheets are shown in tabs under the cells
+    - sheet: the sheet of the workbook that is shown
+    - sheet_tabs: a SheetTabs object
     - window: the window of the screen
     - formula_box: a FormulaBox object
-    - live_updaters: a dictionary that stores the StringVars of the Entries
-    - entries: a dictionary that stores the Entries
+    - live_updaters: the StringVars of the entries, by their slot (row, col) in the viewport
+    - entries: the Entries of the viewport, by their slot
+    - row_labels, column_labels: the headers of the viewport
+    - first_row, first_col: the cell of the sheet that is shown in the top left slot
+    - fonts: the tkinter fonts that were made, by their family
+    - style_configs: the configuration of an entry for every style that was shown, by the style id
+    - slot_styles: the style id that every entry is configured with
+    - typing_commit_id: the id of the scheduled commit of the typing transaction,
+      None if the user is not typing. while the user types the text is written to the sheet
+      in a transaction, so the dependent cells are not recalculated on every key
+    - background_poll_id: the id of the scheduled check for results of the background recalculation,
+      None if no recalculation is running. the dependent cells of an edit are recalculated
+      in a background thread, so the window keeps responding while a long cascade is calculated
     """
 
-    def __init__(self, root: tk.Tk) -> None:
+    def __init__(self, root: tk.Tk, lazy_evaluation: bool = False) -> None:
         """
         The constructor of the SheetScreen class.
         it makes the screen of the sheet using tkinter.
+        with lazy evaluation only the formulas in the viewport are recalculated after an edit,
+        the others are recalculated when they are scrolled into view.
         """
 
         self.__formula_box = FormulaBox(
@@ -33,18 +68,38 @@ class SheetScreen:
             on_enter_pressed=self.__on_cell_enter_pressed
         )
         self.__formula_box.pack(side=tk.TOP)
-        self.__sheet = Sheet(
-            name="sheet1",
+        self.__root = root
+        self.__workbook = Workbook(
             on_cell_text_changed=self.__change_cell_text,
             on_cell_color_changed=self.__change_cell_color,
             on_cell_font_changed=self.__change_cell_font,
             on_error=self.__show_error,
-            update_formula_box_text_written_to_cell=self.__update_formula_box_with_text
+            update_formula_box_text_written_to_cell=self.__update_formula_box_with_text,
+            lazy_evaluation=lazy_evaluation,
+            background_recalculation=True,
+            on_background_recalculation_started=self.__on_background_recalculation_started
         )
+        self.__sheet: Sheet = self.__workbook.get_active_sheet()
         self.__window = tk.Frame(root, width=300, height=300, background="alice blue")
+        self.__sheet_tabs = SheetTabs(self.__window, on_tab_chosen=self.__show_other_sheet,
+                                      on_add_pressed=self.__add_sheet)
+        root.bind_all('<Control-z>', lambda event: self.__undo())  # type: ignore
+        root.bind_all('<Control-y>', lambda event: self.__redo())  # type: ignore
         root.configure(background='alice blue')
         self.__live_updaters: Dict[Tuple[int, int], tk.StringVar] = {}
         self.__entries: Dict[Tuple[int, int], tk.Entry] = {}
+        self.__row_labels: List[tk.Label] = []
+        self.__column_labels: List[tk.Label] = []
+        self.__vertical_scrollbar: Optional[tk.Scrollbar] = None
+        self.__horizontal_scrollbar: Optional[tk.Scrollbar] = None
+        self.__first_row = 1
+        self.__first_col = 1
+        self.__fonts: Dict[str, font.Font] = {}
+        self.__style_configs: Dict[int, Dict[str, Any]] = {}
+        self.__slot_styles: Dict[Tuple[int, int], int] = {}
+        self.__is_showing_sheet_text = False
+        self.__typing_commit_id: Optional[str] = None
+        self.__background_poll_id: Optional[str] = None
 
     def get_screen(self) -> tk.Frame:
         return self.__window
@@ -56,87 +111,281 @@ class SheetScreen:
         self.__sheet.update_cell_font(font)
 
     def report_save_file_button_pressed(self, file_name: str) -> None:
-        self.__sheet.save_to_file(file_name)
+        self.__commit_typing()
+        title = self.__root.title()
+        self.__workbook.save_to_file(file_name,
+                                     lambda done, total: self.__show_progress(SAVING_PROGRESS_TITLE, done, total))
+        self.__root.title(title)
         self.update_sheet()
 
     def report_load_file_button_pressed(self, file_name: str) -> None:
-        self.__sheet.load_from_file(file_name)
+        self.__commit_typing()
+        title = self.__root.title()
+        self.__workbook.load_from_file(file_name,
+                                       lambda done, total: self.__show_progress(LOADING_PROGRESS_TITLE, done, total))
+        self.__root.title(title)
+        if self.__workbook.get_active_sheet() is not self.__sheet:
+            # a workbook file was opened, its active sheet is shown from its start
+            self.__show_sheet(self.__workbook.get_active_sheet())
+        else:
+            self.update_sheet()
+
+    def __show_other_sheet(self, sheet_name: str) -> None:
+        """
+        Shows the sheet of the tab the user chose, it is loaded now if it was not loaded yet.
+        """
+        self.__commit_typing()
+        if sheet_name != self.__workbook.get_active_sheet_name() and self.__workbook.set_active_sheet(sheet_name):
+            self.__show_sheet(self.__workbook.get_active_sheet())
+
+    def __add_sheet(self) -> None:
+        self.__commit_typing()
+        sheet_name = self.__workbook.add_sheet()
+        if sheet_name is not None and self.__workbook.set_active_sheet(sheet_name):
+            self.__show_sheet(self.__workbook.get_active_sheet())
+
+    def __show_sheet(self, sheet: Sheet) -> None:
+        """
+        Shows another sheet of the workbook from its top left cell,
+        with its chosen cell in the formula box.
+        """
+        self.__sheet = sheet
+        self.__first_row = 1
+        self.__first_col = 1
         self.update_sheet()
+        self.__update_formula_box_with_text(self.__sheet.get_chosen_cell_from_sheet().get_text())
+
+    def close(self) -> None:
+        """
+        Closes the workbook without saving it, called when the window is closed.
+        """
+        if self.__typing_commit_id is not None:
+            self.__root.after_cancel(self.__typing_commit_id)
+            self.__typing_commit_id = None
+        if self.__background_poll_id is not None:
+            self.__root.after_cancel(self.__background_poll_id)
+            self.__background_poll_id = None
+        self.__workbook.close()
+
+    def __show_progress(self, title: str, done: int, total: int) -> None:
+        """
+        Shows the progress of saving or loading a file in the title of the window,
+        and lets tkinter redraw it so the window does not look frozen.
+        """
+        self.__root.title(title + str(done * 100 // max(total, 1)) + "%")
+        self.__root.update_idletasks()
+
+    def __get_slot(self, coord: Tuple[int, int]) -> Optional[Tuple[int, int]]:
+        """
+        Returns the slot of the viewport that shows the cell, or None if the cell is not visible.
+        """
+        slot = (coord[0] - self.__first_row, coord[1] - self.__first_col)
+        if 0 <= slot[0] < VIEWPORT_ROWS and 0 <= slot[1] < VIEWPORT_COLUMNS:
+            return slot
+        return None
+
+    def __get_coord(self, slot: Tuple[int, int]) -> Tuple[int, int]:
+        return self.__first_row + slot[0], self.__first_col + slot[1]
+
+    def __get_font(self, family: str) -> font.Font:
+        """
+        Returns the tkinter font of a family, the fonts are shared by all the entries.
+        """
+        cell_font = self.__fonts.get(family)
+        if cell_font is None:
+            cell_font = font.Font(family=family, size=DEFAULT_FONT_SIZE)
+            self.__fonts[family] = cell_font
+        return cell_font
+
+    def __get_style_config(self, style_id: int) -> Dict[str, Any]:
+        """
+        Returns the configuration of an entry that shows a style,
+        it is made once for every style and shared by all the entries.
+        """
+        config = self.__style_configs.get(style_id)
+        if config is None:
+            config = {"background": STYLE_TABLE.get_color(style_id),
+                      "font": self.__get_font(STYLE_TABLE.get_font(style_id))}
+            self.__style_configs[style_id] = config
+        return config
+
+    def __show_style(self, slot: Tuple[int, int], style_id: int) -> None:
+        """
+        Configures the entry with the style, only if it shows another style now.
+        """
+        if self.__slot_styles.get(slot) != style_id:
+            self.__entries[slot].configure(**self.__get_style_config(style_id))
+            self.__slot_styles[slot] = style_id
 
     def __change_cell_color(self, coord: Tuple[int, int], color: str) -> None:
-        self.__entries[coord].configure(background=color)
+        slot = self.__get_slot(coord)
+        if slot is None or slot not in self.__entries:
+            return
+        self.__show_style(slot, self.__sheet.get_sheet().get_cell(*coord).get_style_id())
 
     def __change_cell_font(self, coord: Tuple[int, int], new_font: str) -> None:
-        tk_font = font.Font(family=new_font, size=DEFAULT_FONT_SIZE, weight="bold")
-        self.__entries[coord].configure(font=tk_font)
+        slot = self.__get_slot(coord)
+        if slot is None or slot not in self.__entries:
+            return
+        self.__show_style(slot, self.__sheet.get_sheet().get_cell(*coord).get_style_id())
 
     def __show_error(self, error_msg: str) -> None:
         messagebox.showerror("ERROR!", error_msg)
 
     def update_sheet(self) -> None:
         """
-        The main function that constantly
-        updates the sheet on the screen.
-        it creates the sheet on the screen and
-        creates the string vars for each cell,
-        so they will be updated, and creates the entries
-        that will be updated when the user types in them.
-        it also binds each entry to the functions that
-        will be called when the user clicks, press enter and tab
-        in them.
+        Shows the sheet on the screen.
+        the first time it is called it creates the entries of the viewport,
+        the headers and the scrollbars. each entry has a string var,
+        so it is updated when the user types in it, and is bound to the functions that
+        will be called when the user clicks, press enter and tab in it.
+        then it shows the cells of the sheet that are in the viewport, and the tabs of the sheets.
+        """
+        if not self.__entries:
+            self.__create_viewport()
+        self.__show_viewport()
+        self.__sheet_tabs.show_tabs(self.__workbook.get_sheet_names(), self.__workbook.get_active_sheet_name())
+
+    def __create_viewport(self) -> None:
+        label = tk.Label(self.__window, bg="green4", fg="white", text="*", width=10)
+        label.grid(row=0, column=0, padx=5, pady=5)
+        for j in range(VIEWPORT_COLUMNS):
+            label = tk.Label(self.__window, bg="green4", fg="white", width=10)
+            label.grid(row=0, column=j + 1, padx=5, pady=5)
+            self.__column_labels.append(label)
+        for i in range(VIEWPORT_ROWS):
+            label = tk.Label(self.__window, bg="green4", fg="white", width=10)
+            label.grid(row=i + 1, column=0, padx=5, pady=5)
+            self.__bind_mouse_wheel(label)
+            self.__row_labels.append(label)
+            for j in range(VIEWPORT_COLUMNS):
+                live_updater = tk.StringVar()
+                self.__live_updaters[(i, j)] = live_updater
+                entry = tk.Entry(self.__window, textvariable=live_updater, width=10)
+                self.__entries[(i, j)] = entry
+                entry.grid(row=i + 1, column=j + 1, padx=5, pady=5)
+                live_updater.trace_add(
+                    mode="write",
+                    callback=lambda name, index, mode, slot=(i, j): self.__on_text_change(slot)  # type: ignore
+                )
+                entry.bind('<Button-1>', lambda event, slot=(i, j): self.__on_cell_clicked(event, slot))  # type: ignore
+
+                entry.bind('<Return>', lambda event: self.__on_cell_enter_pressed())  # type: ignore
+                entry.bind('<Tab>', lambda event, slot=(i, j): self.__on_cell_tab_pressed(event, slot))  # type: ignore
+                self.__bind_mouse_wheel(entry)
+        self.__vertical_scrollbar = tk.Scrollbar(self.__window, orient=tk.VERTICAL, command=self.__on_vertical_scroll)
+        self.__vertical_scrollbar.grid(row=1, column=VIEWPORT_COLUMNS + 1, rowspan=VIEWPORT_ROWS, sticky=tk.NS)
+        self.__horizontal_scrollbar = tk.Scrollbar(self.__window, orient=tk.HORIZONTAL,
+                                                   command=self.__on_horizontal_scroll)
+        self.__horizontal_scrollbar.grid(row=VIEWPORT_ROWS + 1, column=1, columnspan=VIEWPORT_COLUMNS, sticky=tk.EW)
+        self.__sheet_tabs.grid(row=VIEWPORT_ROWS + 2, column=0, columnspan=VIEWPORT_COLUMNS + 1, sticky=tk.W)
+
+    def __bind_mouse_wheel(self, widget: tk.Widget) -> None:
+        widget.bind('<MouseWheel>', lambda event: self.__scroll_rows(-MOUSE_WHEEL_ROWS if event.delta > 0
+                                                                      else MOUSE_WHEEL_ROWS))
+        widget.bind('<Button-4>', lambda event: self.__scroll_rows(-MOUSE_WHEEL_ROWS))
+        widget.bind('<Button-5>', lambda event: self.__scroll_rows(MOUSE_WHEEL_ROWS))
+
+    def __show_viewport(self) -> None:
+        """
+        Shows the cells of the sheet that are in the viewport in the recycled entries,
+        the cells are read from the sheet only now, when they become visible.
         """
+        self.__sheet.set_visible_region(self.__first_row, self.__first_col,
+                                        self.__first_row + VIEWPORT_ROWS - 1, self.__first_col + VIEWPORT_COLUMNS - 1)
         cur_sheet = self.__sheet.get_sheet()
-        for i in range(len(cur_sheet)):
-            for j in range(len(cur_sheet[0])):
-                if i == 0 and j == 0:
-                    label = tk.Label(self.__window, bg="green4", fg="white", text="*", width=10)
-                    label.grid(row=i, column=j, padx=5, pady=5)
-                elif i == 0:
-                    index_letter = self.__get_column_letter_from_index(j)
-                    label = tk.Label(self.__window, bg="green4", fg="white", text=index_letter, width=10)
-                    label.grid(row=i, column=j, padx=5, pady=5)
-                elif j == 0:
-                    label = tk.Label(self.__window, bg="green4", fg="white", text=i, width=10)
-                    label.grid(row=i, column=j, padx=5, pady=5)
-                else:
-                    live_updater = tk.StringVar()
-                    self.__live_updaters[(i, j)] = live_updater
-                    cell_font = font.Font(family=cur_sheet[i][j].get_font(), size=DEFAULT_FONT_SIZE)
-                    entry = tk.Entry(
-                        self.__window,
-                        textvariable=live_updater,
-                        width=10,
-                        font=cell_font,
-                        background=cur_sheet[i][j].get_color()
-                    )
-                    entry.insert(0, cur_sheet[i][j].get_formula_result())
-                    self.__entries[(i, j)] = entry
-                    entry.grid(row=i, column=j, padx=5, pady=5)
-                    live_updater.trace_add(
-                        mode="write",
-                        callback=lambda name, index, mode, row=i, col=j: self.__on_text_change(row, col)  # type: ignore
-                    )
-                    entry.bind('<Button-1>', lambda event, coord=(i, j): self.__on_cell_clicked(event, coord))  # type: ignore
-
-                    entry.bind('<Return>', lambda event, coord=(i, j): self.__on_cell_enter_pressed())  # type: ignore
-                    entry.bind('<Tab>', lambda event, coord=(i, j): self.__on_cell_tab_pressed(event, coord))  # type: ignore
-
-
-    def __get_column_letter_from_index(self, index: int) -> str:
-        column_label = ""
-        while index >= 0:
-            column_label = chr(index % 26 + 64) + column_label
-            index = index // 26 - 1
-        return column_label
-
-    def __on_cell_tab_pressed(self, event, coord: Tuple[int, int]) -> None:  # type: ignore
-        i, j = coord
-        num_rows = len(self.__sheet.get_sheet())
-        num_columns = len(self.__sheet.get_sheet()[0])
+        for j, label in enumerate(self.__column_labels):
+            label.configure(text=get_column_name(self.__first_col + j))
+        for i, label in enumerate(self.__row_labels):
+            label.configure(text=str(self.__first_row + i))
+        self.__is_showing_sheet_text = True
+        try:
+            for slot, entry in self.__entries.items():
+                coord = self.__get_coord(slot)
+                cell = cur_sheet.get_cell(*coord)
+                self.__live_updaters[slot].set(self.__get_display_text(coord, cell))
+                self.__show_style(slot, cell.get_style_id())
+        finally:
+            self.__is_showing_sheet_text = False
+        self.__update_scrollbars()
+        chosen_slot = self.__get_slot(self.__sheet.get_chosen_cell_loc())
+        if chosen_slot is not None:
+            self.__entries[chosen_slot].focus_set()
+        else:
+            self.__window.focus_set()
+
+    def __get_row_extent(self) -> int:
+        """
+        The number of rows the vertical scrollbar scrolls over, one viewport more than
+        the rows of the sheet, so the sheet can grow by scrolling down.
+        """
+        return max(self.__sheet.get_length() - 1, self.__first_row - 1 + VIEWPORT_ROWS) + VIEWPORT_ROWS
+
+    def __get_column_extent(self) -> int:
+        return max(self.__sheet.get_width() - 1, self.__first_col - 1 + VIEWPORT_COLUMNS) + VIEWPORT_COLUMNS
+
+    def __update_scrollbars(self) -> None:
+        if self.__vertical_scrollbar is None or self.__horizontal_scrollbar is None:
+            return
+        row_extent = self.__get_row_extent()
+        self.__vertical_scrollbar.set((self.__first_row - 1) / row_extent,
+                                      (self.__first_row - 1 + VIEWPORT_ROWS) / row_extent)
+        column_extent = self.__get_column_extent()
+        self.__horizontal_scrollbar.set((self.__first_col - 1) / column_extent,
+                                        (self.__first_col - 1 + VIEWPORT_COLUMNS) / column_extent)
+
+    def __get_scrolled_position(self, args: Tuple[str, ...], position: int, page: int, extent: int) -> int:
+        """
+        Returns the first row or column of the viewport after a scrollbar command,
+        that is either ("moveto", fraction) or ("scroll", amount, "units" or "pages").
+        """
+        if args[0] == "moveto":
+            position = int(float(args[1]) * extent) + 1
+        elif args[0] == "scroll":
+            amount = int(args[1])
+            position += amount * page if args[2] == "pages" else amount
+        return max(1, min(position, extent - page + 1))
+
+    def __on_vertical_scroll(self, *args: str) -> None:
+        self.__first_row = self.__get_scrolled_position(args, self.__first_row, VIEWPORT_ROWS,
+                                                        self.__get_row_extent())
+        self.__show_viewport()
+
+    def __on_horizontal_scroll(self, *args: str) -> None:
+        self.__first_col = self.__get_scrolled_position(args, self.__first_col, VIEWPORT_COLUMNS,
+                                                        self.__get_column_extent())
+        self.__show_viewport()
+
+    def __scroll_rows(self, amount: int) -> None:
+        self.__on_vertical_scroll("scroll", str(amount), "units")
+
+    def __scroll_to(self, coord: Tuple[int, int]) -> None:
+        """
+        Scrolls the viewport the least needed to show the cell.
+        """
+        if coord[0] < self.__first_row:
+            self.__first_row = coord[0]
+        elif coord[0] >= self.__first_row + VIEWPORT_ROWS:
+            self.__first_row = coord[0] - VIEWPORT_ROWS + 1
+        if coord[1] < self.__first_col:
+            self.__first_col = coord[1]
+        elif coord[1] >= self.__first_col + VIEWPORT_COLUMNS:
+            self.__first_col = coord[1] - VIEWPORT_COLUMNS + 1
+        self.__show_viewport()
+
+    def __on_cell_tab_pressed(self, event, slot: Tuple[int, int]) -> str:  # type: ignore
+        """
+        Chooses the next cell (or the previous one with shift),
+        the viewport is scrolled if the cell is not visible.
+        """
+        self.__commit_typing()
+        i, j = self.__get_coord(slot)
+        num_rows = self.__sheet.get_length()
+        num_columns = self.__sheet.get_width()
         if event.state & 0x1:
-            if j - 1 >= 0:
+            if j - 1 >= 1:
                 next_coord = (i, j - 1)
-            elif i - 1 >= 0:
+            elif i - 1 >= 1:
                 next_coord = (i - 1, num_columns - 1)
             else:
                 next_coord = (num_rows - 1, num_columns - 1)
@@ -144,46 +393,159 @@ class SheetScreen:
             if j + 1 < num_columns:
                 next_coord = (i, j + 1)
             elif i + 1 < num_rows:
-                next_coord = (i + 1, 0)
+                next_coord = (i + 1, 1)
             else:
-                next_coord = (0, 0)
+                next_coord = (1, 1)
         self.__sheet.choose_cell(*next_coord)
         chosen_cell_text = self.__sheet.get_chosen_cell_from_sheet().get_text()
         self.__formula_box.set_text(chosen_cell_text)
+        self.__scroll_to(next_coord)
+        return "break"
 
     def __on_cell_enter_pressed(self) -> None:
         """
         A callback function that is called when the enter key is pressed.
         will make the sheet update a formula if there's one in the chosen cell.
+        it is evaluated in the typing transaction, so the dependent cells
+        are recalculated once, when it is committed.
         """
         self.__sheet.enter_pressed()
+        self.__commit_typing()
 
-    def __on_cell_clicked(self, event, coord: Tuple[int, int]) -> None:  # type: ignore
+    def __on_cell_clicked(self, event, slot: Tuple[int, int]) -> None:  # type: ignore
         """
         A callback function that is called when a cell is clicked.
         """
-        self.__sheet.choose_cell(coord[0], coord[1])
+        self.__commit_typing()
+        self.__sheet.choose_cell(*self.__get_coord(slot))
         chosen_cell_text = self.__sheet.get_chosen_cell_from_sheet().get_text()
         self.__formula_box.set_text(chosen_cell_text)
 
+    def __undo(self) -> str:
+        """
+        Undoes the last change of the sheet (Ctrl+Z), the text that is being typed is committed
+        first, so it is the change that is undone.
+        """
+        self.__commit_typing()
+        if self.__sheet.undo():
+            self.__show_restored_cells()
+        return "break"
+
+    def __redo(self) -> str:
+        """
+        Makes the last change that was undone again (Ctrl+Y).
+        """
+        self.__commit_typing()
+        if self.__sheet.redo():
+            self.__show_restored_cells()
+        return "break"
+
+    def __show_restored_cells(self) -> None:
+        self.__show_viewport()
+        self.__update_formula_box_with_text(self.__sheet.get_chosen_cell_from_sheet().get_text())
+
     def __on_formula_box_text_change(self, text: str) -> None:
+        if self.__is_showing_sheet_text:
+            return
+        self.__write_typed_text(text)
+
+    def __write_typed_text(self, text: str) -> None:
+        """
+        Writes text the user typed to the chosen cell in the typing transaction,
+        and schedules its commit again, so it is committed after the user stops typing.
+        """
+        if self.__typing_commit_id is None:
+            self.__sheet.begin_transaction()
+        else:
+            self.__root.after_cancel(self.__typing_commit_id)
+        self.__typing_commit_id = self.__root.after(TYPING_RECALCULATION_DELAY_MS, self.__commit_typing)
         self.__sheet.write_to_chosen_cell(text)
 
-    def __on_text_change(self, row: int, col: int, *args) -> None:  # type: ignore
+    def __commit_typing(self) -> None:
+        """
+        Commits the typing transaction if there is one,
+        the dependent cells of all the typed cells are recalculated now.
+        """
+        if self.__typing_commit_id is None:
+            return
+        self.__root.after_cancel(self.__typing_commit_id)
+        self.__typing_commit_id = None
+        self.__sheet.commit_transaction()
+
+    def __on_text_change(self, slot: Tuple[int, int], *args) -> None:  # type: ignore
         """
         A callback function that is called when the text in a cell is changed.
         It updates the cell in the sheet with the new text.
         by using the live updaters it makes it possible to update the cell
         even when the user types in it.
         """
-        live_updater = self.__live_updaters[(row, col)]
-        self.__sheet.write_to_chosen_cell(live_updater.get())
+        if self.__is_showing_sheet_text:
+            return
+        coord = self.__get_coord(slot)
+        if coord != self.__sheet.get_chosen_cell_loc():
+            # the entry kept the focus while the viewport was scrolled
+            self.__sheet.choose_cell(*coord)
+        live_updater = self.__live_updaters[slot]
+        self.__write_typed_text(live_updater.get())
 
-    def __change_cell_text(self, coord: Tuple[int, int], text: str) -> None:
-        x = coord[0]
-        y = coord[1]
-        self.__live_updaters[(x, y)].set(text)
+    def __get_display_text(self, coord: Tuple[int, int], cell: Cell) -> str:
+        """
+        Formats a cell for showing it, the sheet keeps typed values and they become text only here:
+        a calculated cell shows its value, any other cell shows its text as it was typed.
+        a cell that is being recalculated in the background shows CALCULATING_TEXT.
+        """
+        if self.__sheet.is_dirty(*coord):
+            return CALCULATING_TEXT
+        if cell.is_calculated():
+            return format_value(cell.get_value())
+        return cell.get_text()
 
-    def __update_formula_box_with_text(self, text: str) -> None:
-        self.__formula_box.set_text(text)
+    def __on_background_recalculation_started(self) -> None:
+        """
+        Shows the visible cells that are recalculated in the background as being calculated,
+        and starts applying the results of the recalculation as they come.
+        """
+        self.__is_showing_sheet_text = True
+        try:
+            for slot, live_updater in self.__live_updaters.items():
+                if self.__sheet.is_dirty(*self.__get_coord(slot)):
+                    live_updater.set(CALCULATING_TEXT)
+        finally:
+            self.__is_showing_sheet_text = False
+        if self.__background_poll_id is None:
+            self.__background_poll_id = self.__root.after(BACKGROUND_POLL_MS, self.__apply_background_results)
 
+    def __apply_background_results(self) -> None:
+        """
+        Applies the results of the background recalculation that are ready,
+        and checks again later while the recalculation is running.
+        """
+        if self.__workbook.apply_background_results():
+            self.__background_poll_id = self.__root.after(BACKGROUND_POLL_MS, self.__apply_background_results)
+        else:
+            self.__background_poll_id = None
+
+    def __change_cell_text(self, coord: Tuple[int, int], value: CellValue) -> None:
+        """
+        Shows a text or a value that the sheet wrote to a cell, the sheet already
+        has it so it is not written back to the chosen cell.
+        """
+        slot = self.__get_slot(coord)
+        if slot is None or slot not in self.__live_updaters:
+            return
+        self.__is_showing_sheet_text = True
+        try:
+            self.__live_updaters[slot].set(format_value(value))
+        finally:
+            self.__is_showing_sheet_text = False
+
+    def __update_formula_box_with_text(self, text: str) -> None:
+        """
+        Shows text that the sheet wrote to the chosen cell in the formula box,
+        it is not written back to the cell.
+        """
+        self.__is_showing_sheet_text = True
+        try:
+            self.__formula_box.set_text(text)
+        finally:
+            self.__is_showing_sheet_text = False
@@ -0,0 +1,357 @@
+import bisect
+import itertools
+import weakref
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+
+from aggregate_index import AGGREGATE_SUM, AGGREGATE_AVG, AGGREGATE_MIN, AGGREGATE_MAX
+from cell import Cell
+from cell_range import CellRange
+from cell_value import CellError, CellValue
+from column_store import NumericColumnStore
+from binary_workbook import BinaryWorkbookReader
+
+DEFAULT_ROW_COUNT = 20
+DEFAULT_COLUMN_COUNT = 15
+# the cells are kept in chunks of this many rows, a snapshot shares the chunks with the storage
+# and a chunk is copied only when one of its cells is first changed after the snapshot
+CELL_CHUNK_ROWS = 256
+
+# returned for every cell that was never written, it must not be changed
+EMPTY_CELL = Cell()
+
+
+class SheetRow:
+    """
+    A lightweight view of one row of a SheetStorage,
+    so the storage can be accessed like a 2D list: storage[row][col].
+    """
+
+    def __init__(self, storage: "SheetStorage", row: int) -> None:
+        self.__storage = storage
+        self.__row = row
+
+    def __getitem__(self, col: int) -> Cell:
+        return self.__storage.get_cell(self.__row, col)
+
+    def __len__(self) -> int:
+        return self.__storage.get_width()
+
+    def __iter__(self) -> Iterator[Cell]:
+        for col in range(self.__storage.get_width()):
+            yield self.__storage.get_cell(self.__row, col)
+
+
+class SheetStorage:
+    """
+    The SheetStorage class keeps the cells of a sheet sparsely,
+    only the cells that were written are stored, keyed by their (row, col).
+    an empty cell is not stored, only the numeric columns keep a slot for it in a column
+    that holds numbers, and the sheet grows when a cell outside of it is written.
+    a snapshot of the storage is taken without copying it: the snapshot shares the chunks
+    of cells and the numeric columns, and they are copied (copy on write) only when they change.
+    The storage has the following attributes:
+    - chunks: the populated cells, in a dictionary for every CELL_CHUNK_ROWS rows
+    - row_count: the number of rows in the sheet
+    - column_count: the number of columns in the sheet
+    - numeric_columns: the numeric values of the cells, mirrored per column
+    - block_reader: the binary workbook the cells are loaded from, if the sheet was opened from one.
+      the cells are loaded lazily, a block of rows at a time, when one of its rows is first accessed
+    - unloaded_blocks: the blocks of rows that were not loaded from the block reader yet
+    - is_shared: True once the storage shares its chunks with a snapshot, or is a snapshot
+    - owned_chunks, owned_cells: the chunks and cells that were copied (or made) since the last snapshot,
+      only they are changed in place, the others may be shared with a snapshot
+    - values_snapshot: a weak reference to the last snapshot with values, while it is alive
+      a cell is also copied before its calculated value changes
+    """
+
+    def __init__(self, row_count: int = DEFAULT_ROW_COUNT, column_count: int = DEFAULT_COLUMN_COUNT) -> None:
+        self.__chunks: Dict[int, Dict[Tuple[int, int], Cell]] = {}
+        self.__row_count = row_count
+        self.__column_count = column_count
+        self.__numeric_columns = NumericColumnStore()
+        self.__block_reader: Optional[BinaryWorkbookReader] = None
+        self.__block_rows = 1
+        self.__unloaded_blocks: Set[int] = set()
+        self.__is_shared = False
+        self.__owned_chunks: Set[int] = set()
+        self.__owned_cells: Set[Tuple[int, int]] = set()
+        self.__values_snapshot: Optional[weakref.ReferenceType] = None
+
+    def attach_block_reader(self, block_reader: BinaryWorkbookReader) -> None:
+        """
+        Makes the storage load its cells lazily from a binary workbook.
+        """
+        self.__block_reader = block_reader
+        self.__block_rows = block_reader.get_block_rows()
+        self.__unloaded_blocks = set(range(block_reader.get_block_count()))
+
+    def close_block_reader(self) -> None:
+        """
+        Closes the binary workbook the storage loads from, called when the storage is replaced.
+        """
+        if self.__block_reader is not None:
+            self.__block_reader.close()
+            self.__block_reader = None
+            self.__unloaded_blocks = set()
+
+    def load_rows(self, first_row: int, last_row: int) -> None:
+        """
+        Makes sure the cells of the rows first_row..last_row (inclusive) are loaded.
+        """
+        if not self.__unloaded_blocks:
+            return
+        for block in range(max(0, first_row) // self.__block_rows, last_row // self.__block_rows + 1):
+            if block in self.__unloaded_blocks:
+                self.__load_block(block)
+
+    def is_loaded(self, row: int) -> bool:
+        """
+        Returns True if the cells of the row were loaded, a storage that is not
+        read from a binary workbook has all of its rows loaded.
+        """
+        return row // self.__block_rows not in self.__unloaded_blocks
+
+    def load_all(self) -> None:
+        for block in sorted(self.__unloaded_blocks):
+            self.__load_block(block)
+
+    def __load_block(self, block: int) -> None:
+        """
+        Loads the cells of a block, a storage and its snapshots load the blocks they share
+        each for itself, so the chunks they share are copied before the cells are added.
+        """
+        self.__unloaded_blocks.discard(block)
+        for cell_loc, cell in self.__block_reader.load_block(block):  # type: ignore
+            self.__get_chunk_for_write(cell_loc[0])[cell_loc] = cell
+            self.__mirror_value(cell_loc[0], cell_loc[1], cell)
+
+    def get_cell(self, row: int, col: int) -> Cell:
+        """
+        Returns the cell for reading, a cell that was never
+        written is the shared EMPTY_CELL.
+        """
+        if self.__unloaded_blocks:
+            self.load_rows(row, row)
+        chunk = self.__chunks.get(row // CELL_CHUNK_ROWS)
+        if chunk is None:
+            return EMPTY_CELL
+        return chunk.get((row, col), EMPTY_CELL)
+
+    def get_cell_for_write(self, row: int, col: int) -> Cell:
+        """
+        Returns the cell for changing it, creating it
+        (and growing the sheet) if it was never written.
+        a cell that is shared with a snapshot is copied first.
+        """
+        if self.__unloaded_blocks:
+            self.load_rows(row, row)
+        chunk = self.__get_chunk_for_write(row)
+        cell = chunk.get((row, col))
+        if cell is None:
+            cell = Cell()
+            self.set_cell(row, col, cell)
+        elif self.__is_shared and (row, col) not in self.__owned_cells:
+            cell = cell.copy()
+            chunk[(row, col)] = cell
+            self.__owned_cells.add((row, col))
+        return cell
+
+    def __get_chunk_for_write(self, row: int) -> Dict[Tuple[int, int], Cell]:
+        """
+        Returns the chunk of the row for changing it, a chunk that is shared with a snapshot is copied first,
+        its cells are still shared until they are changed.
+        """
+        chunk_index = row // CELL_CHUNK_ROWS
+        chunk = self.__chunks.get(chunk_index)
+        if chunk is None:
+            chunk = {}
+            self.__chunks[chunk_index] = chunk
+            self.__owned_chunks.add(chunk_index)
+        elif self.__is_shared and chunk_index not in self.__owned_chunks:
+            chunk = chunk.copy()
+            self.__chunks[chunk_index] = chunk
+            self.__owned_chunks.add(chunk_index)
+        return chunk
+
+    def set_cell(self, row: int, col: int, cell: Cell) -> None:
+        if self.__unloaded_blocks:
+            self.load_rows(row, row)
+        self.__get_chunk_for_write(row)[(row, col)] = cell
+        if self.__is_shared:
+            self.__owned_cells.add((row, col))
+        self.__mirror_value(row, col, cell)
+        if row >= self.__row_count:
+            self.__row_count = row + 1
+        if col >= self.__column_count:
+            self.__column_count = col + 1
+
+    def set_column_cells(self, col: int, rows: List[int], cells: List[Cell],
+                         numbers: Optional[np.ndarray] = None) -> None:
+        """
+        Stores many cells of a column at once, used when a file is imported.
+        numbers are the values of the cells when all of them are numbers,
+        they are mirrored to the numeric columns with one vectorized write.
+        the rows must be in ascending order, the cells of every chunk are stored together.
+        """
+        start = 0
+        while start < len(rows):
+            end = bisect.bisect_left(rows, (rows[start] // CELL_CHUNK_ROWS + 1) * CELL_CHUNK_ROWS, start)
+            self.__get_chunk_for_write(rows[start]).update(zip(zip(rows[start:end], itertools.repeat(col)),
+                                                               cells[start:end]))
+            start = end
+        if self.__is_shared:
+            self.__owned_cells.update(zip(rows, itertools.repeat(col)))
+        if numbers is not None:
+            self.__numeric_columns.set_numbers(col, np.array(rows), numbers)
+        else:
+            for row, cell in zip(rows, cells):
+                self.__mirror_value(row, col, cell)
+        self.__row_count = max(self.__row_count, rows[-1] + 1)
+        self.__column_count = max(self.__column_count, col + 1)
+
+    def snapshot(self, with_values: bool = True) -> "SheetStorage":
+        """
+        Returns a snapshot of the cells and the numeric values of the storage, without copying them:
+        the snapshot shares the chunks and the numeric columns, only the dictionary of the chunks is copied.
+        after it, the storage copies a chunk, a cell or a column the first time it changes it,
+        so the snapshot keeps the state of now. a background thread can read the snapshot while the storage changes.
+        a snapshot without values keeps only the text and the style of the cells, the calculated values in it
+        may be newer and the columns are not copied when they change, it is enough for undo.
+        the blocks of a binary workbook that were not loaded yet are not loaded now, the snapshot
+        shares the file and loads them from it when it reads them, the file does not change while it is open.
+        """
+        snapshot = SheetStorage(self.__row_count, self.__column_count)
+        snapshot.__chunks = self.__chunks.copy()
+        if self.__unloaded_blocks:
+            snapshot.__block_reader = self.__block_reader.share()  # type: ignore
+            snapshot.__block_rows = self.__block_rows
+            snapshot.__unloaded_blocks = set(self.__unloaded_blocks)
+            # the snapshot is not closed, it lets go of the file when it is dropped
+            weakref.finalize(snapshot, snapshot.__block_reader.close)
+        if with_values:
+            snapshot.__numeric_columns = self.__numeric_columns.snapshot()
+            self.__values_snapshot = weakref.ref(snapshot)
+        snapshot.__is_shared = True
+        self.__is_shared = True
+        self.__owned_chunks = set()
+        self.__owned_cells = set()
+        return snapshot
+
+    def set_calculated_value(self, row: int, col: int, value: CellValue) -> None:
+        """
+        Sets the result of the formula of a cell and mirrors it to the numeric columns.
+        the cell is changed in place unless a snapshot with values shares it.
+        """
+        cell = self.get_cell(row, col)
+        if cell is EMPTY_CELL or (self.__values_snapshot is not None and self.__values_snapshot() is not None):
+            cell = self.get_cell_for_write(row, col)
+        cell.set_calculated_value(value)
+        self.__mirror_value(row, col, cell)
+
+    def set_snapshot_value(self, row: int, col: int, value: CellValue) -> None:
+        """
+        Sets the numeric value of a cell in a snapshot without changing the cell,
+        used by the background thread for the results of the formulas it evaluates.
+        """
+        self.__numeric_columns.set_number(row, col, value if isinstance(value, float) else None,
+                                          isinstance(value, CellError))
+
+    def refresh_value(self, row: int, col: int) -> None:
+        """
+        Mirrors the value of the cell to the numeric columns,
+        called every time the value of a cell changes.
+        """
+        self.__mirror_value(row, col, self.get_cell(row, col))
+
+    def __mirror_value(self, row: int, col: int, cell: Cell) -> None:
+        self.__numeric_columns.set_number(row, col, cell.get_number(), isinstance(cell.get_value(), CellError))
+
+    def get_number(self, row: int, col: int) -> Optional[float]:
+        """
+        Returns the numeric value of the cell, or None if it does not hold a number.
+        """
+        if self.__unloaded_blocks:
+            self.load_rows(row, row)
+        return self.__numeric_columns.get_value(row, col)
+
+    def aggregate_column(self, function: str, col: int, first_row: int, last_row: int) -> Optional[float]:
+        """
+        Aggregates the rows first_row..last_row (inclusive) of a column, see NumericColumnStore.aggregate.
+        """
+        self.load_rows(first_row, last_row)
+        return self.__numeric_columns.aggregate(function, col, first_row, last_row)
+
+    def aggregate_range(self, function: str, cell_range: CellRange) -> Optional[float]:
+        """
+        Aggregates a range of cells column by column, whole columns and rows end at the end of the sheet.
+        the cells of a bounded range must all be numbers, whole columns and rows skip the cells
+        that are empty or hold text, but not errors. returns None if there is nothing to aggregate.
+        """
+        first_row, first_col, last_row, last_col = cell_range.clip(self.__row_count - 1, self.__column_count - 1)
+        skip_non_numbers = not cell_range.is_bounded()
+        column_function = AGGREGATE_SUM if function == AGGREGATE_AVG else function
+        self.load_rows(first_row, last_row)
+        results = []
+        count = 0
+        for col in range(first_col, last_col + 1):
+            if skip_non_numbers and self.__numeric_columns.has_errors(col, first_row, last_row):
+                return None
+            result = self.__numeric_columns.aggregate(column_function, col, first_row, last_row, skip_non_numbers)
+            if result is None:
+                if skip_non_numbers:
+                    continue
+                return None
+            results.append(result)
+            if function == AGGREGATE_AVG:
+                count += (self.__numeric_columns.count_numbers(col, first_row, last_row) if skip_non_numbers
+                          else last_row - first_row + 1)
+        if not results:
+            return None
+        if function == AGGREGATE_SUM:
+            return sum(results)
+        if function == AGGREGATE_AVG:
+            return sum(results) / count
+        if function == AGGREGATE_MIN:
+            return min(results)
+        if function == AGGREGATE_MAX:
+            return max(results)
+        return None
+
+    def release_if_empty(self, row: int, col: int) -> None:
+        """
+        Stops storing the cell if it went back to being empty.
+        """
+        chunk = self.__chunks.get(row // CELL_CHUNK_ROWS)
+        cell = chunk.get((row, col)) if chunk is not None else None
+        if cell is not None and cell.is_empty():
+            chunk = self.__get_chunk_for_write(row)
+            del chunk[(row, col)]
+            self.__owned_cells.discard((row, col))
+            if not chunk:
+                del self.__chunks[row // CELL_CHUNK_ROWS]
+
+    def get_populated_cells(self) -> Iterator[Tuple[Tuple[int, int], Cell]]:
+        self.load_all()
+        return itertools.chain.from_iterable(chunk.items() for chunk in self.__chunks.values())
+
+    def get_populated_count(self) -> int:
+        self.load_all()
+        return sum(len(chunk) for chunk in self.__chunks.values())
+
+    def get_length(self) -> int:
+        return self.__row_count
+
+    def get_width(self) -> int:
+        return self.__column_count
+
+    def __getitem__(self, row: int) -> SheetRow:
+        return SheetRow(self, row)
+
+    def __len__(self) -> int:
+        return self.__row_count
+
+    def __iter__(self) -> Iterator[SheetRow]:
+        for row in range(self.__row_count):
+            yield SheetRow(self, row)
@@ -0,0 +1,46 @@
+import tkinter as tk
+from typing import Callable, Dict, List, Any
+
+ADD_SHEET_TEXT = "+"
+ACTIVE_TAB_COLOR = "white"
+TAB_COLOR = "LightCyan2"
+
+
+class SheetTabs:
+    """
+    A class that represents the tabs of the sheets of the workbook, under the cells.
+    a tab is a button that shows its sheet, and the last button adds a sheet.
+    The tabs have the following attributes:
+    - frame: the frame of the buttons
+    - buttons: the button of every sheet, by its name
+    - add_button: the button that adds a sheet
+    """
+    def __init__(self, parent: tk.Widget, on_tab_chosen: Callable[[str], None], on_add_pressed: Callable[[], None]):
+        self.__frame = tk.Frame(parent, background="alice blue")
+        self.__on_tab_chosen = on_tab_chosen
+        self.__buttons: Dict[str, tk.Button] = {}
+        self.__add_button = tk.Button(self.__frame, text=ADD_SHEET_TEXT, command=on_add_pressed, relief=tk.FLAT)
+
+    def show_tabs(self, sheet_names: List[str], active_sheet_name: str) -> None:
+        """
+        Shows a tab for every sheet, in their order, with the tab of the active sheet pressed.
+        """
+        for sheet_name in list(self.__buttons):
+            if sheet_name not in sheet_names:
+                self.__buttons.pop(sheet_name).destroy()
+        for sheet_name in sheet_names:
+            if sheet_name not in self.__buttons:
+                self.__buttons[sheet_name] = tk.Button(self.__frame, text=sheet_name,
+                                                       command=self.__make_tab_command(sheet_name))
+        for k, sheet_name in enumerate(sheet_names):
+            is_active = sheet_name == active_sheet_name
+            self.__buttons[sheet_name].configure(relief=tk.SUNKEN if is_active else tk.RAISED,
+                                                 background=ACTIVE_TAB_COLOR if is_active else TAB_COLOR)
+            self.__buttons[sheet_name].grid(row=0, column=k)
+        self.__add_button.grid(row=0, column=len(sheet_names))
+
+    def __make_tab_command(self, sheet_name: str) -> Callable[[], None]:
+        return lambda: self.__on_tab_chosen(sheet_name)
+
+    def grid(self, **kwargs: Any) -> None:
+        self.__frame.grid(**kwargs)
@@ -0,0 +1,55 @@
+from typing import Dict, List, Tuple
+
+DEFAULT_COLOR = "white"
+DEFAULT_FONT = "Helvetica"
+DEFAULT_STYLE_ID = 0
+
+
+class StyleTable:
+    """
+    The StyleTable class interns the styles of the cells, a style is a pair of a color and a font.
+    every distinct style is kept once and the cells only keep its id,
+    so heavily formatted sheets do not keep the same strings again and again.
+    ids are never removed or reused, so an id stays valid for as long as the program runs.
+    The table has the following attributes:
+    - styles: the (color, font) of every style, the index is the style id
+    - style_ids: the id of every style
+    """
+
+    def __init__(self) -> None:
+        self.__styles: List[Tuple[str, str]] = [(DEFAULT_COLOR, DEFAULT_FONT)]
+        self.__style_ids: Dict[Tuple[str, str], int] = {(DEFAULT_COLOR, DEFAULT_FONT): DEFAULT_STYLE_ID}
+
+    def get_style_id(self, color: str, font: str) -> int:
+        """
+        Returns the id of the style, it is added to the table if it is new.
+        """
+        style = (color, font)
+        style_id = self.__style_ids.get(style)
+        if style_id is None:
+            style_id = len(self.__styles)
+            self.__styles.append(style)
+            self.__style_ids[style] = style_id
+        return style_id
+
+    def get_color(self, style_id: int) -> str:
+        return self.__styles[style_id][0]
+
+    def get_font(self, style_id: int) -> str:
+        return self.__styles[style_id][1]
+
+    def with_color(self, style_id: int, color: str) -> int:
+        """
+        Returns the id of the style that is the same as the given one, but with another color.
+        """
+        return self.get_style_id(color, self.get_font(style_id))
+
+    def with_font(self, style_id: int, font: str) -> int:
+        return self.get_style_id(self.get_color(style_id), font)
+
+    def get_styles(self) -> List[Tuple[str, str]]:
+        return self.__styles
+
+
+# the styles of all the cells of the program
+STYLE_TABLE = StyleTable()
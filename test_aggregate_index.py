@@ -0,0 +1,102 @@
+import random
+from typing import Any, Callable, Dict
+
+import numpy as np
+import pytest
+
+from aggregate_index import ColumnAggregateIndex, PATH_UPDATE_MAX_ROWS
+from column_store import NumericColumnStore, INDEX_MIN_RANGE_LENGTH
+
+FUNCTIONS: Dict[str, Callable[[np.ndarray], Any]] = {"SUM": np.sum, "AVG": np.mean, "MIN": np.min, "MAX": np.max}
+ROW_COUNT = INDEX_MIN_RANGE_LENGTH + 1000
+
+
+def _expected(values: np.ndarray, valid: np.ndarray, function: str, first_row: int, last_row: int):  # type: ignore
+    if not valid[first_row:last_row + 1].all():
+        return None
+    return float(FUNCTIONS[function](values[first_row:last_row + 1]))
+
+
+def _check_ranges(index: ColumnAggregateIndex, values: np.ndarray, valid: np.ndarray) -> None:
+    ranges = [(0, len(values) - 1), (0, 0), (len(values) - 1, len(values) - 1), (3, 4)]
+    for _ in range(50):
+        first_row, last_row = sorted((random.randrange(len(values)), random.randrange(len(values))))
+        ranges.append((first_row, last_row))
+    for first_row, last_row in ranges:
+        for function in FUNCTIONS:
+            expected = _expected(values, valid, function, first_row, last_row)
+            assert index.query(function, first_row, last_row) == pytest.approx(expected), (function, first_row, last_row)
+
+
+def test_queries_match_slices() -> None:
+    random.seed(1)
+    values = np.random.default_rng(1).normal(size=1000)
+    valid = np.ones(1000, dtype=np.bool_)
+    _check_ranges(ColumnAggregateIndex(values, valid), values, valid)
+
+
+def test_invalid_cells_inside_the_range() -> None:
+    values = np.arange(100, dtype=np.float64)
+    valid = np.ones(100, dtype=np.bool_)
+    valid[50] = False
+    index = ColumnAggregateIndex(values, valid)
+    assert index.query("SUM", 0, 49) == sum(range(50))
+    assert index.query("SUM", 0, 50) is None
+    assert index.query("MIN", 50, 99) is None
+    assert index.query("MAX", 51, 99) == 99
+    assert index.query("SUM", 10, 5) is None
+    assert index.query("SUM", 0, index.get_size()) is None
+
+
+@pytest.mark.parametrize("change_count", [1, PATH_UPDATE_MAX_ROWS, PATH_UPDATE_MAX_ROWS + 1, 500])
+def test_updates_match_slices(change_count: int) -> None:
+    random.seed(change_count)
+    values = np.random.default_rng(change_count).normal(size=1000)
+    valid = np.ones(1000, dtype=np.bool_)
+    index = ColumnAggregateIndex(values.copy(), valid.copy())
+    for _ in range(5):
+        for _ in range(change_count):
+            row = random.randrange(len(values))
+            if random.random() < 0.1:
+                valid[row] = False
+                index.update(row, None)
+            else:
+                values[row] = random.uniform(-10, 10)
+                valid[row] = True
+                index.update(row, values[row])
+        _check_ranges(index, values, valid)
+
+
+def test_long_ranges_of_a_column_store() -> None:
+    values = np.random.default_rng(2).uniform(-100, 100, size=ROW_COUNT)
+    store = NumericColumnStore()
+    store.set_numbers(1, np.arange(ROW_COUNT), values)
+    last_row = ROW_COUNT - 1
+    for function in FUNCTIONS:
+        assert store.aggregate(function, 1, 0, last_row) == pytest.approx(FUNCTIONS[function](values))
+    # the index was built by the long range, the changes update it
+    values[7] = 1000.0
+    store.set_number(7, 1, 1000.0)
+    assert store.aggregate("MAX", 1, 0, last_row) == 1000.0
+    assert store.aggregate("SUM", 1, 0, last_row) == pytest.approx(values.sum())
+    store.set_number(100, 1, None)
+    assert store.aggregate("SUM", 1, 0, last_row) is None
+    assert store.aggregate("SUM", 1, 101, last_row) == pytest.approx(values[101:].sum())
+    store.set_number(100, 1, None, is_error=True)
+    assert store.aggregate("MIN", 1, 0, last_row) is None
+    store.set_number(100, 1, values[100])
+    assert store.aggregate("MIN", 1, 0, last_row) == pytest.approx(values.min())
+
+
+def test_column_store_after_growth() -> None:
+    store = NumericColumnStore()
+    store.set_numbers(1, np.arange(ROW_COUNT), np.ones(ROW_COUNT))
+    assert store.aggregate("SUM", 1, 0, ROW_COUNT - 1) == ROW_COUNT
+    # the column grows past the capacity of its arrays, the index is built again for the new size
+    new_row_count = 4 * ROW_COUNT
+    for row in range(ROW_COUNT, new_row_count):
+        store.set_number(row, 1, 2.0)
+    assert store.aggregate("SUM", 1, 0, new_row_count - 1) == ROW_COUNT + 2 * (new_row_count - ROW_COUNT)
+    store.set_number(new_row_count - 1, 1, 10.0)
+    assert store.aggregate("MAX", 1, ROW_COUNT, new_row_count - 1) == 10.0
+    assert store.aggregate("AVG", 1, ROW_COUNT, new_row_count - 2) == 2.0
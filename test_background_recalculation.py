@@ -0,0 +1,31 @@
+from binary_workbook import BLOCK_ROWS
+from cell import new_cells
+from sheet import Sheet
+
+BLOCK_COUNT = 4
+
+
+def _write(sheet: Sheet, row: int, col: int, text: str) -> None:
+    sheet.choose_cell(row, col)
+    sheet.write_to_chosen_cell(text)
+    sheet.enter_pressed()
+
+
+def test_job_of_a_binary_file_does_not_load_it(tmp_path) -> None:  # type: ignore
+    file_name = str(tmp_path / "sheet.mxlb")
+    last_row = BLOCK_COUNT * BLOCK_ROWS - 1
+    sheet = Sheet(name="sheet1")
+    rows = list(range(1, BLOCK_COUNT * BLOCK_ROWS))
+    sheet.get_sheet().set_column_cells(1, rows, new_cells([str(row) for row in rows], [float(row) for row in rows]))
+    _write(sheet, 1, 2, "MATH(A1+A" + str(last_row) + ")")
+    sheet.save_to_file(file_name)
+    sheet.close()
+    sheet = Sheet(name="sheet1", background_recalculation=True)
+    sheet.load_from_file(file_name)
+    storage = sheet.get_sheet()
+    _write(sheet, 1, 1, "5")
+    sheet.wait_for_background_recalculation()
+    # the background thread read the last row from the file, the sheet did not load it
+    assert [storage.is_loaded(block * BLOCK_ROWS) for block in range(BLOCK_COUNT)] == [True, False, False, False]
+    assert sheet.get_value(1, 2) == 5 + last_row
+    sheet.close()
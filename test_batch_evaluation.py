@@ -0,0 +1,64 @@
+import os
+from typing import List
+
+import pytest
+
+from batch_evaluation import run_eval_command
+from sheet import Sheet
+
+
+def _save_sheet(file_name: str, first_value: str) -> None:
+    """
+    Saves a sheet with a number in A1 and a formula that doubles it in B1,
+    a text file gets .txt after the name.
+    """
+    sheet = Sheet(name=os.path.basename(file_name))
+    sheet.choose_cell(1, 1)
+    sheet.write_to_chosen_cell(first_value)
+    sheet.enter_pressed()
+    sheet.choose_cell(1, 2)
+    sheet.write_to_chosen_cell("MATH(A1*2)")
+    sheet.enter_pressed()
+    sheet.save_to_file(file_name)
+
+
+def _read_first_cells(file_name: str) -> List[float]:
+    with open(file_name) as file:
+        return [float(value) for value in file.readline().split(",")[:2]]
+
+
+def test_files_of_the_same_stem(tmp_path) -> None:  # type: ignore
+    _save_sheet(str(tmp_path / "in"), "1")
+    _save_sheet(str(tmp_path / "in.mxlb"), "2")
+    out = tmp_path / "out"
+    assert run_eval_command([str(tmp_path / "in.txt"), str(tmp_path / "in.mxlb"),
+                             "--out", str(out), "--workers", "1"]) == 0
+    assert _read_first_cells(str(out / "in.txt.csv")) == [1, 2]
+    assert _read_first_cells(str(out / "in.mxlb.csv")) == [2, 4]
+
+
+def test_files_of_the_same_name(tmp_path) -> None:  # type: ignore
+    os.makedirs(tmp_path / "a")
+    os.makedirs(tmp_path / "b")
+    _save_sheet(str(tmp_path / "a" / "in"), "1")
+    _save_sheet(str(tmp_path / "b" / "in"), "2")
+    out = tmp_path / "out"
+    with pytest.raises(SystemExit):
+        run_eval_command([str(tmp_path / "a" / "in.txt"), str(tmp_path / "b" / "in.txt"),
+                          "--out", str(out), "--workers", "1"])
+    assert not os.path.exists(out)
+
+
+def test_output_is_the_csv_export(tmp_path) -> None:  # type: ignore
+    file_name = str(tmp_path / "in.mxlb")
+    _save_sheet(file_name, "1")
+    sheet = Sheet(name="in")
+    sheet.load_from_file(file_name)
+    sheet.save_to_file(str(tmp_path / "export.csv"))
+    out = str(tmp_path / "out.csv")
+    assert run_eval_command([file_name, "--out", out, "--workers", "1"]) == 0
+    with open(out) as output_file, open(str(tmp_path / "export.csv")) as export_file:
+        output = output_file.read()
+        assert output == export_file.read()
+    # only the populated row is written, not the empty rows and columns of the new sheet
+    assert [[float(value) for value in line.split(",")] for line in output.splitlines()] == [[1, 2]]
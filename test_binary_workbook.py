@@ -0,0 +1,95 @@
+from binary_workbook import BLOCK_ROWS, BinaryWorkbookReader, is_binary_workbook
+from cell_range import parse_cell_range
+from cell_value import CellError
+from sheet import Sheet
+
+BLOCK_COUNT = 3
+
+
+def _write(sheet: Sheet, row: int, col: int, text: str) -> None:
+    sheet.choose_cell(row, col)
+    sheet.write_to_chosen_cell(text)
+    sheet.enter_pressed()
+
+
+def _open(file_name: str) -> Sheet:
+    sheet = Sheet(name="sheet1")
+    sheet.load_from_file(file_name)
+    return sheet
+
+
+def _save_sheet(file_name: str) -> None:
+    """
+    Saves a sheet with text, numbers, an error, styled cells, formulas that read cells
+    and ranges, and a number in the first row of every block.
+    """
+    sheet = Sheet(name="sheet1")
+    _write(sheet, 1, 1, "2")
+    _write(sheet, 2, 1, "3.5")
+    _write(sheet, 3, 1, "hello")
+    _write(sheet, 1, 2, "MATH(A1*2)")
+    _write(sheet, 2, 2, "SUM(A1:A2)")
+    _write(sheet, 3, 2, "MATH(A3*2)")
+    sheet.choose_cell(1, 3)
+    sheet.update_cell_color("red")
+    sheet.update_cell_font("Courier")
+    sheet.choose_cell(2, 1)
+    sheet.update_cell_color("blue")
+    for block in range(1, BLOCK_COUNT):
+        _write(sheet, block * BLOCK_ROWS, 1, str(block))
+    sheet.save_to_file(file_name)
+    sheet.close()
+
+
+def test_round_trip(tmp_path) -> None:  # type: ignore
+    file_name = str(tmp_path / "sheet.mxlb")
+    _save_sheet(file_name)
+    assert is_binary_workbook(file_name)
+    sheet = _open(file_name)
+    storage = sheet.get_sheet()
+    assert [storage.get_cell(row, 1).get_value() for row in (1, 2, 3)] == [2.0, 3.5, "hello"]
+    assert [storage.get_cell(row, 2).get_text() for row in (1, 2, 3)] == ["MATH(A1*2)", "SUM(A1:A2)", "MATH(A3*2)"]
+    assert storage.get_cell(1, 2).get_value() == 4.0
+    assert storage.get_cell(2, 2).get_value() == 5.5
+    assert isinstance(storage.get_cell(3, 2).get_value(), CellError)
+    assert (storage.get_cell(1, 3).get_color(), storage.get_cell(1, 3).get_font()) == ("red", "Courier")
+    assert storage.get_cell(2, 1).get_color() == "blue"
+    assert storage.get_cell(2, 1).get_value() == 3.5
+    # the dependencies and the ranges came from the file, the formulas that read a cell are recalculated
+    _write(sheet, 1, 1, "10")
+    assert sheet.get_value(1, 2) == 20
+    assert sheet.get_value(2, 2) == 13.5
+    _write(sheet, 3, 1, "4")
+    assert sheet.get_value(3, 2) == 8
+    sheet.close()
+
+
+def test_dependency_sections(tmp_path) -> None:  # type: ignore
+    file_name = str(tmp_path / "sheet.mxlb")
+    _save_sheet(file_name)
+    reader = BinaryWorkbookReader(file_name)
+    assert reader.get_dependents((1, 1)) == [(1, 2)]
+    assert reader.get_precedents((3, 2)) == [(3, 1)]
+    assert reader.get_dependents((2, 2)) == []
+    assert reader.get_range_precedents() == [((2, 2), parse_cell_range("A1:A2"))]
+    reader.close()
+
+
+def test_opening_leaves_the_blocks_unloaded(tmp_path) -> None:  # type: ignore
+    file_name = str(tmp_path / "sheet.mxlb")
+    _save_sheet(file_name)
+    storage = _open(file_name).get_sheet()
+    assert not any(storage.is_loaded(block * BLOCK_ROWS) for block in range(BLOCK_COUNT))
+    assert storage.get_length() == (BLOCK_COUNT - 1) * BLOCK_ROWS + 1
+
+
+def test_reading_a_cell_loads_only_its_block(tmp_path) -> None:  # type: ignore
+    file_name = str(tmp_path / "sheet.mxlb")
+    _save_sheet(file_name)
+    sheet = _open(file_name)
+    storage = sheet.get_sheet()
+    assert storage.get_cell(BLOCK_ROWS, 1).get_value() == 1.0
+    assert [storage.is_loaded(block * BLOCK_ROWS) for block in range(BLOCK_COUNT)] == [False, True, False]
+    assert storage.get_number(2 * BLOCK_ROWS, 1) == 2.0
+    assert [storage.is_loaded(block * BLOCK_ROWS) for block in range(BLOCK_COUNT)] == [False, True, True]
+    sheet.close()
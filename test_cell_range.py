@@ -0,0 +1,104 @@
+from cell_range import CellRange, parse_cell_range
+from cell_value import CellError
+from sheet import Sheet
+from sheet_storage import SheetStorage
+
+
+def _write(sheet: Sheet, row: int, col: int, text: str) -> None:
+    sheet.choose_cell(row, col)
+    sheet.write_to_chosen_cell(text)
+    sheet.enter_pressed()
+
+
+def test_rectangle() -> None:
+    cell_range = parse_cell_range("A1:C3")
+    assert cell_range == CellRange(1, 1, 3, 3)
+    assert parse_cell_range("C3:A1") == cell_range
+    assert str(cell_range) == "A1:C3"
+    assert cell_range.is_bounded()
+    assert cell_range.contains((3, 3)) and not cell_range.contains((4, 1)) and not cell_range.contains((1, 4))
+    assert cell_range.get_size(100, 100) == 9
+    assert list(CellRange(1, 1, 2, 2).iter_cells(100, 100)) == [(1, 1), (1, 2), (2, 1), (2, 2)]
+    assert parse_cell_range("A1") is None
+    assert parse_cell_range("A1:") is None
+
+
+def test_single_cell_rectangle() -> None:
+    cell_range = parse_cell_range("B2:B2")
+    assert cell_range == CellRange(2, 2, 2, 2)
+    assert cell_range is not None and cell_range.get_size(100, 100) == 1
+    sheet = Sheet(name="sheet1")
+    _write(sheet, 2, 2, "4")
+    _write(sheet, 1, 1, "SUM(B2:B2)")
+    _write(sheet, 1, 2, "AVG(B2:B2)")
+    assert [sheet.get_value(1, 1), sheet.get_value(1, 2)] == [4, 4]
+    _write(sheet, 2, 2, "5")
+    assert sheet.get_value(1, 1) == 5
+
+
+def test_whole_columns_and_rows() -> None:
+    columns = parse_cell_range("A:A")
+    assert columns == CellRange(1, 1, None, 1)
+    assert columns is not None and not columns.is_bounded() and str(columns) == "A:A"
+    assert columns.contains((1000000, 1)) and not columns.contains((1, 2))
+    assert columns.clip(99, 9) == (1, 1, 99, 1)
+    assert columns.get_size(99, 9) == 99
+    rows = parse_cell_range("1:1")
+    assert rows == CellRange(1, 1, 1, None)
+    assert rows is not None and not rows.is_bounded() and str(rows) == "1:1"
+    assert rows.contains((1, 1000)) and not rows.contains((2, 1))
+    assert rows.clip(99, 9) == (1, 1, 1, 9)
+    assert parse_cell_range("C:A") == CellRange(1, 1, None, 3)
+
+
+def test_aggregate_rectangle() -> None:
+    sheet = Sheet(name="sheet1")
+    for row, col, text in [(1, 1, "1"), (2, 1, "2"), (1, 2, "3"), (2, 2, "4")]:
+        _write(sheet, row, col, text)
+    storage = sheet.get_sheet()
+    cell_range = CellRange(1, 1, 2, 2)
+    assert [storage.aggregate_range(function, cell_range) for function in ("SUM", "AVG", "MIN", "MAX")] == \
+        [10, 2.5, 1, 4]
+    # every cell of a rectangle must be a number
+    _write(sheet, 2, 2, "x")
+    assert storage.aggregate_range("SUM", cell_range) is None
+    _write(sheet, 1, 3, "SUM(A1:B2)")
+    assert isinstance(sheet.get_value(1, 3), CellError)
+
+
+def test_whole_ranges_grow_with_new_writes() -> None:
+    sheet = Sheet(name="sheet1")
+    _write(sheet, 1, 1, "1")
+    _write(sheet, 2, 1, "text")
+    _write(sheet, 1, 3, "SUM(A:A)")
+    _write(sheet, 3, 3, "MAX(1:1)")
+    # the cells of whole ranges that are empty or hold text are skipped
+    assert sheet.get_value(1, 3) == 1
+    assert sheet.get_value(3, 3) == 1
+    far_row = sheet.get_length() + 100
+    far_col = sheet.get_width() + 10
+    _write(sheet, far_row, 1, "5")
+    _write(sheet, 1, far_col, "7")
+    assert sheet.get_value(1, 3) == 6
+    assert sheet.get_value(3, 3) == 7
+    storage = sheet.get_sheet()
+    assert storage.aggregate_range("AVG", CellRange(1, 1, None, 1)) == 3
+    assert storage.aggregate_range("MIN", CellRange(1, 1, 1, None)) == 1
+
+
+def test_errors_inside_a_whole_column() -> None:
+    sheet = Sheet(name="sheet1")
+    _write(sheet, 1, 1, "1")
+    _write(sheet, 2, 1, "MATH(B5/0)")
+    _write(sheet, 1, 3, "SUM(A:A)")
+    assert isinstance(sheet.get_value(2, 1), CellError)
+    # a whole range skips texts but not errors
+    assert isinstance(sheet.get_value(1, 3), CellError)
+    assert sheet.get_sheet().aggregate_range("SUM", CellRange(1, 1, None, 1)) is None
+    _write(sheet, 2, 1, "2")
+    assert sheet.get_value(1, 3) == 3
+
+
+def test_empty_whole_column() -> None:
+    storage = SheetStorage()
+    assert storage.aggregate_range("SUM", CellRange(1, 2, None, 2)) is None
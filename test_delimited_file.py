@@ -0,0 +1,83 @@
+import csv
+from typing import List
+
+from sheet import Sheet
+
+ROWS = [
+    ["name", "amount", "note"],
+    ["apples, red", "1.5", 'said "hi"'],
+    ["pears\tgreen", "2", "two\nlines"],
+    ["plums", "x", ""],
+]
+
+
+def _write_file(file_name: str, rows: List[List[str]], delimiter: str) -> None:
+    with open(file_name, 'w', newline='', encoding='utf-8') as file:
+        csv.writer(file, delimiter=delimiter).writerows(rows)
+
+
+def _read_file(file_name: str, delimiter: str) -> List[List[str]]:
+    with open(file_name, newline='', encoding='utf-8') as file:
+        return list(csv.reader(file, delimiter=delimiter))
+
+
+def _open(file_name: str) -> Sheet:
+    sheet = Sheet(name="sheet1")
+    sheet.load_from_file(file_name)
+    return sheet
+
+
+def test_csv_round_trip(tmp_path) -> None:  # type: ignore
+    file_name = str(tmp_path / "in.csv")
+    _write_file(file_name, ROWS, ",")
+    sheet = _open(file_name)
+    storage = sheet.get_sheet()
+    assert storage.get_cell(2, 1).get_text() == "apples, red"
+    assert storage.get_cell(2, 3).get_text() == 'said "hi"'
+    assert storage.get_cell(3, 3).get_text() == "two\nlines"
+    sheet.save_to_file(str(tmp_path / "out.csv"))
+    assert _read_file(str(tmp_path / "out.csv"), ",") == ROWS
+
+
+def test_tsv_round_trip(tmp_path) -> None:  # type: ignore
+    file_name = str(tmp_path / "in.tsv")
+    _write_file(file_name, ROWS, "\t")
+    sheet = _open(file_name)
+    assert sheet.get_sheet().get_cell(3, 1).get_text() == "pears\tgreen"
+    sheet.save_to_file(str(tmp_path / "out.tsv"))
+    assert _read_file(str(tmp_path / "out.tsv"), "\t") == ROWS
+
+
+def test_column_types(tmp_path) -> None:  # type: ignore
+    file_name = str(tmp_path / "in.csv")
+    _write_file(file_name, ROWS, ",")
+    sheet = _open(file_name)
+    # a column of numbers is converted at once, a column that mixes numbers and text field by field
+    assert [sheet.get_value(row, 2) for row in range(2, 5)] == [1.5, 2.0, "x"]
+    _write_file(file_name, [["1", "2.5"], ["3", "1e3"]], ",")
+    sheet = _open(file_name)
+    assert [sheet.get_value(row, col) for row in (1, 2) for col in (1, 2)] == [1.0, 2.5, 3.0, 1000.0]
+    assert sheet.get_sheet().aggregate_column("SUM", 2, 1, 2) == 1002.5
+    assert all(type(sheet.get_value(row, 1)) is float for row in (1, 2))
+
+
+def test_formulas_are_evaluated_and_exported_as_results(tmp_path) -> None:  # type: ignore
+    file_name = str(tmp_path / "in.csv")
+    _write_file(file_name, [["1", "MATH(A1*2)"], ["3", "SUM(A1:A2)"]], ",")
+    sheet = _open(file_name)
+    assert sheet.get_value(1, 2) == 2
+    assert sheet.get_value(2, 2) == 4
+    sheet.save_to_file(str(tmp_path / "out.csv"))
+    assert [[float(value) for value in row] for row in _read_file(str(tmp_path / "out.csv"), ",")] == [[1, 2], [3, 4]]
+
+
+def test_export_is_trimmed_to_the_populated_region(tmp_path) -> None:  # type: ignore
+    sheet = Sheet(name="sheet1")
+    sheet.choose_cell(2, 3)
+    sheet.write_to_chosen_cell("x")
+    sheet.enter_pressed()
+    sheet.save_to_file(str(tmp_path / "out.csv"))
+    assert _read_file(str(tmp_path / "out.csv"), ",") == [["", "", ""], ["", "", "x"]]
+    sheet = Sheet(name="sheet1")
+    sheet.save_to_file(str(tmp_path / "empty.csv"))
+    assert _read_file(str(tmp_path / "empty.csv"), ",") == []
@@ -0,0 +1,116 @@
+from typing import List
+
+from cell_value import CellError
+from dependency_graph import DependencyGraph
+from recalculation_profiler import RecalculationProfiler
+from sheet import Sheet, CIRCULAR_REFERENCE_ERROR_MSG
+
+A1, B1, C1, D1 = (1, 1), (1, 2), (1, 3), (1, 4)
+
+
+def _write(sheet: Sheet, cell_loc, text: str) -> None:  # type: ignore
+    sheet.choose_cell(*cell_loc)
+    sheet.write_to_chosen_cell(text)
+    sheet.enter_pressed()
+
+
+def test_chain() -> None:
+    graph = DependencyGraph()
+    graph.set_precedents(B1, [A1])
+    graph.set_precedents(C1, [B1])
+    graph.set_precedents(D1, [C1])
+    assert graph.get_dirty_cells([A1]) == {B1, C1, D1}
+    assert graph.get_dirty_cells([C1]) == {D1}
+    assert graph.topological_levels({B1, C1, D1}) == ([[B1], [C1], [D1]], [])
+    sheet = Sheet(name="sheet1")
+    _write(sheet, A1, "1")
+    _write(sheet, B1, "MATH(A1+1)")
+    _write(sheet, C1, "MATH(B1*2)")
+    _write(sheet, D1, "MATH(C1+B1)")
+    assert sheet.get_value(*D1) == 6
+    _write(sheet, A1, "2")
+    assert [sheet.get_value(*cell_loc) for cell_loc in (B1, C1, D1)] == [3, 6, 9]
+
+
+def test_diamond_sink_is_evaluated_once() -> None:
+    graph = DependencyGraph()
+    graph.set_precedents(B1, [A1])
+    graph.set_precedents(C1, [A1])
+    graph.set_precedents(D1, [B1, C1])
+    levels, circular = graph.topological_levels(graph.get_dirty_cells([A1]))
+    assert [sorted(level) for level in levels] == [[B1, C1], [D1]]
+    assert circular == []
+    profiler = RecalculationProfiler()
+    sheet = Sheet(name="sheet1", profiler=profiler)
+    _write(sheet, A1, "1")
+    _write(sheet, B1, "MATH(A1+1)")
+    _write(sheet, C1, "MATH(A1*10)")
+    _write(sheet, D1, "MATH(B1+C1)")
+    evaluations_before = _get_evaluations(profiler)
+    # writing the text and pressing enter each recalculate the dependents, in a transaction they do it once
+    with sheet.transaction():
+        _write(sheet, A1, "2")
+    assert sheet.get_value(*D1) == 23
+    # one changed cell, three recalculated in two levels of at most two cells
+    assert profiler.get_cascades()[-1][1:5] == (1, 3, 2, 2)
+    evaluations = _get_evaluations(profiler)
+    assert {cell_loc: evaluations[cell_loc] - evaluations_before[cell_loc] for cell_loc in (B1, C1, D1)} == \
+        {B1: 1, C1: 1, D1: 1}
+
+
+def _get_evaluations(profiler: RecalculationProfiler):  # type: ignore
+    return {cell_loc: evaluations for (sheet_name, cell_loc), seconds, evaluations in profiler.get_slowest_formulas()}
+
+
+def test_entering_a_formula_again_replaces_its_edges() -> None:
+    graph = DependencyGraph()
+    graph.set_precedents(C1, [A1])
+    assert graph.set_precedents(C1, [B1]) == ({A1}, {B1})
+    assert graph.get_dependents(A1) == set()
+    assert graph.get_dependents(B1) == {C1}
+    assert graph.get_precedents(C1) == {B1}
+    sheet = Sheet(name="sheet1")
+    _write(sheet, A1, "1")
+    _write(sheet, B1, "5")
+    _write(sheet, C1, "MATH(A1*2)")
+    _write(sheet, C1, "MATH(B1*2)")
+    assert sheet.get_dependency_graph().get_dependents(A1) == set()
+    _write(sheet, A1, "100")
+    assert sheet.get_value(*C1) == 10
+    _write(sheet, B1, "7")
+    assert sheet.get_value(*C1) == 14
+    # a cell that is not a formula anymore reads nothing
+    _write(sheet, C1, "text")
+    assert sheet.get_dependency_graph().get_dependents(B1) == set()
+
+
+def test_self_reference() -> None:
+    graph = DependencyGraph()
+    graph.set_precedents(A1, [A1])
+    assert graph.topological_levels(graph.get_dirty_cells([A1])) == ([], [A1])
+    errors: List[str] = []
+    sheet = Sheet(name="sheet1", on_error=errors.append)
+    _write(sheet, A1, "MATH(A1+1)")
+    assert isinstance(sheet.get_value(*A1), CellError)
+    assert errors == [CIRCULAR_REFERENCE_ERROR_MSG + "A1"]
+
+
+def test_mutual_reference() -> None:
+    graph = DependencyGraph()
+    graph.set_precedents(A1, [B1])
+    graph.set_precedents(B1, [A1])
+    graph.set_precedents(C1, [B1])
+    # a cell that reads a circular reference cannot be ordered either
+    assert graph.topological_levels(graph.get_dirty_cells([A1])) == ([], [A1, B1, C1])
+    errors: List[str] = []
+    sheet = Sheet(name="sheet1", on_error=errors.append)
+    _write(sheet, A1, "1")
+    _write(sheet, B1, "MATH(A1+1)")
+    _write(sheet, C1, "MATH(B1*2)")
+    assert errors == []
+    _write(sheet, A1, "MATH(B1+1)")
+    assert [isinstance(sheet.get_value(*cell_loc), CellError) for cell_loc in (A1, B1, C1)] == [True, True, True]
+    assert errors == [CIRCULAR_REFERENCE_ERROR_MSG + "A1, B1, C1"]
+    # breaking the cycle evaluates the cells again
+    _write(sheet, A1, "3")
+    assert [sheet.get_value(*cell_loc) for cell_loc in (A1, B1, C1)] == [3, 4, 8]
@@ -0,0 +1,79 @@
+import os
+
+from edit_journal import JOURNAL_EXTENSION
+from sheet import Sheet
+
+
+def _write(sheet: Sheet, row: int, col: int, text: str) -> None:
+    sheet.choose_cell(row, col)
+    sheet.write_to_chosen_cell(text)
+    sheet.enter_pressed()
+
+
+def _open(file_name: str) -> Sheet:
+    sheet = Sheet(name="sheet1")
+    sheet.load_from_file(file_name)
+    return sheet
+
+
+def _make_saved_sheet(file_name: str) -> Sheet:
+    sheet = Sheet(name="sheet1")
+    _write(sheet, 1, 1, "1")
+    _write(sheet, 1, 2, "MATH(A1*2)")
+    sheet.save_to_file(file_name)
+    return sheet
+
+
+def test_close_without_saving_drops_the_edits(tmp_path) -> None:  # type: ignore
+    file_name = str(tmp_path / "sheet.mxlb")
+    sheet = _make_saved_sheet(file_name)
+    _write(sheet, 1, 1, "5")
+    sheet.close()
+    assert not os.path.exists(file_name + JOURNAL_EXTENSION)
+    assert _open(file_name).get_value(1, 2) == 2
+
+
+def test_close_keeps_the_saved_edits(tmp_path) -> None:  # type: ignore
+    file_name = str(tmp_path / "sheet.mxlb")
+    sheet = _make_saved_sheet(file_name)
+    _write(sheet, 1, 1, "5")
+    sheet.save_to_file(file_name)
+    _write(sheet, 1, 1, "7")
+    _write(sheet, 2, 1, "x")
+    sheet.close()
+    sheet = _open(file_name)
+    assert sheet.get_value(1, 2) == 10
+    assert sheet.get_sheet().get_cell(2, 1).get_text() == ""
+    _write(sheet, 1, 1, "8")
+    sheet.close()
+    assert _open(file_name).get_value(1, 2) == 10
+
+
+def test_crash_recovers_the_edits(tmp_path) -> None:  # type: ignore
+    file_name = str(tmp_path / "sheet.mxlb")
+    sheet = _make_saved_sheet(file_name)
+    _write(sheet, 1, 1, "5")
+    # the program crashed, the sheet was not closed
+    recovered = _open(file_name)
+    assert recovered.get_value(1, 2) == 10
+    # the recovered edits are not saved until the sheet is saved
+    recovered.close()
+    assert _open(file_name).get_value(1, 2) == 2
+    sheet = _open(file_name)
+    _write(sheet, 1, 1, "6")
+    # crashed again, this time the recovered edits are saved
+    recovered = _open(file_name)
+    assert recovered.get_value(1, 2) == 12
+    recovered.save_to_file(file_name)
+    recovered.close()
+    assert _open(file_name).get_value(1, 2) == 12
+
+
+def test_loading_another_file_drops_the_edits(tmp_path) -> None:  # type: ignore
+    file_name = str(tmp_path / "sheet.mxlb")
+    other_file_name = str(tmp_path / "other.mxlb")
+    _make_saved_sheet(other_file_name).close()
+    sheet = _make_saved_sheet(file_name)
+    _write(sheet, 1, 1, "5")
+    sheet.load_from_file(other_file_name)
+    assert _open(file_name).get_value(1, 2) == 2
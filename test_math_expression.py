@@ -0,0 +1,53 @@
+from typing import List
+
+from math_expression import compile_math_expression
+from sheet import Sheet
+
+# more operands than the python recursion limit, a nested evaluation of them would not return
+LONG_EXPRESSION_OPERANDS = 5000
+
+
+def _read_row_number(cell):  # type: ignore
+    return float(cell[0])
+
+
+def test_long_constant_expression() -> None:
+    expression = compile_math_expression("+".join(["1"] * LONG_EXPRESSION_OPERANDS))
+    assert expression is not None
+    assert expression.evaluate(_read_row_number) == LONG_EXPRESSION_OPERANDS
+
+
+def test_long_expression_of_cells() -> None:
+    text = "-".join("A" + str(row) for row in range(1, LONG_EXPRESSION_OPERANDS + 1))
+    expression = compile_math_expression(text)
+    assert expression is not None
+    assert expression.evaluate(_read_row_number) == 1 - sum(range(2, LONG_EXPRESSION_OPERANDS + 1))
+
+
+def test_deeply_nested_expression() -> None:
+    text = "(" * LONG_EXPRESSION_OPERANDS + "A1" + "+1)" * LONG_EXPRESSION_OPERANDS
+    expression = compile_math_expression("--" * LONG_EXPRESSION_OPERANDS + text)
+    assert expression is not None
+    assert expression.evaluate(_read_row_number) == 1 + LONG_EXPRESSION_OPERANDS
+
+
+def test_errors_are_none() -> None:
+    expression = compile_math_expression("A1/(A2-2)")
+    assert expression is not None
+    assert expression.evaluate(_read_row_number) is None
+    expression = compile_math_expression("A1+B2")
+    assert expression is not None
+    assert expression.evaluate(lambda cell: None) is None
+
+
+def test_long_formula_in_sheet() -> None:
+    errors: List[str] = []
+    sheet = Sheet(name="sheet1", on_error=errors.append)
+    sheet.choose_cell(1, 1)
+    sheet.write_to_chosen_cell("3")
+    sheet.enter_pressed()
+    sheet.choose_cell(1, 2)
+    sheet.write_to_chosen_cell("MATH(" + "+".join(["A1"] * LONG_EXPRESSION_OPERANDS) + ")")
+    sheet.enter_pressed()
+    assert sheet.get_value(1, 2) == 3 * LONG_EXPRESSION_OPERANDS
+    assert errors == []
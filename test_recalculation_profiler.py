@@ -0,0 +1,29 @@
+from recalculation_profiler import RecalculationProfiler
+from workbook import Workbook
+
+
+def _write(workbook: Workbook, sheet_name: str, row: int, col: int, text: str) -> None:
+    sheet = workbook.get_sheet(sheet_name)
+    assert sheet is not None
+    sheet.choose_cell(row, col)
+    sheet.write_to_chosen_cell(text)
+    sheet.enter_pressed()
+
+
+def test_same_cell_of_two_sheets_is_timed_apart() -> None:
+    profiler = RecalculationProfiler()
+    workbook = Workbook(profiler=profiler)
+    first_name = workbook.get_active_sheet_name()
+    second_name = workbook.add_sheet()
+    assert second_name is not None
+    for sheet_name in (first_name, second_name):
+        _write(workbook, sheet_name, 1, 1, "2")
+        _write(workbook, sheet_name, 1, 2, "MATH(A1*2)")
+    _write(workbook, second_name, 1, 1, "3")
+    counts = {key: evaluations for key, seconds, evaluations in profiler.get_slowest_formulas()}
+    assert set(counts) == {(first_name, (1, 2)), (second_name, (1, 2))}
+    assert counts[(second_name, (1, 2))] > counts[(first_name, (1, 2))]
+    report = profiler.format_report()
+    assert first_name + "!B1" in report
+    assert second_name + "!B1" in report
+    workbook.close()
@@ -0,0 +1,23 @@
+import multiprocessing
+
+from recalculation_scheduler import RecalculationScheduler
+from sheet import Sheet
+
+FORMULA_COUNT = 16
+
+
+def test_close_stops_the_workers() -> None:
+    sheet = Sheet(name="sheet1", recalculation_scheduler=RecalculationScheduler(2, parallel_threshold=4))
+    for row in range(1, FORMULA_COUNT + 1):
+        sheet.choose_cell(row, 1)
+        sheet.write_to_chosen_cell(str(row))
+        sheet.enter_pressed()
+        sheet.choose_cell(row, 2)
+        sheet.write_to_chosen_cell("MATH(A" + str(row) + "*2)")
+        sheet.enter_pressed()
+    sheet.recalculate_all()
+    assert [sheet.get_value(row, 2) for row in range(1, FORMULA_COUNT + 1)] == \
+        [row * 2 for row in range(1, FORMULA_COUNT + 1)]
+    assert multiprocessing.active_children()
+    sheet.close()
+    assert not multiprocessing.active_children()
@@ -0,0 +1,83 @@
+import pytest
+
+from binary_workbook import BINARY_FILE_EXTENSION
+from sheet import Sheet
+from style_table import StyleTable, DEFAULT_COLOR, DEFAULT_FONT, DEFAULT_STYLE_ID, STYLE_TABLE
+
+
+def _write(sheet: Sheet, row: int, col: int, text: str) -> None:
+    sheet.choose_cell(row, col)
+    sheet.write_to_chosen_cell(text)
+    sheet.enter_pressed()
+
+
+def _style(sheet: Sheet, row: int, col: int, color: str, font: str) -> None:
+    sheet.choose_cell(row, col)
+    sheet.update_cell_color(color)
+    sheet.update_cell_font(font)
+
+
+def _make_sheet() -> Sheet:
+    """
+    A sheet with two cells in the same style, a cell with only another color and a cell with the default style.
+    """
+    sheet = Sheet(name="sheet1")
+    for row, col in [(1, 1), (2, 2), (1, 3), (3, 1)]:
+        _write(sheet, row, col, str(row + col))
+    _style(sheet, 1, 1, "red", "Courier")
+    _style(sheet, 2, 2, "red", "Courier")
+    sheet.choose_cell(1, 3)
+    sheet.update_cell_color("red")
+    return sheet
+
+
+def test_equal_styles_share_an_id() -> None:
+    table = StyleTable()
+    assert table.get_style_id(DEFAULT_COLOR, DEFAULT_FONT) == DEFAULT_STYLE_ID
+    style_id = table.get_style_id("red", "Courier")
+    assert table.get_style_id("red", "Courier") == style_id
+    assert len({style_id, table.get_style_id("red", DEFAULT_FONT), table.get_style_id(DEFAULT_COLOR, "Courier"),
+                DEFAULT_STYLE_ID}) == 4
+    assert (table.get_color(style_id), table.get_font(style_id)) == ("red", "Courier")
+    assert table.with_color(style_id, DEFAULT_COLOR) == table.get_style_id(DEFAULT_COLOR, "Courier")
+    assert table.with_font(table.with_color(style_id, DEFAULT_COLOR), DEFAULT_FONT) == DEFAULT_STYLE_ID
+    assert len(table.get_styles()) == 4
+
+
+def test_cells_in_the_same_style_share_its_id() -> None:
+    storage = _make_sheet().get_sheet()
+    style_id = storage.get_cell(1, 1).get_style_id()
+    assert storage.get_cell(2, 2).get_style_id() == style_id
+    assert storage.get_cell(1, 3).get_style_id() not in (style_id, DEFAULT_STYLE_ID)
+    assert storage.get_cell(3, 1).get_style_id() == DEFAULT_STYLE_ID
+    assert STYLE_TABLE.get_styles()[style_id] == ("red", "Courier")
+
+
+# a text file is saved with the .txt extension added to its name
+@pytest.mark.parametrize("extension, saved_extension", [("", ".txt"), (BINARY_FILE_EXTENSION, BINARY_FILE_EXTENSION)])
+def test_styles_survive_a_round_trip(tmp_path, extension: str, saved_extension: str) -> None:  # type: ignore
+    sheet = _make_sheet()
+    sheet.save_to_file(str(tmp_path / ("sheet" + extension)))
+    sheet.close()
+    sheet = Sheet(name="sheet1")
+    sheet.load_from_file(str(tmp_path / ("sheet" + saved_extension)))
+    storage = sheet.get_sheet()
+    cells = [storage.get_cell(row, col) for row, col in [(1, 1), (2, 2), (1, 3), (3, 1)]]
+    assert [(cell.get_color(), cell.get_font()) for cell in cells] == \
+        [("red", "Courier"), ("red", "Courier"), ("red", DEFAULT_FONT), (DEFAULT_COLOR, DEFAULT_FONT)]
+    assert cells[0].get_style_id() == cells[1].get_style_id() == STYLE_TABLE.get_style_id("red", "Courier")
+    assert cells[3].get_style_id() == DEFAULT_STYLE_ID
+    sheet.close()
+
+
+def test_the_file_keeps_the_style_table_once() -> None:
+    serialized = _make_sheet().serialize()
+    assert serialized.count("red\tCourier") == 1
+    # the ids of the file are mapped to the ids of the table it is loaded into
+    sheet = Sheet(name="sheet1")
+    sheet.deserialize(serialized.replace("red\tCourier", "gold\tMonaco"))
+    storage = sheet.get_sheet()
+    style_id = storage.get_cell(1, 1).get_style_id()
+    assert (STYLE_TABLE.get_color(style_id), STYLE_TABLE.get_font(style_id)) == ("gold", "Monaco")
+    assert storage.get_cell(2, 2).get_style_id() == style_id
+    assert storage.get_cell(1, 3).get_color() == "red"
@@ -0,0 +1,90 @@
+from typing import Dict, Tuple
+
+import pytest
+
+from recalculation_profiler import RecalculationProfiler
+from sheet import Sheet
+
+
+def _write(sheet: Sheet, row: int, col: int, text: str) -> None:
+    sheet.choose_cell(row, col)
+    sheet.write_to_chosen_cell(text)
+    sheet.enter_pressed()
+
+
+def _get_evaluations(profiler: RecalculationProfiler) -> Dict[Tuple[int, int], int]:
+    return {cell_loc: evaluations for (sheet_name, cell_loc), seconds, evaluations in profiler.get_slowest_formulas()}
+
+
+def _make_sheet(profiler: RecalculationProfiler) -> Sheet:
+    """
+    A sheet with numbers in A1:A3, their sum in B1 and the sum of the first two in C1.
+    """
+    sheet = Sheet(name="sheet1", profiler=profiler)
+    for row in range(1, 4):
+        _write(sheet, row, 1, str(row))
+    _write(sheet, 1, 2, "SUM(A1:A3)")
+    _write(sheet, 1, 3, "MATH(A1+A2)")
+    return sheet
+
+
+def test_transaction_recalculates_dependents_once() -> None:
+    profiler = RecalculationProfiler()
+    sheet = _make_sheet(profiler)
+    evaluations_before = _get_evaluations(profiler)
+    cascade_count = len(profiler.get_cascades())
+    with sheet.transaction():
+        for row in range(1, 4):
+            _write(sheet, row, 1, str(10 * row))
+        # the dependents are recalculated at the commit
+        assert sheet.get_sheet().get_cell(1, 2).get_value() == 6
+        assert len(profiler.get_cascades()) == cascade_count
+    assert sheet.get_value(1, 2) == 60
+    assert sheet.get_value(1, 3) == 30
+    cascades = profiler.get_cascades()[cascade_count:]
+    assert [(changed, recalculated) for kind, changed, recalculated, *rest in cascades] == [(3, 2)]
+    evaluations = _get_evaluations(profiler)
+    assert [evaluations[cell_loc] - evaluations_before[cell_loc] for cell_loc in ((1, 2), (1, 3))] == [1, 1]
+
+
+def test_only_the_outermost_commit_recalculates() -> None:
+    profiler = RecalculationProfiler()
+    sheet = _make_sheet(profiler)
+    sheet.begin_transaction()
+    with sheet.transaction():
+        _write(sheet, 1, 1, "5")
+    assert sheet.get_sheet().get_cell(1, 2).get_value() == 6
+    _write(sheet, 2, 1, "5")
+    sheet.commit_transaction()
+    assert sheet.get_value(1, 2) == 13
+    assert sheet.get_value(1, 3) == 10
+    # a commit without a transaction does nothing
+    sheet.commit_transaction()
+    assert sheet.get_value(1, 2) == 13
+
+
+def test_transaction_is_committed_when_it_fails() -> None:
+    profiler = RecalculationProfiler()
+    sheet = _make_sheet(profiler)
+    with pytest.raises(ValueError):
+        with sheet.transaction():
+            _write(sheet, 1, 1, "7")
+            raise ValueError()
+    assert sheet.get_value(1, 2) == 12
+    _write(sheet, 2, 1, "1")
+    assert sheet.get_value(1, 3) == 8
+
+
+def test_transaction_is_one_undo_step() -> None:
+    profiler = RecalculationProfiler()
+    sheet = _make_sheet(profiler)
+    with sheet.transaction():
+        for row in range(1, 4):
+            _write(sheet, row, 1, "0")
+    assert sheet.get_value(1, 2) == 0
+    assert sheet.undo()
+    assert [sheet.get_value(row, 1) for row in range(1, 4)] == [1, 2, 3]
+    assert sheet.get_value(1, 2) == 6
+    # undo is not possible while a transaction is open
+    with sheet.transaction():
+        assert not sheet.undo()
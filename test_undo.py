@@ -0,0 +1,141 @@
+import gc
+import os
+from typing import Tuple
+
+import pytest
+
+from binary_workbook import BLOCK_ROWS
+from cell import new_cells
+from sheet import Sheet
+
+BLOCK_COUNT = 4
+
+
+def _write(sheet: Sheet, row: int, col: int, text: str) -> None:
+    sheet.choose_cell(row, col)
+    sheet.write_to_chosen_cell(text)
+    sheet.enter_pressed()
+
+
+def _open_binary_file(file_name: str) -> Sheet:
+    """
+    Saves a binary workbook with the number of the row in every row of column A
+    of BLOCK_COUNT blocks and opens it again, none of its blocks are loaded.
+    """
+    sheet = Sheet(name="sheet1")
+    rows = list(range(1, BLOCK_COUNT * BLOCK_ROWS))
+    sheet.get_sheet().set_column_cells(1, rows, new_cells([str(row) for row in rows], [float(row) for row in rows]))
+    sheet.save_to_file(file_name)
+    sheet.close()
+    sheet = Sheet(name="sheet1")
+    sheet.load_from_file(file_name)
+    return sheet
+
+
+def test_undo_of_a_binary_file_loads_only_the_changed_block(tmp_path) -> None:  # type: ignore
+    sheet = _open_binary_file(str(tmp_path / "sheet.mxlb"))
+    storage = sheet.get_sheet()
+    last_row = BLOCK_COUNT * BLOCK_ROWS - 1
+    _write(sheet, last_row, 1, "x")
+    assert [storage.is_loaded(block * BLOCK_ROWS) for block in range(BLOCK_COUNT)] == [False, False, False, True]
+    assert sheet.undo()
+    assert storage.get_cell(last_row, 1).get_text() == str(last_row)
+    assert sheet.redo()
+    assert storage.get_cell(last_row, 1).get_text() == "x"
+    assert not storage.is_loaded(0)
+    assert storage.get_cell(1, 1).get_text() == "1"
+    sheet.close()
+
+
+def _is_open(file_name: str) -> bool:
+    return any(os.path.realpath(os.path.join("/proc/self/fd", fd)) == os.path.realpath(file_name)
+               for fd in os.listdir("/proc/self/fd"))
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc/self/fd"), reason="needs the open files of the process")
+def test_replaced_sheet_closes_the_file(tmp_path) -> None:  # type: ignore
+    file_name = str(tmp_path / "sheet.mxlb")
+    other_file_name = str(tmp_path / "other.mxlb")
+    _open_binary_file(other_file_name).close()
+    sheet = _open_binary_file(file_name)
+    _write(sheet, 1, 1, "x")
+    _write(sheet, 2, 1, "y")
+    assert _is_open(file_name)
+    sheet.load_from_file(other_file_name)
+    gc.collect()
+    # the snapshots of the undo steps shared the file, they let go of it with the sheet they belonged to
+    assert not _is_open(file_name)
+    sheet.close()
+
+
+def test_undo_and_redo_of_text() -> None:
+    sheet = Sheet(name="sheet1")
+    _write(sheet, 1, 1, "1")
+    _write(sheet, 1, 2, "MATH(A1*2)")
+    _write(sheet, 1, 1, "5")
+    assert sheet.get_value(1, 2) == 10
+    assert sheet.undo()
+    assert sheet.get_sheet().get_cell(1, 1).get_text() == "1"
+    # the cells that depend on the restored cell are recalculated
+    assert sheet.get_value(1, 2) == 2
+    assert sheet.redo()
+    assert sheet.get_sheet().get_cell(1, 1).get_text() == "5"
+    assert sheet.get_value(1, 2) == 10
+    assert not sheet.redo()
+    assert sheet.undo() and sheet.undo()
+    assert sheet.get_sheet().get_cell(1, 2).get_text() == ""
+    assert sheet.get_value(1, 2) is None
+
+
+def _get_style(sheet: Sheet) -> Tuple[str, str]:
+    cell = sheet.get_sheet().get_cell(1, 1)
+    return cell.get_color(), cell.get_font()
+
+
+def test_undo_and_redo_of_color_and_font() -> None:
+    sheet = Sheet(name="sheet1")
+    _write(sheet, 1, 1, "x")
+    default_color, default_font = _get_style(sheet)
+    sheet.update_cell_color("red")
+    sheet.update_cell_font("Courier")
+    assert _get_style(sheet) == ("red", "Courier")
+    assert sheet.undo()
+    assert _get_style(sheet) == ("red", default_font)
+    assert sheet.undo()
+    assert _get_style(sheet) == (default_color, default_font)
+    assert sheet.get_sheet().get_cell(1, 1).get_text() == "x"
+    assert sheet.redo()
+    assert _get_style(sheet) == ("red", default_font)
+    assert sheet.redo()
+    assert _get_style(sheet) == ("red", "Courier")
+
+
+def test_undo_limit() -> None:
+    sheet = Sheet(name="sheet1", undo_limit=3)
+    for value in range(1, 6):
+        _write(sheet, 1, 1, str(value))
+    assert [sheet.undo() for _ in range(4)] == [True, True, True, False]
+    assert sheet.get_value(1, 1) == 2
+    assert [sheet.redo() for _ in range(4)] == [True, True, True, False]
+    assert sheet.get_value(1, 1) == 5
+    sheet = Sheet(name="sheet1", undo_limit=0)
+    _write(sheet, 1, 1, "1")
+    assert not sheet.can_undo()
+    assert not sheet.undo()
+
+
+def test_new_edit_clears_redo() -> None:
+    sheet = Sheet(name="sheet1")
+    _write(sheet, 1, 1, "1")
+    _write(sheet, 1, 1, "2")
+    assert sheet.undo()
+    assert sheet.can_redo()
+    _write(sheet, 2, 1, "3")
+    assert not sheet.can_redo()
+    assert not sheet.redo()
+    assert sheet.get_value(1, 1) == 1
+    # undo goes back over the new edit and then the edits before the one that was undone
+    assert sheet.undo()
+    assert sheet.get_sheet().get_cell(2, 1).get_text() == ""
+    assert sheet.undo()
+    assert sheet.get_sheet().get_cell(1, 1).get_text() == ""
@@ -1,23 +1,35 @@
+import tkinter as tk
 from tkinter import ttk, font, Button, PhotoImage, Label
-from ttkthemes import ThemedTk  # type: ignore
+
+WELCOME_THEME = "yaru"
 
 
 class WelcomeWindow:
     """
     This class represents the welcome window of the program.
+    it is shown over the main window, in the same root, so the main window is built
+    and can be used while the welcome window is open.
     The welcome window has the following attributes:
     - window: the window of the welcome window
     - icon: the icon of the welcome window
+    - style: the ttk style of the root, its theme is changed back when the welcome window is closed
+    - previous_theme: the theme of the root before the welcome window was shown
     """
-    def __init__(self) -> None:
+    def __init__(self, root: tk.Tk) -> None:
         """
         The constructor of the WelcomeWindow class. It makes the welcome window of the program using tkinter.
+        ttkthemes is imported only here, so the program starts without it when the welcome window is not shown.
         """
-        self.__window = ThemedTk(theme="yaru")
+        from ttkthemes import ThemedStyle  # type: ignore
+
+        self.__window = tk.Toplevel(root)
         self.__window.geometry("1200x600")
         self.__window.configure(bg='alice blue')
+        self.__window.transient(root)
+        self.__style = ThemedStyle(self.__window)
+        self.__previous_theme = self.__style.theme_use()
+        self.__style.set_theme(WELCOME_THEME)
 
-        self.__window.withdraw()
         self.__icon = PhotoImage(file="icons8-excel-50.png")
 
         icon_label = Label(self.__window, image=self.__icon)
@@ -25,10 +37,9 @@ class WelcomeWindow:
         label_font = font.Font(size=14, weight="bold")
         label = ttk.Label(self.__window, text="Welcome to Super Duper Excel!", font=label_font, foreground="green4")
         label.pack(padx=50, pady=50)  # Add some padding around the label
-        close_button = Button(self.__window, text="Press to start", command=self.__window.destroy)
+        close_button = Button(self.__window, text="Press to start", command=self.close)
         close_button.pack()
 
-        self.__window.deiconify()
-
-    def show(self) -> None:
-        self.__window.mainloop()
+    def close(self) -> None:
+        self.__style.theme_use(self.__previous_theme)
+        self.__window.destroy()
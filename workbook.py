@@ -0,0 +1,333 @@
+import os
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from cell_address import get_cell_name
+from cell_range import CellRange
+from cell_value import CellValue
+from recalculation_profiler import RecalculationProfiler
+from recalculation_scheduler import RecalculationScheduler
+from sheet import Sheet, CIRCULAR_REFERENCE_ERROR_MSG, ERROR_LOADING_FILE_MSG, ERROR_SAVING_FILE_MSG
+from sheet_reference import SheetReference, is_sheet_name, SHEET_NAME_SEPARATOR
+from sheet_storage import SheetStorage
+from workbook_file import is_workbook_file, get_sheet_file_name, read_workbook_file, write_workbook_file
+from workbook_file import copy_sheet_file, SHEETS_DIRECTORY_SUFFIX
+from workbook_graph import WorkbookGraph, WorkbookCell
+
+DEFAULT_SHEET_NAME_PREFIX = "Sheet"
+INVALID_SHEET_NAME_MSG = "A sheet name must be letters, digits and underscores, and must not start with a digit!"
+DUPLICATE_SHEET_NAME_MSG = "There is already a sheet with this name!"
+
+
+def _ignore_cell_change(cell_loc: Tuple[int, int], value: Any) -> None:
+    pass
+
+
+def _ignore_text(text: str) -> None:
+    pass
+
+
+def _ignore_event() -> None:
+    pass
+
+
+class Workbook:
+    """
+    The Workbook class holds the sheets of a workbook, their formulas can read the cells of other sheets,
+    for example MATH(Sheet2!A1*2) or SUM(Sheet2!A:A).
+    the sheets share one dependency graph, a change is recalculated in the order of the graph
+    in all the sheets it reaches. a workbook file keeps every sheet in a file of its own, and a sheet
+    is loaded only when it is shown or a formula reads it, so opening a workbook of many sheets
+    only loads the active one.
+    The workbook has the following attributes:
+    - sheet_names: the names of the sheets, in the order of their tabs
+    - sheets: the sheets that were loaded or added, by their names
+    - sheet_files: the files of the sheets that were not loaded yet, by their names
+    - reference_cells: the formula cells that read other sheets, of the sheets that were not loaded yet.
+      they are evaluated again when their sheet is loaded, the sheets they read may have changed since
+    - graph: the dependency graph of the workbook
+    - active_sheet_name: the name of the sheet that is shown
+    and the callbacks and the options that every sheet is made with,
+    the callbacks of the cells and of the formula box are called only for the active sheet.
+    """
+
+    def __init__(self,
+                 on_cell_text_changed: Callable[[Tuple[int, int], CellValue], None] = _ignore_cell_change,
+                 on_cell_color_changed: Callable[[Tuple[int, int], str], None] = _ignore_cell_change,
+                 on_cell_font_changed: Callable[[Tuple[int, int], str], None] = _ignore_cell_change,
+                 on_error: Callable[[str], None] = _ignore_text,
+                 update_formula_box_text_written_to_cell: Callable[[str], None] = _ignore_text,
+                 recalculation_scheduler: Optional[RecalculationScheduler] = None,
+                 profiler: Optional[RecalculationProfiler] = None,
+                 lazy_evaluation: bool = False,
+                 background_recalculation: bool = False,
+                 on_background_recalculation_started: Callable[[], None] = _ignore_event) -> None:
+        """
+        The parameters are the ones of Sheet, every sheet of the workbook is made with them.
+        the workbook starts with one empty sheet.
+        """
+        self.__on_cell_text_changed = on_cell_text_changed
+        self.__on_cell_color_changed = on_cell_color_changed
+        self.__on_cell_font_changed = on_cell_font_changed
+        self.__on_error = on_error
+        self.__update_formula_box_text_written_to_cell = update_formula_box_text_written_to_cell
+        self.__recalculation_scheduler = recalculation_scheduler or RecalculationScheduler()
+        self.__profiler = profiler
+        self.__lazy_evaluation = lazy_evaluation
+        self.__background_recalculation = background_recalculation
+        self.__on_background_recalculation_started = on_background_recalculation_started
+
+        self.__graph = WorkbookGraph()
+        self.__sheet_names: List[str] = []
+        self.__sheets: Dict[str, Sheet] = {}
+        self.__sheet_files: Dict[str, str] = {}
+        self.__reference_cells: Dict[str, List[Tuple[int, int]]] = {}
+        self.__active_sheet_name = self.__get_new_sheet_name()
+        self.__sheet_names.append(self.__active_sheet_name)
+        self.__make_sheet(self.__active_sheet_name)
+
+    def get_sheet_names(self) -> List[str]:
+        return list(self.__sheet_names)
+
+    def get_active_sheet_name(self) -> str:
+        return self.__active_sheet_name
+
+    def get_active_sheet(self) -> Sheet:
+        return self.__sheets[self.__active_sheet_name]
+
+    def set_active_sheet(self, sheet_name: str) -> bool:
+        """
+        Makes the sheet the one that is shown, it is loaded if it was not loaded yet.
+        returns False if there is no such sheet.
+        """
+        if self.get_sheet(sheet_name) is None:
+            return False
+        self.__active_sheet_name = sheet_name
+        return True
+
+    def is_loaded(self, sheet_name: str) -> bool:
+        return sheet_name in self.__sheets
+
+    def get_sheet(self, sheet_name: str) -> Optional[Sheet]:
+        """
+        Returns the sheet with the name, it is loaded from the workbook file if it was not loaded yet.
+        returns None if there is no such sheet.
+        """
+        sheet = self.__sheets.get(sheet_name)
+        if sheet is None and sheet_name in self.__sheet_names:
+            sheet = self.__load_sheet(sheet_name)
+        return sheet
+
+    def add_sheet(self, sheet_name: Optional[str] = None) -> Optional[str]:
+        """
+        Adds an empty sheet after the last one, with the given name or with the next free SheetN name.
+        the formulas that already read a sheet with this name are evaluated again.
+        returns the name of the sheet, or None if the name is not valid or is taken.
+        """
+        if sheet_name is None:
+            sheet_name = self.__get_new_sheet_name()
+        if not is_sheet_name(sheet_name):
+            self.__on_error(INVALID_SHEET_NAME_MSG)
+            return None
+        if sheet_name.lower() in (name.lower() for name in self.__sheet_names):
+            # the sheets are saved in files named after them, and some file systems ignore case
+            self.__on_error(DUPLICATE_SHEET_NAME_MSG)
+            return None
+        self.__sheet_names.append(sheet_name)
+        self.__make_sheet(sheet_name)
+        readers = self.__graph.get_sheet_readers(sheet_name)
+        if readers:
+            self.__recalculate(readers | self.__graph.get_dirty_cells(readers))
+        return sheet_name
+
+    def __get_new_sheet_name(self) -> str:
+        number = len(self.__sheet_names) + 1
+        while DEFAULT_SHEET_NAME_PREFIX + str(number) in self.__sheet_names:
+            number += 1
+        return DEFAULT_SHEET_NAME_PREFIX + str(number)
+
+    def __make_sheet(self, sheet_name: str) -> Sheet:
+        sheet = Sheet(
+            name=sheet_name,
+            on_cell_text_changed=lambda cell_loc, value: self.__call_if_active(
+                sheet_name, self.__on_cell_text_changed, cell_loc, value),
+            on_cell_color_changed=lambda cell_loc, color: self.__call_if_active(
+                sheet_name, self.__on_cell_color_changed, cell_loc, color),
+            on_cell_font_changed=lambda cell_loc, font: self.__call_if_active(
+                sheet_name, self.__on_cell_font_changed, cell_loc, font),
+            on_error=self.__on_error,
+            update_formula_box_text_written_to_cell=lambda text: self.__write_formula_box_text_if_active(
+                sheet_name, text),
+            recalculation_scheduler=self.__recalculation_scheduler,
+            profiler=self.__profiler,
+            lazy_evaluation=self.__lazy_evaluation,
+            background_recalculation=self.__background_recalculation,
+            on_background_recalculation_started=self.__on_background_recalculation_started,
+            workbook_graph=self.__graph,
+            sheet_resolver=self.__read_reference,
+            on_workbook_cells_changed=self.__recalculate_changed_cells
+        )
+        self.__sheets[sheet_name] = sheet
+        self.__graph.add_sheet(sheet_name, sheet.get_dependency_graph())
+        return sheet
+
+    def __call_if_active(self, sheet_name: str, callback: Callable[[Tuple[int, int], Any], None],
+                         cell_loc: Tuple[int, int], value: Any) -> None:
+        if sheet_name == self.__active_sheet_name:
+            callback(cell_loc, value)
+
+    def __write_formula_box_text_if_active(self, sheet_name: str, text: str) -> None:
+        if sheet_name == self.__active_sheet_name:
+            self.__update_formula_box_text_written_to_cell(text)
+
+    def __load_sheet(self, sheet_name: str,
+                     on_progress: Optional[Callable[[int, int], None]] = None) -> Sheet:
+        """
+        Loads a sheet from its file, and evaluates again its formulas that read other sheets,
+        the sheets they read are loaded too when they are read.
+        """
+        sheet = self.__make_sheet(sheet_name)
+        sheet_file_name = self.__sheet_files.pop(sheet_name, None)
+        if sheet_file_name is not None:
+            sheet.load_from_file(sheet_file_name, on_progress)
+        sheet.refresh_cells(self.__reference_cells.pop(sheet_name, []))
+        return sheet
+
+    def __read_reference(self, reference: SheetReference) -> Optional[SheetStorage]:
+        """
+        Returns the storage of the sheet a formula reads, after the dirty cells it reads in it were evaluated,
+        or None if there is no such sheet. the sheet is loaded if it was not loaded yet.
+        """
+        sheet = self.get_sheet(reference.get_sheet_name())
+        if sheet is None:
+            return None
+        target = reference.get_target()
+        if isinstance(target, CellRange):
+            sheet.evaluate_range(target)
+        else:
+            sheet.evaluate_cells([target])
+        return sheet.get_sheet()
+
+    def __recalculate_changed_cells(self, sheet_name: str, changed_cells: Set[Tuple[int, int]]) -> None:
+        """
+        Recalculates the cells of all the sheets that depend on cells that changed in a sheet,
+        called by the sheet when cells of other sheets depend on them.
+        """
+        self.__recalculate(self.__graph.get_dirty_cells((sheet_name, cell_loc) for cell_loc in changed_cells))
+
+    def __recalculate(self, dirty_cells: Set[WorkbookCell]) -> None:
+        """
+        Evaluates the cells of the sheets, each of them after all the cells it reads in all the sheets,
+        the cells of a level are evaluated by their sheets. cells in a circular reference are marked as errors.
+        """
+        levels, circular_cells = self.__graph.topological_levels(dirty_cells)
+        for level in levels:
+            for sheet_name, cells in _group_by_sheet(level).items():
+                self.__sheets[sheet_name].recalculate_cells(cells)
+        for sheet_name, cells in _group_by_sheet(circular_cells).items():
+            self.__sheets[sheet_name].mark_circular_cells(cells)
+        if circular_cells:
+            self.__on_error(CIRCULAR_REFERENCE_ERROR_MSG + ", ".join(
+                sheet_name + SHEET_NAME_SEPARATOR + get_cell_name(cell_loc) for sheet_name, cell_loc in circular_cells))
+
+    def recalculate_all(self) -> None:
+        """
+        Loads all the sheets and recalculates every formula of the workbook once,
+        each of them after all the cells it reads in all the sheets.
+        sheets that do not read each other are recalculated by themselves, in the order of their own graphs.
+        """
+        for sheet_name in self.__sheet_names:
+            self.get_sheet(sheet_name)
+        if not self.__graph.has_references():
+            for sheet in self.__sheets.values():
+                sheet.recalculate_all()
+            return
+        self.__recalculate({(sheet_name, cell_loc) for sheet_name, sheet in self.__sheets.items()
+                            for cell_loc in sheet.get_formula_cells()})
+
+    def apply_background_results(self) -> bool:
+        """
+        Applies the results of the background recalculations of all the sheets,
+        returns True while one of them is still running.
+        """
+        is_running = False
+        for sheet in list(self.__sheets.values()):
+            if sheet.apply_background_results():
+                is_running = True
+        return is_running
+
+    def wait_for_background_recalculation(self) -> None:
+        for sheet in list(self.__sheets.values()):
+            sheet.wait_for_background_recalculation()
+
+    def close(self) -> None:
+        """
+        Closes the sheets without saving them, their changes that were not saved
+        are removed from their journals, and stops their background threads and worker processes.
+        """
+        for sheet in self.__sheets.values():
+            sheet.close()
+
+    def save_to_file(self, file_name: str, on_progress: Optional[Callable[[int, int], None]] = None) -> None:
+        """
+        Saves the workbook to a workbook file (a name ending with .mxlw), every sheet to its own file
+        in the sheets directory next to it. a sheet that was not loaded is copied as it is, if it is saved
+        to another workbook file. any other file name saves only the active sheet, as Sheet.save_to_file does.
+        on_progress is called with the number of sheets saved so far and the number of sheets.
+        """
+        if not is_workbook_file(file_name):
+            self.get_active_sheet().save_to_file(file_name, on_progress)
+            return
+        try:
+            os.makedirs(file_name + SHEETS_DIRECTORY_SUFFIX, exist_ok=True)
+            for k, sheet_name in enumerate(self.__sheet_names):
+                sheet_file_name = get_sheet_file_name(file_name, sheet_name)
+                sheet = self.__sheets.get(sheet_name)
+                if sheet is not None:
+                    sheet.save_to_file(sheet_file_name)
+                elif os.path.abspath(self.__sheet_files[sheet_name]) != os.path.abspath(sheet_file_name):
+                    copy_sheet_file(self.__sheet_files[sheet_name], sheet_file_name)
+                    self.__sheet_files[sheet_name] = sheet_file_name
+                if on_progress is not None:
+                    on_progress(k + 1, len(self.__sheet_names))
+            write_workbook_file(file_name, [(sheet_name, self.__get_reference_cells(sheet_name))
+                                            for sheet_name in self.__sheet_names],
+                                self.__sheet_names.index(self.__active_sheet_name))
+        except OSError:
+            self.__on_error(ERROR_SAVING_FILE_MSG)
+
+    def __get_reference_cells(self, sheet_name: str) -> List[Tuple[int, int]]:
+        if sheet_name in self.__sheets:
+            return self.__graph.get_reference_cells(sheet_name)
+        return self.__reference_cells.get(sheet_name, [])
+
+    def load_from_file(self, file_name: str, on_progress: Optional[Callable[[int, int], None]] = None) -> None:
+        """
+        Opens a workbook file (a name ending with .mxlw), only the active sheet is loaded now,
+        and the sheets its formulas read. the other sheets are loaded when they are shown or read.
+        any other file is loaded to the active sheet, as Sheet.load_from_file does.
+        on_progress is called with the progress of loading the active sheet.
+        """
+        if not is_workbook_file(file_name):
+            self.get_active_sheet().load_from_file(file_name, on_progress)
+            return
+        try:
+            sheets, active_sheet_index = read_workbook_file(file_name)
+        except (OSError, ValueError):
+            self.__on_error(ERROR_LOADING_FILE_MSG)
+            return
+        self.close()
+        self.__graph = WorkbookGraph()
+        self.__sheet_names = [sheet_name for sheet_name, reference_cells in sheets]
+        self.__sheets = {}
+        self.__sheet_files = {sheet_name: get_sheet_file_name(file_name, sheet_name) for sheet_name in self.__sheet_names}
+        self.__reference_cells = {sheet_name: reference_cells for sheet_name, reference_cells in sheets
+                                  if reference_cells}
+        self.__active_sheet_name = self.__sheet_names[active_sheet_index]
+        self.__load_sheet(self.__active_sheet_name, on_progress)
+
+
+def _group_by_sheet(cells: Iterable[WorkbookCell]) -> Dict[str, List[Tuple[int, int]]]:
+    sheet_cells: Dict[str, List[Tuple[int, int]]] = {}
+    for sheet_name, cell_loc in cells:
+        sheet_cells.setdefault(sheet_name, []).append(cell_loc)
+    return sheet_cells
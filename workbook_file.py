@@ -0,0 +1,86 @@
+import os
+import shutil
+from typing import List, Tuple
+
+from binary_workbook import BINARY_FILE_EXTENSION
+from cell_address import get_cell_loc, get_cell_name
+from edit_journal import JOURNAL_EXTENSION
+from sheet_reference import is_sheet_name
+
+WORKBOOK_FILE_EXTENSION = ".mxlw"
+WORKBOOK_FILE_MAGIC = "MXLW"
+WORKBOOK_FILE_VERSION = 1
+WORKBOOK_SPACER = "@"
+# the sheets of a workbook file are kept in this directory next to it, a binary workbook for every sheet
+SHEETS_DIRECTORY_SUFFIX = ".sheets"
+
+# a sheet of a workbook file: its name and its formula cells that read other sheets
+WorkbookFileSheet = Tuple[str, List[Tuple[int, int]]]
+
+# The layout of a workbook file (text):
+# - a header line: magic@version@sheet count@index of the active sheet
+# - a line for every sheet, in the order of the tabs: its name, a tab and the names of its formula
+#   cells that read other sheets, comma separated (they are evaluated again when the sheet is loaded)
+# the cells of every sheet are in <file>.sheets/<sheet name>.mxlb, with the journal of the sheet next to it,
+# so a sheet is read only when it is needed and saving a changed sheet only syncs its journal.
+
+
+def is_workbook_file(file_name: str) -> bool:
+    return os.path.splitext(file_name)[1].lower() == WORKBOOK_FILE_EXTENSION
+
+
+def get_sheet_file_name(file_name: str, sheet_name: str) -> str:
+    return os.path.join(file_name + SHEETS_DIRECTORY_SUFFIX, sheet_name + BINARY_FILE_EXTENSION)
+
+
+def write_workbook_file(file_name: str, sheets: List[WorkbookFileSheet], active_sheet_index: int) -> None:
+    """
+    Writes the list of the sheets of a workbook, the sheets themselves are saved by their own sheets.
+    the file is written next to the old one and then replaces it.
+    """
+    temp_file_name = file_name + ".tmp"
+    with open(temp_file_name, 'w') as file:
+        file.write(WORKBOOK_SPACER.join([WORKBOOK_FILE_MAGIC, str(WORKBOOK_FILE_VERSION),
+                                         str(len(sheets)), str(active_sheet_index)]) + "\n")
+        for sheet_name, reference_cells in sheets:
+            file.write(sheet_name + "\t" + ",".join(map(get_cell_name, reference_cells)) + "\n")
+    os.replace(temp_file_name, file_name)
+
+
+def read_workbook_file(file_name: str) -> Tuple[List[WorkbookFileSheet], int]:
+    """
+    Reads the list of the sheets of a workbook and the index of its active sheet,
+    raises ValueError if the file is not a workbook file.
+    """
+    with open(file_name, 'r') as file:
+        header = file.readline().rstrip("\n").split(WORKBOOK_SPACER)
+        if len(header) != 4 or header[0] != WORKBOOK_FILE_MAGIC or int(header[1]) != WORKBOOK_FILE_VERSION:
+            raise ValueError("not a workbook file: " + file_name)
+        sheets: List[WorkbookFileSheet] = []
+        for k in range(int(header[2])):
+            sheet_name, cell_names = file.readline().rstrip("\n").split("\t")
+            if not is_sheet_name(sheet_name):
+                raise ValueError("not a sheet name: " + sheet_name)
+            reference_cells = []
+            for cell_name in filter(None, cell_names.split(",")):
+                cell_loc = get_cell_loc(cell_name)
+                if cell_loc is None:
+                    raise ValueError("not a cell: " + cell_name)
+                reference_cells.append(cell_loc)
+            sheets.append((sheet_name, reference_cells))
+    active_sheet_index = int(header[3])
+    if not 0 <= active_sheet_index < len(sheets):
+        raise ValueError("no active sheet in: " + file_name)
+    return sheets, active_sheet_index
+
+
+def copy_sheet_file(sheet_file_name: str, new_sheet_file_name: str) -> None:
+    """
+    Copies the file of a sheet that was not loaded, with its journal, to another workbook.
+    the modification time is copied too, the journal is only read with the file it was written for.
+    """
+    shutil.copy2(sheet_file_name, new_sheet_file_name)
+    if os.path.exists(sheet_file_name + JOURNAL_EXTENSION):
+        shutil.copy2(sheet_file_name + JOURNAL_EXTENSION, new_sheet_file_name + JOURNAL_EXTENSION)
+    elif os.path.exists(new_sheet_file_name + JOURNAL_EXTENSION):
+        os.remove(new_sheet_file_name + JOURNAL_EXTENSION)
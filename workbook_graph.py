@@ -0,0 +1,159 @@
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Set, Tuple
+
+from cell_range import CellRange
+from dependency_graph import DependencyGraph, find_dirty_cells, order_in_levels
+from sheet_reference import SheetReference
+
+# a cell of the workbook: the name of its sheet and its (row, col)
+WorkbookCell = Tuple[str, Tuple[int, int]]
+
+
+class WorkbookGraph:
+    """
+    The WorkbookGraph class is the dependency graph of all the sheets of a workbook.
+    the edges inside a sheet stay in the dependency graph of the sheet, this graph keeps only
+    the edges from formulas to the cells and ranges of other sheets, and goes over both,
+    so a change is followed from sheet to sheet as in one graph. its cells are (sheet name, (row, col)).
+    a sheet that was not loaded has no graph here, its formulas are evaluated again when it is loaded.
+    The graph has the following attributes:
+    - sheet_graphs: the dependency graph of every loaded sheet, by its name
+    - references: for every sheet, its formula cells that read other sheets and the references they read
+    - cell_dependents: for every cell that formulas of other sheets read, the formula cells that read it
+    - range_dependents: for every sheet, its ranges that formulas of other sheets read,
+      and the formula cells that read each of them
+    """
+
+    def __init__(self) -> None:
+        self.__sheet_graphs: Dict[str, DependencyGraph] = {}
+        self.__references: Dict[str, Dict[Tuple[int, int], List[SheetReference]]] = {}
+        self.__cell_dependents: Dict[WorkbookCell, Set[WorkbookCell]] = {}
+        self.__range_dependents: Dict[str, Dict[CellRange, Set[WorkbookCell]]] = {}
+
+    def add_sheet(self, sheet_name: str, graph: DependencyGraph) -> None:
+        self.__sheet_graphs[sheet_name] = graph
+
+    def has_references(self) -> bool:
+        return bool(self.__cell_dependents) or bool(self.__range_dependents)
+
+    def set_references(self, sheet_name: str, cell: Tuple[int, int], references: List[SheetReference]) -> None:
+        """
+        Replaces the references to other sheets of a formula cell,
+        called every time the formula of the cell is evaluated.
+        """
+        sheet_references = self.__references.get(sheet_name)
+        old_references = [] if sheet_references is None else sheet_references.get(cell, [])
+        if references == old_references:
+            return
+        references = list(dict.fromkeys(references))
+        workbook_cell = (sheet_name, cell)
+        for reference in old_references:
+            dependents = self.__get_reference_dependents(reference)
+            dependents.discard(workbook_cell)
+            if not dependents:
+                self.__remove_reference_dependents(reference)
+        for reference in references:
+            self.__get_reference_dependents(reference).add(workbook_cell)
+        if references:
+            self.__references.setdefault(sheet_name, {})[cell] = references
+        elif sheet_references is not None:
+            del sheet_references[cell]
+
+    def get_references(self, sheet_name: str, cell: Tuple[int, int]) -> List[SheetReference]:
+        return self.__references.get(sheet_name, {}).get(cell, [])
+
+    def get_reference_cells(self, sheet_name: str) -> List[Tuple[int, int]]:
+        """
+        Returns the formula cells of the sheet that read other sheets, to save them with the workbook.
+        """
+        return sorted(self.__references.get(sheet_name, {}))
+
+    def get_sheet_readers(self, sheet_name: str) -> Set[WorkbookCell]:
+        """
+        Returns the formula cells of other sheets that read cells or ranges of the sheet.
+        """
+        readers: Set[WorkbookCell] = set()
+        for workbook_cell, dependents in self.__cell_dependents.items():
+            if workbook_cell[0] == sheet_name:
+                readers |= dependents
+        for dependents in self.__range_dependents.get(sheet_name, {}).values():
+            readers |= dependents
+        return readers
+
+    def clear_sheet_references(self, sheet_name: str) -> None:
+        """
+        Removes the references of the formulas of the sheet, called when another file is loaded to it.
+        the references of other sheets to it are kept, they are formulas of the other sheets.
+        """
+        for cell in list(self.__references.get(sheet_name, {})):
+            self.set_references(sheet_name, cell, [])
+
+    def __get_reference_dependents(self, reference: SheetReference) -> Set[WorkbookCell]:
+        target = reference.get_target()
+        if isinstance(target, CellRange):
+            return self.__range_dependents.setdefault(reference.get_sheet_name(), {}).setdefault(target, set())
+        return self.__cell_dependents.setdefault((reference.get_sheet_name(), target), set())
+
+    def __remove_reference_dependents(self, reference: SheetReference) -> None:
+        target = reference.get_target()
+        if not isinstance(target, CellRange):
+            del self.__cell_dependents[(reference.get_sheet_name(), target)]
+            return
+        sheet_ranges = self.__range_dependents[reference.get_sheet_name()]
+        del sheet_ranges[target]
+        if not sheet_ranges:
+            del self.__range_dependents[reference.get_sheet_name()]
+
+    def get_dependents(self, workbook_cell: WorkbookCell) -> Set[WorkbookCell]:
+        """
+        Returns the formula cells that read the cell, in its sheet and in other sheets.
+        """
+        sheet_name, cell = workbook_cell
+        dependents: Set[WorkbookCell] = set()
+        graph = self.__sheet_graphs.get(sheet_name)
+        if graph is not None:
+            dependents = {(sheet_name, dependent) for dependent in graph.get_dependents(cell)}
+        other_dependents = self.__cell_dependents.get(workbook_cell)
+        if other_dependents is not None:
+            dependents |= other_dependents
+        for cell_range, range_dependents in self.__range_dependents.get(sheet_name, {}).items():
+            if cell_range.contains(cell):
+                dependents |= range_dependents
+        return dependents
+
+    def reaches_other_sheets(self, sheet_name: str, changed_cells: Iterable[Tuple[int, int]],
+                             already_dirty: Set[Tuple[int, int]]) -> bool:
+        """
+        Returns True if cells of other sheets depend on the changed cells of the sheet,
+        directly or through other formula cells. the dirty cells of the sheet are not gone through,
+        a dirty cell is never read by other sheets: a change that reaches them is recalculated at once.
+        """
+        if not self.has_references():
+            return False
+        seen: Set[WorkbookCell] = set()
+        queue: Deque[WorkbookCell] = deque((sheet_name, cell) for cell in changed_cells)
+        while queue:
+            for dependent in self.get_dependents(queue.popleft()):
+                if dependent[0] != sheet_name:
+                    return True
+                if dependent not in seen and dependent[1] not in already_dirty:
+                    seen.add(dependent)
+                    queue.append(dependent)
+        return False
+
+    def get_dirty_cells(self, changed_cells: Iterable[WorkbookCell]) -> Set[WorkbookCell]:
+        """
+        Returns all the formula cells of all the sheets that depend on the changed cells,
+        directly or through other formula cells.
+        """
+        return find_dirty_cells(changed_cells, self.get_dependents)
+
+    def topological_levels(self,
+                           cells: Set[WorkbookCell]
+                           ) -> Tuple[List[List[WorkbookCell]], List[WorkbookCell]]:
+        """
+        Groups the given cells into levels, every cell comes after all the levels of the cells it reads,
+        whatever sheets they are in. returns the levels and the cells that are part
+        of a circular reference or depend on one.
+        """
+        return order_in_levels(cells, self.get_dependents)